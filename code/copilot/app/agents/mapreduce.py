@@ -0,0 +1,216 @@
+import asyncio
+import hashlib
+from collections import OrderedDict
+from typing import Tuple
+
+from app.agents.root import RootAgent
+from app.core.settings import settings
+from app.files.tokens import estimate_tokens, group_by_tokens, split_by_tokens
+from app.logs import setup_logging
+from microsoft_agents.hosting.core import TurnContext
+
+logger = setup_logging(__name__)
+
+
+class ChunkResultCache:
+    """
+    In-memory LRU cache for results of processed document chunks. Keys are
+    content hashes, so re-running a task only processes chunks that changed.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._items: OrderedDict[str, str] = OrderedDict()
+
+    @staticmethod
+    def get_key(*parts: str) -> str:
+        """
+        Create a cache key from the parts that determine a chunk result.
+
+        :param parts: The parts such as model name, instructions and chunk content.
+        :type parts: str
+        :return: The cache key.
+        :rtype: str
+        """
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x00")
+        return digest.hexdigest()
+
+    def get(self, key: str) -> str | None:
+        result = self._items.get(key)
+        if result is not None:
+            self._items.move_to_end(key)
+        return result
+
+    def set(self, key: str, result: str) -> None:
+        self._items[key] = result
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_entries:
+            self._items.popitem(last=False)
+
+
+chunk_result_cache = ChunkResultCache(max_entries=settings.MAP_REDUCE_CACHE_MAX_ENTRIES)
+
+
+class MapReduceAgent:
+    """
+    Agent for whole-document tasks on documents that exceed the model context.
+    The document is split into token-bounded chunks that are processed
+    concurrently by the small language model (map). The partial results are
+    combined hierarchically by the main model (reduce) and the final result is
+    streamed to the user.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        endpoint: str,
+        map_model_name: str,
+        reduce_model_name: str,
+        task: str,
+        managed_identity_client_id: str = None,
+        max_chunk_tokens: int = 20000,
+        max_reduce_tokens: int = 60000,
+        max_concurrency: int = 4,
+    ):
+        self.map_model_name = map_model_name
+        self.map_instructions = settings.INSTRUCTIONS_MAP_AGENT + f"\n{task}"
+        self.max_chunk_tokens = max_chunk_tokens
+        self.max_reduce_tokens = max_reduce_tokens
+        self.max_concurrency = max_concurrency
+        self.map_agent = RootAgent(
+            api_key=api_key,
+            endpoint=endpoint,
+            model_name=map_model_name,
+            instructions=self.map_instructions,
+            managed_identity_client_id=managed_identity_client_id,
+            reasoning_effort="minimal",
+        )
+        self.reduce_agent = RootAgent(
+            api_key=api_key,
+            endpoint=endpoint,
+            model_name=reduce_model_name,
+            instructions=settings.INSTRUCTIONS_REDUCE_AGENT + f"\n{task}",
+            managed_identity_client_id=managed_identity_client_id,
+            reasoning_effort="none",
+        )
+
+    async def _map(self, chunks: list[str], context: TurnContext) -> list[str]:
+        """
+        Process all chunks concurrently with the small language model.
+
+        :param chunks: The document chunks.
+        :type chunks: list[str]
+        :param context: The TurnContext for the current turn.
+        :type context: TurnContext
+        :return: The partial results in document order.
+        :rtype: list[str]
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        completed = 0
+
+        async def process_chunk(position: int, chunk: str) -> str:
+            nonlocal completed
+            key = ChunkResultCache.get_key(
+                self.map_model_name, self.map_instructions, chunk
+            )
+            result = chunk_result_cache.get(key)
+            if result is None:
+                async with semaphore:
+                    result = await self.map_agent._get_response(
+                        input=f"# Document Part {position + 1} of {len(chunks)}\n{chunk}"
+                    )
+                chunk_result_cache.set(key, result)
+            else:
+                logger.debug(f"Using cached result for document part {position + 1}.")
+
+            completed += 1
+            context.streaming_response.queue_informative_update(
+                f"Reading the document ({completed}/{len(chunks)} parts)... "
+            )
+            return result
+
+        return await asyncio.gather(
+            *(process_chunk(position, chunk) for position, chunk in enumerate(chunks))
+        )
+
+    @staticmethod
+    def _format_partial_results(results: list[str]) -> str:
+        return "\n\n".join(
+            f"## Partial Result {position + 1}\n{result}"
+            for position, result in enumerate(results)
+        )
+
+    async def _reduce(self, results: list[str], context: TurnContext) -> list[str]:
+        """
+        Combine partial results hierarchically until they fit into a single reduce step.
+
+        :param results: The partial results.
+        :type results: list[str]
+        :param context: The TurnContext for the current turn.
+        :type context: TurnContext
+        :return: The partial results that fit into the final reduce step.
+        :rtype: list[str]
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def reduce_group(group: list[str]) -> str:
+            if len(group) == 1:
+                return group[0]
+            async with semaphore:
+                return await self.reduce_agent._get_response(
+                    input=self._format_partial_results(group)
+                )
+
+        level = 0
+        while (
+            len(results) > 1
+            and estimate_tokens(self._format_partial_results(results))
+            > self.max_reduce_tokens
+        ):
+            groups = group_by_tokens(results, max_tokens=self.max_reduce_tokens)
+            if len(groups) == len(results):
+                # Each partial result fills the budget on its own, merge pairwise
+                groups = [results[i : i + 2] for i in range(0, len(results), 2)]
+
+            level += 1
+            logger.info(
+                f"Reducing {len(results)} partial results into {len(groups)} at level {level}."
+            )
+            context.streaming_response.queue_informative_update(
+                f"Combining the results ({len(results)} parts)... "
+            )
+            results = await asyncio.gather(*(reduce_group(group) for group in groups))
+
+        return results
+
+    async def stream_response(
+        self, content: str, context: TurnContext, last_response_id: str | None = None
+    ) -> Tuple[str, str]:
+        """
+        Run the task over the whole document and stream the final result.
+
+        :param content: The markdown content of the document.
+        :type content: str
+        :param context: The TurnContext for the current turn.
+        :type context: TurnContext
+        :param last_response_id: The ID of the last response for context continuity.
+        :type last_response_id: str | None
+        :return: A tuple containing the last response ID and the full response text.
+        :rtype: Tuple[str, str]
+        """
+        chunks = split_by_tokens(content, max_tokens=self.max_chunk_tokens)
+        logger.info(
+            f"Processing document with {estimate_tokens(content)} estimated tokens in {len(chunks)} chunks."
+        )
+
+        results = await self._map(chunks=chunks, context=context)
+        results = await self._reduce(results=results, context=context)
+
+        return await self.reduce_agent.stream_response(
+            input=self._format_partial_results(results),
+            context=context,
+            last_response_id=last_response_id,
+        )
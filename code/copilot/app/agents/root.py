@@ -3,10 +3,9 @@
 from agents import Agent, OpenAIResponsesModel, Runner
 from agents.model_settings import ModelSettings
 from agents.usage import Usage
+from app.core.clients import get_openai_client
 from app.logs import setup_logging
-from azure.identity.aio import DefaultAzureCredential, get_bearer_token_provider
 from microsoft_agents.hosting.core import TurnContext
-from openai import AsyncOpenAI
 from openai.types.responses import ResponseTextDeltaEvent
 from openai.types.shared.reasoning import Reasoning
 
@@ -64,21 +63,11 @@ def _create_agent(
         :return: Configured Agent instance.
         :rtype: Agent
         """
-        # Define authentication
-        if api_key:
-            api_key = api_key
-        else:
-            api_key = get_bearer_token_provider(
-                DefaultAzureCredential(
-                    managed_identity_client_id=managed_identity_client_id,
-                ),
-                "https://cognitiveservices.azure.com/.default",
-            )
-
         # Define the model and client
-        openai_client = AsyncOpenAI(
+        openai_client = get_openai_client(
             api_key=api_key,
-            base_url=f"{endpoint}openai/v1/",
+            endpoint=endpoint,
+            managed_identity_client_id=managed_identity_client_id,
         )
         model = OpenAIResponsesModel(
             model=model_name,
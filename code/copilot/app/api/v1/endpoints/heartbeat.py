@@ -1,9 +1,10 @@
 from typing import Any
 
 # from app.health.validate_request import verify_health_auth_header
+from app.core.readiness import readiness_tracker
 from app.logs import setup_logging
-from app.models.heartbeat import HeartbeatResult
-from fastapi import APIRouter, Depends
+from app.models.heartbeat import HeartbeatResult, ReadinessResult
+from fastapi import APIRouter, Depends, Response, status
 
 logger = setup_logging(__name__)
 
@@ -22,3 +23,19 @@ async def get_heartbeat() -> Any:
     """
     logger.info("Received Heartbeat Request")
     return HeartbeatResult(isAlive=True)
+
+
+@router.get(
+    "/ready",
+    response_model=ReadinessResult,
+    name="ready",
+    responses={status.HTTP_503_SERVICE_UNAVAILABLE: {"model": ReadinessResult}},
+)
+async def get_ready(response: Response) -> Any:
+    """
+    Readiness endpoint to verify the dependencies of the replica are warm.
+    """
+    result = readiness_tracker.get_result()
+    if not result.isReady:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return result
@@ -1,16 +1,96 @@
 from typing import Any
 
-from app.copilot.activities_msteams import on_message  # noqa: F401
-from app.copilot.copilot import copilot_apps
+from app.core.components import components
+from app.core.overload import (
+    OverloadError,
+    get_retry_after_header,
+    get_turn_budget,
+    turn_limiters,
+)
 from app.logs import setup_logging
-from fastapi import APIRouter, Request
-from microsoft_agents.hosting.fastapi import start_agent_process
+from fastapi import APIRouter, HTTPException, Request, Response, status
+from fastapi.responses import JSONResponse
+from microsoft_agents.activity import Activity, DeliveryModes
+from microsoft_agents.hosting.core import AgentApplication, TurnState
+from microsoft_agents.hosting.core.authorization import ClaimsIdentity
+from pydantic import ValidationError
 
 logger = setup_logging(__name__)
 
 router = APIRouter()
 
 
+async def parse_activity(request: Request) -> Activity:
+    """
+    Parse and validate the activity of a request in a single pass of the JSON
+    parser of pydantic, without decoding the body into a dictionary first.
+
+    :param request: The request received from the Bot Connector.
+    :type request: Request
+    :return: The validated activity.
+    :rtype: Activity
+    """
+    if "application/json" not in request.headers.get("Content-Type", ""):
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Unsupported Media Type",
+        )
+    try:
+        activity = Activity.model_validate_json(await request.body())
+    except ValidationError as e:
+        logger.warning(f"Received invalid activity: '{e}'")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Bad Request"
+        )
+
+    # A request must contain an activity of a conversation
+    if not activity.type or not activity.conversation or not activity.conversation.id:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="Bad Request"
+        )
+    return activity
+
+
+async def process_activity(
+    request: Request, activity: Activity, agent_app: AgentApplication[TurnState]
+) -> Response:
+    """
+    Process a parsed activity with an agent application like the
+    `start_agent_process` of the SDK, which would parse the body again.
+
+    :param request: The request received from the Bot Connector.
+    :type request: Request
+    :param activity: The parsed activity of the request.
+    :type activity: Activity
+    :param agent_app: The agent application processing the activity.
+    :type agent_app: AgentApplication[TurnState]
+    :return: The response of the turn.
+    :rtype: Response
+    """
+    # Use claims of the authorization middleware or an anonymous identity
+    claims_identity: ClaimsIdentity = getattr(
+        request.state, "claims_identity", ClaimsIdentity({}, False)
+    )
+    try:
+        invoke_response = await agent_app.adapter.process_activity(
+            claims_identity, activity, agent_app.on_turn
+        )
+    except PermissionError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized"
+        )
+
+    # Invoke and expect replies activities return the response of the turn
+    if (
+        activity.type == "invoke"
+        or activity.delivery_mode == DeliveryModes.expect_replies
+    ):
+        return JSONResponse(
+            content=invoke_response.body, status_code=invoke_response.status
+        )
+    return Response(status_code=status.HTTP_202_ACCEPTED)
+
+
 @router.post(
     "/message",
     response_model=Any,
@@ -18,14 +98,22 @@
 )
 async def post_message(request: Request) -> Any:
     """
-    Heartbeat endpoint to verify service is alive.
+    Message endpoint receiving activities from the Bot Connector.
     """
-    logger.info(f"Received message")
-
-    # Get payload
-    payload = await request.json()
-    return await start_agent_process(
-        request=request,
-        agent_application=copilot_apps["msteams"],
-        adapter=copilot_apps["msteams"].adapter,
-    )
+    # Get activity
+    activity = await parse_activity(request=request)
+    agent_app: AgentApplication[TurnState] = components.get("copilot_apps")["msteams"]
+
+    # Admit turn or reject it, so that the Bot Connector backs off
+    budget = get_turn_budget(activity=activity)
+    try:
+        async with turn_limiters[budget].admit():
+            return await process_activity(
+                request=request, activity=activity, agent_app=agent_app
+            )
+    except OverloadError as e:
+        return JSONResponse(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            content={"error": str(e)},
+            headers={"Retry-After": get_retry_after_header(e.retry_after_seconds)},
+        )
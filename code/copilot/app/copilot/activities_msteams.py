@@ -1,18 +1,23 @@
 from app.copilot.action import SuggestedActionHandler
-from app.copilot.common import configure_context, get_suggested_actions_from_agent
-from app.copilot.copilot import auth_handlers, copilot_apps
+from app.copilot.common import (
+    configure_context,
+    get_suggested_actions_from_agent,
+    save_user_state_store_item,
+)
 from app.copilot.handler_msteams import MSTeamsHandler
 from app.copilot.scenarios import DocumentScenarios
+from app.core.components import components
 from app.core.settings import settings
+from app.jobs.worker import ExtractionWorkerPool
 from app.logs import setup_logging
 from app.models.agents import UserStateStoreItem
+from app.storage.documents import DocumentNotFoundError
 from microsoft_agents.activity import ActivityTypes, ConversationUpdateTypes
-from microsoft_agents.hosting.core import TurnContext, TurnState
+from microsoft_agents.hosting.core import AgentApplication, TurnContext, TurnState
 
 logger = setup_logging(__name__)
 
 
-@copilot_apps["msteams"].error
 async def on_error(context: TurnContext, error: Exception) -> None:
     """
     Handle errors that occur during the bot's operation.
@@ -32,9 +37,6 @@ async def on_error(context: TurnContext, error: Exception) -> None:
         logger.info(f"Response stream has already ended: '{e}'")
 
 
-@copilot_apps["msteams"].activity(
-    ConversationUpdateTypes.MEMBERS_ADDED, auth_handlers=auth_handlers["default"]
-)
 async def on_members_added(context: TurnContext, state: TurnState) -> None:
     """
     Handle members added activities.
@@ -55,9 +57,6 @@ async def on_members_added(context: TurnContext, state: TurnState) -> None:
     return True
 
 
-@copilot_apps["msteams"].activity(
-    ActivityTypes.message, auth_handlers=auth_handlers["default"]
-)
 async def on_message(context: TurnContext, state: TurnState) -> None:
     """
     Handle incoming message activities.
@@ -75,6 +74,9 @@ async def on_message(context: TurnContext, state: TurnState) -> None:
 
     # Configure context
     configure_context(context)
+    extraction_worker_pool: ExtractionWorkerPool = components.get(
+        "extraction_worker_pool"
+    )
 
     # Initialize activity for suggested actions
     suggested_action_handler = SuggestedActionHandler(
@@ -87,6 +89,9 @@ async def on_message(context: TurnContext, state: TurnState) -> None:
         default_value_factory=lambda: UserStateStoreItem(),
         target_cls=UserStateStoreItem,
     )
+    user_state_store_item = await MSTeamsHandler.migrate_legacy_documents(
+        user_state_store_item=user_state_store_item
+    )
 
     # Check for pre-defined command
     user_state_store_item, command = await MSTeamsHandler.handle_commands(
@@ -97,58 +102,83 @@ async def on_message(context: TurnContext, state: TurnState) -> None:
     if not command and len(context.activity.attachments or []) > 1:
         # Handle attachments
         user_state_store_item = await MSTeamsHandler.handle_attachments(
-            context=context, user_state_store_item=user_state_store_item
+            context=context,
+            user_state_store_item=user_state_store_item,
+            extraction_worker_pool=(
+                extraction_worker_pool if settings.JOB_QUEUE_ENABLED else None
+            ),
         )
 
-        # Add suggested actions for next steps to suggested action handler
-        suggested_action_handler.add_suggested_action(
-            title="Legal Descriptions and Discrepancies",
-            prompt=DocumentScenarios.LEGAL_DESCRIPTIONS_AND_DISCREPANCIES.value,
-        )
-        suggested_action_handler.add_suggested_action(
-            title="Summarize the Document",
-            prompt=DocumentScenarios.SUMMARIZE_DOCUMENT.value,
-        )
+        # Add suggested actions for next steps to suggested action handler if the document is ready
+        if not user_state_store_item.pending_job_id:
+            suggested_action_handler.add_suggested_action(
+                title="Legal Descriptions and Discrepancies",
+                prompt=DocumentScenarios.LEGAL_DESCRIPTIONS_AND_DISCREPANCIES.value,
+            )
+            suggested_action_handler.add_suggested_action(
+                title="Summarize the Document",
+                prompt=DocumentScenarios.SUMMARIZE_DOCUMENT.value,
+            )
 
     # Use agent to process user prompt if file is uploaded and instructions are set
     elif (
         not command
         and user_state_store_item.file_uploaded
-        and user_state_store_item.instructions
+        and user_state_store_item.instructions_reference
     ):
-        # Handle agent response
-        user_state_store_item, response = await MSTeamsHandler.handle_agent_response(
-            context=context, user_state_store_item=user_state_store_item
-        )
-
-        # Get suggested actions from agent
-        suggested_actions_response = await get_suggested_actions_from_agent(
-            user_input=context.activity.text,
-            agent_response=response,
-            agent_instructions=settings.INSTRUCTIONS_DOCUMENT_AGENT,
-        )
-        # Add suggested actions for next steps to suggested action handler
-        for suggested_action in suggested_actions_response.suggested_actions:
-            logger.info(
-                f"Adding suggested action: '{suggested_action.title}' with value: '{suggested_action.value}'"
+        try:
+            # Handle agent response
+            user_state_store_item, response = (
+                await MSTeamsHandler.handle_agent_response(
+                    context=context, user_state_store_item=user_state_store_item
+                )
             )
-            suggested_action_handler.add_suggested_action(
-                title=suggested_action.title,
-                prompt=suggested_action.prompt,
+        except DocumentNotFoundError as e:
+            # Ask user to upload expired document again
+            logger.warning(f"{e} Asking user to upload the file again.")
+            user_state_store_item = await MSTeamsHandler.handle_expired_document(
+                context=context, user_state_store_item=user_state_store_item
+            )
+            response = None
+
+        if response is not None:
+            # Get suggested actions from agent
+            suggested_actions_response = await get_suggested_actions_from_agent(
+                user_input=context.activity.text,
+                agent_response=response,
+                agent_instructions=settings.INSTRUCTIONS_DOCUMENT_AGENT,
             )
+            # Add suggested actions for next steps to suggested action handler
+            for suggested_action in suggested_actions_response.suggested_actions:
+                logger.info(
+                    f"Adding suggested action: '{suggested_action.title}' with value: '{suggested_action.value}'"
+                )
+                suggested_action_handler.add_suggested_action(
+                    title=suggested_action.title,
+                    prompt=suggested_action.prompt,
+                )
 
     # Use default response if file has not been uploaded yet
     else:
-        await MSTeamsHandler.handle_default_response(context=context)
+        extraction_job = (
+            await extraction_worker_pool.job_store.get(
+                user_state_store_item.pending_job_id
+            )
+            if user_state_store_item.pending_job_id
+            else None
+        )
+        await MSTeamsHandler.handle_default_response(
+            context=context, extraction_job=extraction_job
+        )
 
     # Send suggested actions if any
     await suggested_action_handler.send(context=context)
 
-    # Save store item back to state
+    # Save store item back to state if it changed
     suggested_actions = suggested_action_handler.get_suggested_actions()
     user_state_store_item.suggested_actions = suggested_actions
-    state.set_value(
-        path="ConversationState.user_state_store_item", value=user_state_store_item
+    await save_user_state_store_item(
+        context=context, state=state, user_state_store_item=user_state_store_item
     )
 
     # End response stream if active
@@ -158,7 +188,6 @@ async def on_message(context: TurnContext, state: TurnState) -> None:
         logger.info(f"Response stream has already ended: '{e}'")
 
 
-@copilot_apps["msteams"].on_sign_in_success
 async def on_sign_in_success(
     context: TurnContext, state: TurnState, handler_id: str = None
 ) -> None:
@@ -178,17 +207,23 @@ async def on_sign_in_success(
     )
 
 
-@copilot_apps["msteams"].on_turn
-async def on_turn(context: TurnContext, state: TurnState) -> None:
+def register_msteams_activities(
+    agent_app: AgentApplication[TurnState], auth_handlers: dict[str, list[str]]
+) -> None:
     """
-    Handle all turn activities.
+    Register the activity handlers of the Microsoft Teams channel.
 
-    :param context: The TurnContext object for the current turn.
-    :type context: TurnContext
-    :param state: The TurnState object for maintaining state across turns.
-    :type state: TurnState
+    :param agent_app: The AgentApplication of the channel.
+    :type agent_app: AgentApplication[TurnState]
+    :param auth_handlers: The authentication handler names by route.
+    :type auth_handlers: dict[str, list[str]]
     :return: None
     """
-    logger.info(
-        f"Received activity of type: '{context.activity.type}' from user: '{context.activity.from_property.id}', channel id: '{context.activity.channel_id}', activity id: '{context.activity.id}', conversation id: '{context.activity.conversation.id}'."
+    agent_app.error(on_error)
+    agent_app.activity(
+        ConversationUpdateTypes.MEMBERS_ADDED, auth_handlers=auth_handlers["default"]
+    )(on_members_added)
+    agent_app.activity(ActivityTypes.message, auth_handlers=auth_handlers["default"])(
+        on_message
     )
+    agent_app.on_sign_in_success(on_sign_in_success)
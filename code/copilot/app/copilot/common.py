@@ -2,14 +2,35 @@
 
 from app.agents.actions import SuggestedActionsAgent
 from app.core.settings import settings
+from app.files.progress import ProgressSink, format_progress_event
 from app.logs import setup_logging
-from app.models.agents import SuggestedActionsAgentResponse
+from app.models.agents import SuggestedActionsAgentResponse, UserStateStoreItem
 from app.models.attachments import AttachmentContent
+from app.models.documents import ProgressEvent
+from app.storage.cosmos import StorageConflictError
 from microsoft_agents.activity.attachment import Attachment
-from microsoft_agents.hosting.core import TurnContext
+from microsoft_agents.hosting.core import TurnContext, TurnState
+from opentelemetry import metrics, trace
 from pydantic import ValidationError
 
 logger = setup_logging(__name__)
+meter = metrics.get_meter(__name__)
+
+state_writes_counter = meter.create_counter(
+    name="copilot.state.writes",
+    unit="{write}",
+    description="Number of turns which persisted the user state.",
+)
+state_write_conflicts_counter = meter.create_counter(
+    name="copilot.state.writes.conflicts",
+    unit="{write}",
+    description="Number of user state writes rejected because another turn changed the state.",
+)
+state_writes_skipped_counter = meter.create_counter(
+    name="copilot.state.writes.skipped",
+    unit="{write}",
+    description="Number of turns which skipped persisting the unchanged user state.",
+)
 
 
 def configure_context(context: TurnContext):
@@ -188,3 +209,102 @@ async def stream_string_in_chunks(context: TurnContext, text: str):
 
         # Simulate delay for streaming effect
         await asyncio.sleep(0.1)
+
+
+def get_streaming_progress_sink(context: TurnContext) -> ProgressSink:
+    """
+    Create a progress sink which sends progress events as informative updates of the streaming response.
+
+    :param context: The TurnContext object for the current turn.
+    :type context: TurnContext
+    :return: The progress sink.
+    :rtype: ProgressSink
+    """
+
+    async def sink(event: ProgressEvent) -> None:
+        context.streaming_response.queue_informative_update(
+            format_progress_event(event)
+        )
+
+    return sink
+
+
+def set_user_state_store_item(
+    state: TurnState, user_state_store_item: UserStateStoreItem
+) -> bool:
+    """
+    Set the user state store item in the turn state if any of its fields
+    changed. Unchanged items are not set, so that the turn state detects no
+    change and skips the write to storage.
+
+    :param state: The TurnState object for maintaining state across turns.
+    :type state: TurnState
+    :param user_state_store_item: The UserStateStoreItem object for the current user.
+    :type user_state_store_item: UserStateStoreItem
+    :return: True if the item changed and will be persisted.
+    :rtype: bool
+    """
+    changed_fields = sorted(user_state_store_item.get_changed_fields())
+    trace.get_current_span().set_attribute("state.changed_fields", changed_fields)
+    if not changed_fields:
+        logger.info("User state is unchanged. Skipping state write.")
+        state_writes_skipped_counter.add(1)
+        return False
+
+    logger.info(f"User state fields changed: {changed_fields}.")
+    state_writes_counter.add(1)
+    state.set_value(
+        path="ConversationState.user_state_store_item", value=user_state_store_item
+    )
+    user_state_store_item.mark_clean()
+    return True
+
+
+async def save_user_state_store_item(
+    context: TurnContext, state: TurnState, user_state_store_item: UserStateStoreItem
+) -> bool:
+    """
+    Persist the user state store item if any of its fields changed. Writes are
+    conditional on the state read by the turn. If another turn changed the state
+    in the meantime, the state is reloaded, the fields changed by this turn are
+    applied to it and the write is retried.
+
+    :param context: The TurnContext object for the current turn.
+    :type context: TurnContext
+    :param state: The TurnState object for maintaining state across turns.
+    :type state: TurnState
+    :param user_state_store_item: The UserStateStoreItem object for the current user.
+    :type user_state_store_item: UserStateStoreItem
+    :return: True if the item changed and was persisted.
+    :rtype: bool
+    """
+    changed_fields = user_state_store_item.get_changed_fields()
+    for attempt in range(1, settings.STATE_WRITE_MAX_ATTEMPTS + 1):
+        if not set_user_state_store_item(
+            state=state, user_state_store_item=user_state_store_item
+        ):
+            return False
+        try:
+            await state.save(context)
+            return True
+        except StorageConflictError as e:
+            last_attempt = attempt == settings.STATE_WRITE_MAX_ATTEMPTS
+            state_write_conflicts_counter.add(
+                1, attributes={"outcome": "failed" if last_attempt else "retried"}
+            )
+            if last_attempt:
+                raise
+            logger.warning(f"{e} Reloading state (attempt {attempt}).")
+
+        # Apply changes of this turn to the state written by the other turn
+        await state.conversation.load(context, force=True)
+        current_user_state_store_item: UserStateStoreItem = state.get_value(
+            "ConversationState.user_state_store_item",
+            default_value_factory=lambda: UserStateStoreItem(),
+            target_cls=UserStateStoreItem,
+        )
+        current_user_state_store_item.apply_changes(
+            other=user_state_store_item, fields=changed_fields
+        )
+        user_state_store_item = current_user_state_store_item
+    return False
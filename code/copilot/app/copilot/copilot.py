@@ -1,20 +1,27 @@
 import os
 from typing import Any
 
+from app.copilot.activities_msteams import register_msteams_activities
 from app.copilot.configuration import get_copilot_configuration
+from app.copilot.idempotency import ActivityIdempotencyCache
+from app.copilot.jobs import create_extraction_worker_pool
+from app.copilot.middleware import ConversationLockMiddleware, IdempotencyMiddleware
+from app.core.components import ComponentContainer
+from app.core.locks import conversation_lock
 from app.core.settings import settings
 from app.logs import OpenTelemetryTranscriptLogger, setup_logging
-from azure.identity.aio import DefaultAzureCredential
+from app.storage.cache import get_uncached_storage
+from app.storage.documents import create_document_store
+from app.storage.factory import get_storage
 from microsoft_agents.authentication.msal import MsalConnectionManager
 from microsoft_agents.hosting.core import (
     AgentApplication,
     Authorization,
-    MemoryStorage,
+    Storage,
     TurnState,
 )
 from microsoft_agents.hosting.core.storage import TranscriptLoggerMiddleware
 from microsoft_agents.hosting.fastapi import CloudAdapter
-from microsoft_agents.storage.cosmos import CosmosDBStorage, CosmosDBStorageConfig
 
 logger = setup_logging(__name__)
 
@@ -50,7 +57,7 @@ def get_copilot_connection_manager(config: dict[str, Any]) -> MsalConnectionMana
 
 
 def get_copilot_app(
-    config: dict[str, Any], connection_manager: MsalConnectionManager
+    config: dict[str, Any], connection_manager: MsalConnectionManager, storage: Storage
 ) -> AgentApplication[TurnState]:
     """
     Create and return the AgentApplication instance.
@@ -59,46 +66,27 @@ def get_copilot_app(
     :type config: dict[str, Any]
     :param connection_manager: The MsalConnectionManager instance.
     :type connection_manager: MsalConnectionManager
+    :param storage: The storage shared by all copilot apps.
+    :type storage: Storage
     :return: The AgentApplication instance.
     :rtype: AgentApplication[TurnState]
     """
-    # Configure storage
-    logger.info("Configuring storage for Copilot")
-    if settings.AZURE_COSMOS_KEY:
-        auth_key = settings.AZURE_COSMOS_KEY
-        credential = None
-        url = ""
-    else:
-        auth_key = "UNDEFINED"
-        credential = DefaultAzureCredential(
-            managed_identity_client_id=settings.MANAGED_IDENTITY_CLIENT_ID,
-        )
-        url = settings.AZURE_COSMOS_ENDPOINT
-    logger.info(f"Credential: {credential}")
-    storage = (
-        CosmosDBStorage(
-            config=CosmosDBStorageConfig(
-                cosmos_db_endpoint=settings.AZURE_COSMOS_ENDPOINT,
-                auth_key=auth_key,
-                database_id=settings.AZURE_COSMOS_DATABASE_ID,
-                container_id=settings.AZURE_COSMOS_CONTAINER_ID,
-                cosmos_client_options=None,
-                container_throughput=0,
-                key_suffix="",
-                compatibility_mode=False,
-                url=url,
-                credential=credential,
-            )
-        )
-        if settings.AZURE_COSMOS_ENDPOINT
-        else MemoryStorage()
-    )
-
     # Configure connection manager and adapter
     logger.info("Configuring connection manager and adapter for Copilot")
     cloud_adapter = CloudAdapter(
         connection_manager=connection_manager,
     )
+    if settings.IDEMPOTENCY_ENABLED:
+        cloud_adapter.use(
+            IdempotencyMiddleware(
+                idempotency_cache=ActivityIdempotencyCache(
+                    storage=get_uncached_storage(storage),
+                    ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS,
+                    instance_id=settings.WEBSITE_INSTANCE_ID,
+                )
+            )
+        )
+    cloud_adapter.use(ConversationLockMiddleware(keyed_lock=conversation_lock))
     # cloud_adapter.use(middleware=TranscriptLoggerMiddleware(logger=OpenTelemetryTranscriptLogger())) # Not required because of FastAPI instrumentation
 
     # Configure authorization
@@ -124,7 +112,7 @@ def get_copilot_app(
 
 
 def get_copilot_apps(
-    config: dict[str, Any], connection_manager: MsalConnectionManager
+    config: dict[str, Any], connection_manager: MsalConnectionManager, storage: Storage
 ) -> dict[str, AgentApplication[TurnState]]:
     """
     Get a dictionary of copilot apps for different channels.
@@ -133,15 +121,17 @@ def get_copilot_apps(
     :type config: dict[str, Any]
     :param connection_manager: The MsalConnectionManager instance.
     :type connection_manager: MsalConnectionManager
+    :param storage: The storage shared by all copilot apps.
+    :type storage: Storage
     :return: A dictionary mapping channel names to AgentApplication instances.
     :rtype: dict[str, AgentApplication[TurnState]]
     """
     logger.info("Getting Copilot apps for channels")
     teams_copilot_app = get_copilot_app(
-        config=config, connection_manager=connection_manager
+        config=config, connection_manager=connection_manager, storage=storage
     )
     default_copilot_app = get_copilot_app(
-        config=config, connection_manager=connection_manager
+        config=config, connection_manager=connection_manager, storage=storage
     )
 
     logger.info("Configured Copilot apps for channels")
@@ -152,12 +142,12 @@ def get_copilot_apps(
     }
 
 
-def get_auth_handlers() -> list[str]:
+def get_auth_handlers() -> dict[str, list[str]]:
     """
     Get the authentication handlers for the copilot app.
 
-    :return: A list of authentication handler names.
-    :rtype: list[str]
+    :return: The authentication handler names by route.
+    :rtype: dict[str, list[str]]
     """
     logger.info("Getting authentication handlers for Copilot")
     auth_handlers = {"default": ["GRAPH"]}
@@ -165,8 +155,46 @@ def get_auth_handlers() -> list[str]:
     return auth_handlers
 
 
-# Initialize Copilot components
-config = get_copilot_configuration_as_dict()
-connection_manager = get_copilot_connection_manager(config=config)
-copilot_apps = get_copilot_apps(config=config, connection_manager=connection_manager)
-auth_handlers = get_auth_handlers()
+def register_copilot_components(container: ComponentContainer) -> None:
+    """
+    Register the factories of the Copilot components, which are created on
+    first use or when the container is initialized by the lifespan.
+
+    :param container: The component container.
+    :type container: ComponentContainer
+    :return: None
+    """
+    container.register("copilot_configuration", get_copilot_configuration_as_dict)
+    container.register(
+        "connection_manager",
+        lambda: get_copilot_connection_manager(
+            config=container.get("copilot_configuration")
+        ),
+    )
+    container.register(
+        "storage",
+        lambda: get_storage(
+            container_id=settings.AZURE_COSMOS_CONTAINER_ID,
+            cached=settings.STORAGE_CACHE_ENABLED,
+        ),
+    )
+    container.register("document_store", create_document_store)
+    container.register("auth_handlers", get_auth_handlers)
+
+    def create_copilot_apps() -> dict[str, AgentApplication[TurnState]]:
+        copilot_apps = get_copilot_apps(
+            config=container.get("copilot_configuration"),
+            connection_manager=container.get("connection_manager"),
+            storage=container.get("storage"),
+        )
+        register_msteams_activities(
+            agent_app=copilot_apps["msteams"],
+            auth_handlers=container.get("auth_handlers"),
+        )
+        return copilot_apps
+
+    container.register("copilot_apps", create_copilot_apps)
+    container.register(
+        "extraction_worker_pool",
+        lambda: create_extraction_worker_pool(storage=container.get("storage")),
+    )
@@ -1,25 +1,53 @@
+import json
 from typing import Tuple
 
 from agents.exceptions import ModelBehaviorError
 from app.agents.document import DocumentAgent
+from app.agents.mapreduce import MapReduceAgent
+from app.copilot.action import SuggestedActionHandler
 from app.copilot.common import (
     filter_attachments_by_type,
     get_html_from_attachment,
+    get_streaming_progress_sink,
+    save_user_state_store_item,
     stream_string_in_chunks,
 )
 from app.copilot.handler_abstract import AbstractHandler
 from app.copilot.scenarios import DocumentScenarioInstructions, DocumentScenarios
+from app.core.components import components
+from app.core.executor import run_cpu_bound
 from app.core.settings import settings
-from app.files.extraction import FileExtractionClient
+from app.files.codecs import decompress_string
+from app.files.pipeline import DocumentProcessor
+from app.files.progress import ProgressReporter
+from app.files.retrieval import DocumentIndex, format_passages, get_embedding_provider
+from app.files.sections import SectionIndex, format_slice
+from app.files.tokens import (
+    estimate_tokens,
+    get_context_budget,
+    select_processing_strategy,
+)
+from app.jobs.worker import ExtractionWorkerPool
 from app.logs import setup_logging
 from app.models.agents import UserStateStoreItem
 from app.models.attachments import AttachmentContent
-from microsoft_agents.hosting.core import TurnContext
+from app.models.core import ProcessingStrategy
+from app.models.documents import ProcessedDocument
+from app.models.jobs import ExtractionJob
+from app.storage.documents import DocumentNotFoundError, DocumentStore
+from microsoft_agents.hosting.core import TurnContext, TurnState
 from openai import APIError, BadRequestError
 from pydantic import ValidationError
 
 logger = setup_logging(__name__)
 
+PROCESSING_STRATEGY_DESCRIPTIONS = {
+    ProcessingStrategy.FULL_CONTEXT: "The whole document fits into my context.",
+    ProcessingStrategy.COMPACTED: "The whole compacted document fits into my context.",
+    ProcessingStrategy.RETRIEVAL: "I will answer your questions based on the most relevant passages of the document.",
+    ProcessingStrategy.MAP_REDUCE: "The document exceeds my context, so I will read it part by part for summaries and answer other questions based on the most relevant passages.",
+}
+
 
 class MSTeamsHandler(AbstractHandler):
     """
@@ -60,10 +88,7 @@ async def handle_commands(
                 )
 
                 # Reset user state
-                user_state_store_item.file_uploaded = False
-                user_state_store_item.instructions = None
-                user_state_store_item.last_response_id = None
-                user_state_store_item.suggested_actions = {}
+                user_state_store_item.reset()
 
                 # Update user that we have
                 await stream_string_in_chunks(
@@ -83,22 +108,27 @@ async def handle_commands(
 
     @staticmethod
     async def handle_attachments(
-        context: TurnContext, user_state_store_item: UserStateStoreItem
+        context: TurnContext,
+        user_state_store_item: UserStateStoreItem,
+        extraction_worker_pool: ExtractionWorkerPool | None = None,
     ) -> UserStateStoreItem:
         """
-        Handle attachments in the TurnContext for document processing.
+        Handle attachments in the TurnContext for document processing. If a worker
+        pool is provided, the document is processed by a background job and the
+        user is notified proactively once the document is ready.
 
         :param context: The TurnContext object for the current turn.
         :type context: TurnContext
         :param user_state_store_item: The UserStateStoreItem object for the current user.
         :type user_state_store_item: UserStateStoreItem
+        :param extraction_worker_pool: The worker pool processing extraction jobs in the background.
+        :type extraction_worker_pool: ExtractionWorkerPool | None
         :return: The updated UserStateStoreItem object after processing attachments.
         :rtype: UserStateStoreItem
         """
         # Update user that we detected a file attachment
-        await stream_string_in_chunks(
-            context=context,
-            text="I see that you just uploaded new files. Let me process them... ",
+        context.streaming_response.queue_informative_update(
+            "I see that you just uploaded new files. Let me process them... "
         )
 
         # Filter attachments for document processing
@@ -122,72 +152,48 @@ async def handle_attachments(
                 f"Supported attachments detected. Count: {len(supported_attachments)}"
             )
 
-            # Create file extraction client
-            file_extraction_client = FileExtractionClient(
-                api_key=settings.AZURE_DOCUMENT_INTELLIGENCE_API_KEY,
-                endpoint=settings.AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT,
-                managed_identity_client_id=settings.MANAGED_IDENTITY_CLIENT_ID,
-            )
-
-            # Process each supported attachment
-            for attachment in supported_attachments:
-                logger.info(f"Processing attachment: {attachment.name}")
-
-                # Update user about processing of each file
-                await stream_string_in_chunks(
-                    context=context,
-                    text=f"\n\nProcessing file `{attachment.name}` ... ",
+            # Only process the first supported attachment for now
+            attachment = supported_attachments[0]
+            attachment_content = AttachmentContent.model_validate(attachment.content)
+
+            if extraction_worker_pool:
+                # Queue extraction job
+                job = await extraction_worker_pool.submit(
+                    conversation_reference=context.activity.get_conversation_reference().model_dump(
+                        mode="json", by_alias=True, exclude_none=True
+                    ),
+                    attachment_name=attachment.name,
+                    download_url=attachment_content.download_url,
                 )
+                user_state_store_item.pending_job_id = job.job_id
                 await stream_string_in_chunks(
-                    context=context, text="\n(  0%) Loading file ... "
-                )
-
-                # Loading file content
-                attachment_content = AttachmentContent.model_validate(
-                    attachment.content
+                    context=context,
+                    text=f"File `{attachment.name}` has been queued for processing (job `{job.job_id}`). I will send you a message as soon as the document is ready. ",
                 )
-
-                # Extract text from file using FileExtractionClient
-                await stream_string_in_chunks(
-                    context=context, text="\n(  5%) Extracting text from file ... "
+            else:
+                # Process document within the current turn and report progress as informative updates
+                context.streaming_response.queue_informative_update(
+                    f"Processing file '{attachment.name}' ... "
                 )
-                extracted_data = await file_extraction_client.extract_data(
-                    file_url=attachment_content.download_url
+                document_processor = DocumentProcessor(
+                    progress=ProgressReporter(
+                        sinks=[get_streaming_progress_sink(context=context)],
+                        min_interval_seconds=settings.PROGRESS_UPDATE_INTERVAL_SECONDS,
+                    )
                 )
-                logger.debug(
-                    f"Extracted Data from file {attachment.name}: {extracted_data}"
+                processed_document = await document_processor.process(
+                    attachment_name=attachment.name,
+                    download_url=attachment_content.download_url,
                 )
-
-                # TODO: Check for harmful content in extracted data which could impact the agent response.
-
-                # Clean extracted data
                 await stream_string_in_chunks(
-                    context=context, text="\n( 80%) Cleaning extracted data ... "
-                )
-                cleaned_data, _ = await file_extraction_client.clean_extracted_data(
-                    data=extracted_data,
-                    keep_paragraphs=False,
-                    keep_tables=False,
-                    summarize_tables=False,
-                    api_key=settings.AZURE_OPENAI_API_KEY,
-                    endpoint=settings.AZURE_OPENAI_ENDPOINT,
-                    model_name=settings.AZURE_OPENAI_MODEL_SLM_NAME,
-                    instructions=settings.INSTRUCTIONS_TABLE_SUMMARY_AGENT,
-                    reasoning_effort="minimal",
-                )
-                logger.debug(
-                    f"Cleaned Data from file {attachment.name}: {cleaned_data}"
+                    context=context,
+                    text=f"File `{attachment.name}` has been processed.\n\n{MSTeamsHandler._get_processed_document_message(processed_document)}\n",
                 )
-
-                # Update user about completion of file processing
-                logger.info(f"Attachment '{attachment.name}' processed successfully.")
-                await stream_string_in_chunks(
-                    context=context, text="\n(100%) File processing completed.\n"
+                MSTeamsHandler._apply_processed_document(
+                    user_state_store_item=user_state_store_item,
+                    processed_document=processed_document,
                 )
 
-                # Only process the first supported attachment for now
-                break
-
             # Update user about not processed documents
             supported_attachments_names = [
                 attachment.name for attachment in supported_attachments
@@ -197,14 +203,6 @@ async def handle_attachments(
                     context=context,
                     text=f"\n\nNote: I could see that you uploaded the following supported files: {supported_attachments_names}. However, I only support one document at a time. Only the first item has been added to the context (`{supported_attachments[0].name}`). You can upload a new file at any time to replace it. ",
                 )
-
-            # Encode instructions with extracted data
-            instructions = settings.INSTRUCTIONS_DOCUMENT_AGENT + f"\n{cleaned_data}"
-            compressed_instructions = FileExtractionClient.compress_string(instructions)
-
-            # Update store item
-            user_state_store_item.file_uploaded = True
-            user_state_store_item.instructions = compressed_instructions
         else:
             logger.info("No supported attachments detected.")
             await stream_string_in_chunks(
@@ -229,6 +227,167 @@ async def handle_attachments(
 
         return user_state_store_item
 
+    @staticmethod
+    async def handle_extraction_job_result(
+        context: TurnContext,
+        state: TurnState,
+        job: ExtractionJob,
+        processed_document: ProcessedDocument | None,
+    ) -> None:
+        """
+        Handle the result of a background extraction job in a proactive turn.
+
+        :param context: The TurnContext object for the proactive turn.
+        :type context: TurnContext
+        :param state: The loaded TurnState object of the conversation.
+        :type state: TurnState
+        :param job: The finished extraction job.
+        :type job: ExtractionJob
+        :param processed_document: The processed document or None if the job failed.
+        :type processed_document: ProcessedDocument | None
+        :return: None
+        :rtype: None
+        """
+        # Load user state
+        user_state_store_item: UserStateStoreItem = state.get_value(
+            "ConversationState.user_state_store_item",
+            default_value_factory=lambda: UserStateStoreItem(),
+            target_cls=UserStateStoreItem,
+        )
+
+        # Skip jobs which were replaced by a newer upload or a restart
+        if user_state_store_item.pending_job_id != job.job_id:
+            logger.info(
+                f"Extraction job '{job.job_id}' has been superseded. Skipping result."
+            )
+            return
+
+        # Update user about failed jobs
+        user_state_store_item.pending_job_id = None
+        if processed_document is None:
+            await context.send_activity(
+                f"I'm sorry, but I could not process the file `{job.attachment_name}` (job `{job.job_id}`). Please upload the file again."
+            )
+        else:
+            MSTeamsHandler._apply_processed_document(
+                user_state_store_item=user_state_store_item,
+                processed_document=processed_document,
+            )
+            await context.send_activity(
+                f"The file `{job.attachment_name}` has been processed and is ready (job `{job.job_id}`). {MSTeamsHandler._get_processed_document_message(processed_document)}"
+            )
+
+            # Send suggested actions for next steps
+            suggested_action_handler = SuggestedActionHandler(
+                to=[context.activity.from_property.id]
+            )
+            suggested_action_handler.add_suggested_action(
+                title="Legal Descriptions and Discrepancies",
+                prompt=DocumentScenarios.LEGAL_DESCRIPTIONS_AND_DISCREPANCIES.value,
+            )
+            suggested_action_handler.add_suggested_action(
+                title="Summarize the Document",
+                prompt=DocumentScenarios.SUMMARIZE_DOCUMENT.value,
+            )
+            await suggested_action_handler.send(context=context)
+            user_state_store_item.suggested_actions = (
+                suggested_action_handler.get_suggested_actions()
+            )
+
+        # Save store item back to state if it changed
+        await save_user_state_store_item(
+            context=context, state=state, user_state_store_item=user_state_store_item
+        )
+
+    @staticmethod
+    def _apply_processed_document(
+        user_state_store_item: UserStateStoreItem,
+        processed_document: ProcessedDocument,
+    ) -> None:
+        """
+        Replace the document in the user state with a processed document.
+
+        :param user_state_store_item: The UserStateStoreItem object for the current user.
+        :type user_state_store_item: UserStateStoreItem
+        :param processed_document: The processed document.
+        :type processed_document: ProcessedDocument
+        :return: None
+        :rtype: None
+        """
+        user_state_store_item.file_uploaded = True
+        user_state_store_item.instructions_reference = (
+            processed_document.instructions_reference
+        )
+        user_state_store_item.content_offset = processed_document.content_offset
+        user_state_store_item.token_estimate = processed_document.token_estimate
+        user_state_store_item.processing_strategy = (
+            processed_document.processing_strategy.value
+        )
+        user_state_store_item.document_index_reference = (
+            processed_document.document_index_reference
+        )
+        user_state_store_item.section_index_reference = (
+            processed_document.section_index_reference
+        )
+        user_state_store_item.legacy_documents = {}
+
+    @staticmethod
+    async def _load_document(reference: str) -> str:
+        """
+        Load a document or index referenced by the user state from the document store.
+
+        :param reference: The reference of the document.
+        :type reference: str
+        :return: The content of the document.
+        :rtype: str
+        :raises DocumentNotFoundError: If the document does not exist, e.g. after it expired.
+        """
+        document_store: DocumentStore = components.get("document_store")
+        content = await document_store.get(reference)
+        if content is None:
+            raise DocumentNotFoundError(reference)
+        return content
+
+    @staticmethod
+    async def migrate_legacy_documents(
+        user_state_store_item: UserStateStoreItem,
+    ) -> UserStateStoreItem:
+        """
+        Move compressed documents embedded in the user state by previous versions
+        to the document store and keep references instead.
+
+        :param user_state_store_item: The UserStateStoreItem object for the current user.
+        :type user_state_store_item: UserStateStoreItem
+        :return: The updated UserStateStoreItem object.
+        :rtype: UserStateStoreItem
+        """
+        document_store: DocumentStore = components.get("document_store")
+        for key, compressed in list(user_state_store_item.legacy_documents.items()):
+            logger.info(f"Moving '{key}' from user state to document store.")
+            reference = await document_store.put(
+                await run_cpu_bound(decompress_string, compressed)
+            )
+            setattr(user_state_store_item, f"{key}_reference", reference)
+            del user_state_store_item.legacy_documents[key]
+        return user_state_store_item
+
+    @staticmethod
+    def _get_processed_document_message(processed_document: ProcessedDocument) -> str:
+        """
+        Describe the size and the processing strategy of a processed document.
+
+        :param processed_document: The processed document.
+        :type processed_document: ProcessedDocument
+        :return: The message for the user.
+        :rtype: str
+        """
+        compaction_message = (
+            f"Compaction saved ~{processed_document.tokens_saved:,} tokens ({processed_document.tokens_saved_ratio:.0%}). "
+            if processed_document.tokens_saved is not None
+            else ""
+        )
+        return f"Estimated size: ~{processed_document.token_estimate:,} tokens ({processed_document.token_estimate / get_context_budget():.0%} of my context). {compaction_message}{PROCESSING_STRATEGY_DESCRIPTIONS[processed_document.processing_strategy]}"
+
     @staticmethod
     async def handle_agent_response(
         context: TurnContext, user_state_store_item: UserStateStoreItem
@@ -248,21 +407,6 @@ async def handle_agent_response(
             "Let me think about that... "
         )
 
-        # Decompress instructions before creating the agent
-        decompressed_instructions = FileExtractionClient.decompress_string(
-            user_state_store_item.instructions
-        )
-
-        # Create agent
-        agent = DocumentAgent(
-            api_key=settings.AZURE_OPENAI_API_KEY,
-            endpoint=settings.AZURE_OPENAI_ENDPOINT,
-            model_name=settings.AZURE_OPENAI_MODEL_NAME,
-            instructions=decompressed_instructions,
-            managed_identity_client_id=settings.MANAGED_IDENTITY_CLIENT_ID,
-            reasoning_effort="none",
-        )
-
         # Define user prompt
         user_prompt = (
             context.activity.text
@@ -291,6 +435,134 @@ async def handle_agent_response(
         # except ValidationError as e:
         #     logger.info(f"User prompt does not match any predefined scenario. Proceeding with default instructions.")
 
+        # Select processing strategy for documents uploaded before strategies were estimated
+        if user_state_store_item.processing_strategy is None:
+            instructions = await MSTeamsHandler._load_document(
+                user_state_store_item.instructions_reference
+            )
+            user_state_store_item.token_estimate = estimate_tokens(instructions)
+            user_state_store_item.processing_strategy = select_processing_strategy(
+                instructions=instructions
+            ).value
+        processing_strategy = ProcessingStrategy(
+            user_state_store_item.processing_strategy
+        )
+        logger.info(
+            f"Using processing strategy '{processing_strategy.value}' for document with {user_state_store_item.token_estimate} estimated tokens."
+        )
+
+        # Check for whole-document scenarios
+        try:
+            document_scenario = DocumentScenarios(user_prompt)
+        except ValueError:
+            document_scenario = None
+
+        # Check for questions targeting a section or page range
+        section_index = (
+            SectionIndex.from_string(
+                await MSTeamsHandler._load_document(
+                    user_state_store_item.section_index_reference
+                )
+            )
+            if user_state_store_item.section_index_reference
+            else None
+        )
+        document_slice = (
+            section_index.resolve(user_prompt)
+            if section_index and not document_scenario
+            else None
+        )
+
+        # Whole-document tasks need the full document instead of retrieved passages
+        fits_context = user_state_store_item.token_estimate <= get_context_budget()
+
+        # Use map-reduce for whole-document tasks on documents exceeding the context
+        # and answer other questions from retrieved passages if the document is indexed
+        if (
+            settings.MAP_REDUCE_ENABLED
+            and not document_slice
+            and (
+                processing_strategy == ProcessingStrategy.MAP_REDUCE
+                or (
+                    processing_strategy == ProcessingStrategy.RETRIEVAL
+                    and not fits_context
+                )
+            )
+            and (
+                document_scenario or not user_state_store_item.document_index_reference
+            )
+        ):
+            return await MSTeamsHandler._handle_map_reduce_response(
+                context=context,
+                user_state_store_item=user_state_store_item,
+                task=(
+                    DocumentScenarioInstructions.INSTRUCTIONS[document_scenario]
+                    if document_scenario
+                    else user_prompt
+                ),
+            )
+
+        # Select document context for the agent instructions
+        if document_slice:
+            logger.info(
+                f"User prompt targets {document_slice.description} on pages {document_slice.page_start}-{document_slice.page_end}. Using document slice."
+            )
+            content = section_index.get_content(
+                await MSTeamsHandler._load_document(
+                    user_state_store_item.instructions_reference
+                )
+            )
+            instructions = (
+                settings.INSTRUCTIONS_DOCUMENT_EXCERPT_AGENT
+                + f"\n{format_slice(document_slice=document_slice, content=content)}"
+            )
+
+            # Process slices exceeding the context like oversized documents, restricted to the slice
+            slice_tokens = estimate_tokens(instructions)
+            if slice_tokens > get_context_budget():
+                if settings.MAP_REDUCE_ENABLED:
+                    logger.info(
+                        f"Document slice with {slice_tokens} estimated tokens exceeds the context. Using map-reduce over the slice."
+                    )
+                    return await MSTeamsHandler._handle_map_reduce_response(
+                        context=context,
+                        user_state_store_item=user_state_store_item,
+                        task=user_prompt,
+                        content=content[
+                            document_slice.offset_start : document_slice.offset_end
+                        ],
+                    )
+                if user_state_store_item.document_index_reference:
+                    logger.info(
+                        f"Document slice with {slice_tokens} estimated tokens exceeds the context. Retrieving relevant passages of the slice."
+                    )
+                    instructions = await MSTeamsHandler._retrieve_passages(
+                        user_prompt=user_prompt,
+                        user_state_store_item=user_state_store_item,
+                        page_range=(document_slice.page_start, document_slice.page_end),
+                    )
+        elif user_state_store_item.document_index_reference and not (
+            document_scenario and fits_context
+        ):
+            instructions = await MSTeamsHandler._retrieve_passages(
+                user_prompt=user_prompt, user_state_store_item=user_state_store_item
+            )
+        else:
+            # Load instructions before creating the agent
+            instructions = await MSTeamsHandler._load_document(
+                user_state_store_item.instructions_reference
+            )
+
+        # Create agent
+        agent = DocumentAgent(
+            api_key=settings.AZURE_OPENAI_API_KEY,
+            endpoint=settings.AZURE_OPENAI_ENDPOINT,
+            model_name=settings.AZURE_OPENAI_MODEL_NAME,
+            instructions=instructions,
+            managed_identity_client_id=settings.MANAGED_IDENTITY_CLIENT_ID,
+            reasoning_effort="none",
+        )
+
         # Stream agent response
         logger.info(
             f"Streaming agent response with previous response id '{user_state_store_item.last_response_id}'."
@@ -307,18 +579,155 @@ async def handle_agent_response(
         return user_state_store_item, response
 
     @staticmethod
-    async def handle_default_response(context: TurnContext) -> None:
+    async def _retrieve_passages(
+        user_prompt: str,
+        user_state_store_item: UserStateStoreItem,
+        page_range: tuple[int, int] | None = None,
+    ) -> str:
+        """
+        Retrieve the passages most relevant to the user prompt from the document index.
+
+        :param user_prompt: The prompt of the user.
+        :type user_prompt: str
+        :param user_state_store_item: The UserStateStoreItem object for the current user.
+        :type user_state_store_item: UserStateStoreItem
+        :param page_range: The first and last page of the passages, if restricted.
+        :type page_range: tuple[int, int] | None
+        :return: The agent instructions including the passages.
+        :rtype: str
+        """
+        logger.info("Retrieving relevant passages from document index.")
+        document_index = DocumentIndex.from_string(
+            await MSTeamsHandler._load_document(
+                user_state_store_item.document_index_reference
+            )
+        )
+        passages = await document_index.search(
+            query=user_prompt,
+            embedding_provider=get_embedding_provider(),
+            top_k=settings.RETRIEVAL_TOP_K,
+            alpha=settings.RETRIEVAL_HYBRID_ALPHA,
+            page_range=page_range,
+        )
+        logger.info(
+            f"Using {len(passages)} passages from pages {sorted({passage.chunk.page_number for passage in passages})}."
+        )
+        return (
+            settings.INSTRUCTIONS_DOCUMENT_RETRIEVAL_AGENT
+            + f"\n{format_passages(passages)}"
+        )
+
+    @staticmethod
+    async def _handle_map_reduce_response(
+        context: TurnContext,
+        user_state_store_item: UserStateStoreItem,
+        task: str,
+        content: str = None,
+    ) -> Tuple[UserStateStoreItem, str]:
+        """
+        Handle agent response by running a task over the whole document or a
+        part of it with map-reduce.
+
+        :param context: The TurnContext object for the current turn.
+        :type context: TurnContext
+        :param user_state_store_item: The UserStateStoreItem object for the current user.
+        :type user_state_store_item: UserStateStoreItem
+        :param task: The task to run over the document.
+        :type task: str
+        :param content: The part of the document content to process, or None for the whole document.
+        :type content: str
+        :return: The updated UserStateStoreItem object after processing the agent response and the string response.
+        :rtype: Tuple[UserStateStoreItem, string]
+        """
+        # Load document content from instructions
+        if content is None:
+            instructions = await MSTeamsHandler._load_document(
+                user_state_store_item.instructions_reference
+            )
+            content_offset = user_state_store_item.content_offset
+            if content_offset is None:
+                # Documents uploaded before the offset was recorded
+                content_offset = instructions.find('\n{"content":') + 1
+            content = json.loads(instructions[content_offset:]).get("content", "")
+
+        # Create agent
+        logger.info(
+            f"Using map-reduce to process {len(content)} characters of the document."
+        )
+        agent = MapReduceAgent(
+            api_key=settings.AZURE_OPENAI_API_KEY,
+            endpoint=settings.AZURE_OPENAI_ENDPOINT,
+            map_model_name=settings.AZURE_OPENAI_MODEL_SLM_NAME,
+            reduce_model_name=settings.AZURE_OPENAI_MODEL_NAME,
+            task=task,
+            managed_identity_client_id=settings.MANAGED_IDENTITY_CLIENT_ID,
+            max_chunk_tokens=settings.MAP_REDUCE_CHUNK_MAX_TOKENS,
+            max_reduce_tokens=settings.MAP_REDUCE_REDUCE_MAX_TOKENS,
+            max_concurrency=settings.MAP_REDUCE_MAX_CONCURRENCY,
+        )
+
+        # Stream agent response
+        last_response_id, response = await agent.stream_response(
+            content=content,
+            context=context,
+            last_response_id=user_state_store_item.last_response_id,
+        )
+
+        # Update store item
+        user_state_store_item.last_response_id = last_response_id
+
+        return user_state_store_item, response
+
+    @staticmethod
+    async def handle_expired_document(
+        context: TurnContext, user_state_store_item: UserStateStoreItem
+    ) -> UserStateStoreItem:
+        """
+        Handle a document which is no longer available, e.g. because it expired
+        after it had not been used for a while.
+
+        :param context: The TurnContext object for the current turn.
+        :type context: TurnContext
+        :param user_state_store_item: The UserStateStoreItem object for the current user.
+        :type user_state_store_item: UserStateStoreItem
+        :return: The reset UserStateStoreItem object.
+        :rtype: UserStateStoreItem
+        """
+        user_state_store_item.reset()
+        await stream_string_in_chunks(
+            context,
+            "The document of this conversation is no longer available because it has not been used for a while. Please upload the file again to continue.",
+        )
+        return user_state_store_item
+
+    @staticmethod
+    async def handle_default_response(
+        context: TurnContext, extraction_job: ExtractionJob = None
+    ) -> None:
         """
         Handle default response when no file has been uploaded.
 
         :param context: The TurnContext object for the current turn.
         :type context: TurnContext
+        :param extraction_job: The pending extraction job of the user if any.
+        :type extraction_job: ExtractionJob
         :return: None
         :rtype: None
         """
-        await stream_string_in_chunks(
-            context, "Please upload a PDF file before we proceed."
-        )
+        if extraction_job and extraction_job.is_pending:
+            progress_message = (
+                f" Current progress: {extraction_job.progress}"
+                if extraction_job.progress
+                else ""
+            )
+            await stream_string_in_chunks(
+                context,
+                f"Your document is still being processed (job `{extraction_job.job_id}`).{progress_message} I will send you a message as soon as it is ready.",
+            )
+        else:
+            await stream_string_in_chunks(
+                context, "Please upload a PDF file before we proceed."
+            )
 
     @staticmethod
     async def handle_error_response(context: TurnContext, error: Exception) -> None:
@@ -338,15 +747,6 @@ async def handle_error_response(context: TurnContext, error: Exception) -> None:
         )
 
         match error:
-            case APIError() as api_error:
-                # Capture OpenAI APIError specifically
-                logger.error(f"OpenAI APIError occurred: {api_error}", exc_info=True)
-
-                await stream_string_in_chunks(
-                    context,
-                    "I'm sorry, but I encountered an issue while trying to process your request. Please try again in a few moments.",
-                )
-
             case BadRequestError() as bad_request_error:
                 # Capture OpenAI BadRequestError specifically
                 logger.error(
@@ -357,13 +757,22 @@ async def handle_error_response(context: TurnContext, error: Exception) -> None:
                 if bad_request_error.code == "string_above_max_length":
                     await stream_string_in_chunks(
                         context,
-                        "The document is too large for me to process. Please upload a smaller document to proceed.",
+                        "The document is too large for me to answer this question at once. Please ask about a specific section or page range, ask me to summarize the document or upload a smaller document to proceed.",
                     )
                 else:
                     await stream_string_in_chunks(
                         context,
                         "I'm sorry, but I encountered an issue while trying to process your request. Please try again later.",
                     )
+            case APIError() as api_error:
+                # Capture OpenAI APIError specifically
+                logger.error(f"OpenAI APIError occurred: {api_error}", exc_info=True)
+
+                await stream_string_in_chunks(
+                    context,
+                    "I'm sorry, but I encountered an issue while trying to process your request. Please try again in a few moments.",
+                )
+
             case ModelBehaviorError() as model_behavior_error:
                 # Capture ModelBehaviorError specifically
                 logger.error(
@@ -0,0 +1,196 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+from app.logs import setup_logging
+from app.models.activities import ProcessedActivity
+from app.models.storage import ItemMetadata
+from app.storage.cosmos import CosmosDBMetadataStorage, StorageConflictError
+from app.storage.instrumentation import InstrumentedStorage
+from microsoft_agents.hosting.core import Storage
+from opentelemetry import metrics
+
+logger = setup_logging(__name__)
+meter = metrics.get_meter(__name__)
+
+duplicate_activities_counter = meter.create_counter(
+    name="copilot.activities.duplicates",
+    unit="{activity}",
+    description="Number of duplicate activities which were not processed again by source (in_flight, memory or storage).",
+)
+
+
+class ActivityIdempotencyCache:
+    """
+    Cache which processes every activity once, e.g. when the Bot Connector
+    retries a slow turn. Duplicates of an activity in progress wait for the
+    original to finish, duplicates of processed activities return immediately.
+    Processed activities are remembered in memory and recorded in the storage
+    for duplicates which reach another replica. Records are created only if
+    they do not exist yet, so that of several replicas receiving the same
+    activity at the same time only one processes it.
+    """
+
+    def __init__(self, storage: Storage, ttl_seconds: float, instance_id: str):
+        """
+        Initialize the ActivityIdempotencyCache.
+
+        :param storage: The storage recording processed activities.
+        :type storage: Storage
+        :param ttl_seconds: The number of seconds during which duplicates are suppressed.
+        :type ttl_seconds: float
+        :param instance_id: The id of the instance recorded with processed activities.
+        :type instance_id: str
+        """
+        self.storage = storage
+        self.ttl_seconds = ttl_seconds
+        self.instance_id = instance_id
+        self._in_flight: dict[str, asyncio.Future] = {}
+        self._processed: OrderedDict[str, float] = OrderedDict()
+
+    @property
+    def supports_metadata(self) -> bool:
+        if isinstance(self.storage, InstrumentedStorage):
+            return self.storage.supports_metadata
+        return isinstance(self.storage, CosmosDBMetadataStorage)
+
+    @staticmethod
+    def get_key(conversation_id: str, activity_id: str) -> str:
+        return f"activities/{conversation_id}/{activity_id}"
+
+    def _purge(self) -> None:
+        now = time.monotonic()
+        while self._processed and next(iter(self._processed.values())) <= now:
+            self._processed.popitem(last=False)
+
+    def _remember(self, key: str) -> None:
+        self._processed[key] = time.monotonic() + self.ttl_seconds
+        self._processed.move_to_end(key)
+
+    async def _is_recorded(self, key: str) -> bool:
+        items = await self.storage.read([key], target_cls=ProcessedActivity)
+        processed_activity: ProcessedActivity = items.get(key)
+        return processed_activity is not None and not processed_activity.is_expired(
+            self.ttl_seconds
+        )
+
+    async def _record(self, key: str, processed_activity: ProcessedActivity) -> bool:
+        """
+        Record an activity in the storage unless another replica recorded it.
+        Storages without conditional writes are only used by a single process,
+        whose duplicates are detected in memory.
+
+        :param key: The storage key of the activity.
+        :type key: str
+        :param processed_activity: The record of the activity.
+        :type processed_activity: ProcessedActivity
+        :return: True if the activity was recorded, False if it was recorded by another replica.
+        :rtype: bool
+        """
+        if not self.supports_metadata:
+            if await self._is_recorded(key):
+                return False
+            await self.storage.write({key: processed_activity})
+            return True
+
+        try:
+            await self.storage.write({key: processed_activity}, create_only=True)
+            return True
+        except StorageConflictError:
+            pass
+
+        # Replace expired records, unless another replica replaced them first
+        metadata: dict[str, ItemMetadata] = {}
+        items = await self.storage.read(
+            [key], target_cls=ProcessedActivity, metadata=metadata
+        )
+        recorded_activity: ProcessedActivity = items.get(key)
+        if recorded_activity is not None and not recorded_activity.is_expired(
+            self.ttl_seconds
+        ):
+            return False
+        try:
+            if recorded_activity is None:
+                await self.storage.write({key: processed_activity}, create_only=True)
+            else:
+                await self.storage.write(
+                    {key: processed_activity},
+                    etags={key: metadata.get(key, ItemMetadata()).etag},
+                )
+        except StorageConflictError:
+            return False
+        return True
+
+    async def run_once(
+        self,
+        conversation_id: str,
+        activity_id: str,
+        logic: Callable[[], Awaitable],
+    ) -> bool:
+        """
+        Process an activity unless it has already been processed.
+
+        :param conversation_id: The id of the conversation of the activity.
+        :type conversation_id: str
+        :param activity_id: The id of the activity.
+        :type activity_id: str
+        :param logic: The function processing the activity.
+        :type logic: Callable[[], Awaitable]
+        :return: True if the activity was processed, False if it was a duplicate.
+        :rtype: bool
+        """
+        key = self.get_key(conversation_id=conversation_id, activity_id=activity_id)
+        self._purge()
+
+        # Attach duplicates to the activity in progress
+        if key in self._in_flight:
+            logger.info(f"Activity '{activity_id}' is in progress. Waiting for result.")
+            duplicate_activities_counter.add(1, attributes={"source": "in_flight"})
+            await asyncio.shield(self._in_flight[key])
+            return False
+        if key in self._processed:
+            logger.info(f"Activity '{activity_id}' has already been processed.")
+            duplicate_activities_counter.add(1, attributes={"source": "memory"})
+            return False
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = future
+        try:
+            # Record activity in storage unless another replica recorded it
+            try:
+                duplicate = not await self._record(
+                    key,
+                    ProcessedActivity(
+                        activity_id=activity_id,
+                        conversation_id=conversation_id,
+                        instance_id=self.instance_id,
+                    ),
+                )
+            except Exception as e:
+                logger.warning(f"Failed to record activity '{activity_id}': '{e}'")
+                duplicate = False
+            if duplicate:
+                logger.info(
+                    f"Activity '{activity_id}' has already been processed by another instance."
+                )
+                duplicate_activities_counter.add(1, attributes={"source": "storage"})
+                self._remember(key)
+                return False
+
+            try:
+                await logic()
+            except BaseException:
+                # Allow retries of failed activities
+                try:
+                    await self.storage.delete([key])
+                except Exception as e:
+                    logger.warning(
+                        f"Failed to delete record of activity '{activity_id}': '{e}'"
+                    )
+                raise
+            self._remember(key)
+            return True
+        finally:
+            del self._in_flight[key]
+            future.set_result(None)
@@ -0,0 +1,110 @@
+from app.copilot.handler_msteams import MSTeamsHandler
+from app.core.components import components
+from app.core.settings import settings
+from app.files.pipeline import DocumentProcessor
+from app.files.progress import ProgressReporter, format_progress_event
+from app.jobs.store import ExtractionJobStore
+from app.jobs.worker import ExtractionWorkerPool
+from app.logs import setup_logging
+from app.models.documents import ProcessedDocument, ProgressEvent
+from app.models.jobs import ExtractionJob
+from app.storage.cache import get_uncached_storage
+from microsoft_agents.activity import ConversationReference
+from microsoft_agents.hosting.core import (
+    AgentApplication,
+    Storage,
+    TurnContext,
+    TurnState,
+)
+
+logger = setup_logging(__name__)
+
+
+async def process_extraction_job(job: ExtractionJob) -> ProcessedDocument:
+    """
+    Process the document of an extraction job. Progress is persisted with the
+    job, which also renews the lease of the job.
+
+    :param job: The extraction job.
+    :type job: ExtractionJob
+    :return: The processed document.
+    :rtype: ProcessedDocument
+    """
+
+    extraction_worker_pool: ExtractionWorkerPool = components.get(
+        "extraction_worker_pool"
+    )
+
+    async def update_job_progress(event: ProgressEvent) -> None:
+        job.progress = format_progress_event(event)
+        await extraction_worker_pool.job_store.update(job)
+
+    document_processor = DocumentProcessor(
+        progress=ProgressReporter(
+            sinks=[update_job_progress],
+            min_interval_seconds=settings.JOB_PROGRESS_UPDATE_INTERVAL_SECONDS,
+        )
+    )
+    return await document_processor.process(
+        attachment_name=job.attachment_name,
+        download_url=job.download_url,
+    )
+
+
+async def notify_extraction_job(
+    job: ExtractionJob, processed_document: ProcessedDocument | None
+) -> None:
+    """
+    Store the result of an extraction job in the conversation state and notify
+    the user with a proactive message.
+
+    :param job: The finished extraction job.
+    :type job: ExtractionJob
+    :param processed_document: The processed document or None if the job failed.
+    :type processed_document: ProcessedDocument | None
+    """
+    agent_app: AgentApplication[TurnState] = components.get("copilot_apps")["msteams"]
+    storage: Storage = components.get("storage")
+    conversation_reference = ConversationReference.model_validate(
+        job.conversation_reference
+    )
+
+    async def callback(context: TurnContext) -> None:
+        state = TurnState.with_storage(storage)
+        await state.load(context, storage)
+        await MSTeamsHandler.handle_extraction_job_result(
+            context=context,
+            state=state,
+            job=job,
+            processed_document=processed_document,
+        )
+
+    logger.info(f"Sending proactive message for extraction job '{job.job_id}'.")
+    await agent_app.adapter.continue_conversation(
+        settings.CLIENT_ID or "",
+        conversation_reference.get_continuation_activity(),
+        callback,
+    )
+
+
+def create_extraction_worker_pool(storage: Storage) -> ExtractionWorkerPool:
+    """
+    Create the pool of workers processing extraction jobs. Jobs are claimed
+    across replicas and bypass the storage cache.
+
+    :param storage: The storage shared by all copilot apps.
+    :type storage: Storage
+    :return: The extraction worker pool.
+    :rtype: ExtractionWorkerPool
+    """
+    return ExtractionWorkerPool(
+        job_store=ExtractionJobStore(storage=get_uncached_storage(storage)),
+        processor=process_extraction_job,
+        notifier=notify_extraction_job,
+        instance_id=settings.WEBSITE_INSTANCE_ID,
+        concurrency=settings.JOB_WORKER_CONCURRENCY,
+        max_attempts=settings.JOB_MAX_ATTEMPTS,
+        retry_delay_seconds=settings.JOB_RETRY_DELAY_SECONDS,
+        lease_seconds=settings.JOB_LEASE_SECONDS,
+        recovery_interval_seconds=settings.JOB_RECOVERY_INTERVAL_SECONDS,
+    )
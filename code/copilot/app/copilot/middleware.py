@@ -0,0 +1,70 @@
+from typing import Awaitable, Callable
+
+from app.copilot.idempotency import ActivityIdempotencyCache
+from app.core.locks import KeyedLock
+from app.logs import setup_logging
+from microsoft_agents.activity import ActivityTypes
+from microsoft_agents.hosting.core import Middleware, TurnContext
+
+logger = setup_logging(__name__)
+
+
+class IdempotencyMiddleware(Middleware):
+    """
+    Middleware which processes every message activity once, so that retries of
+    the Bot Connector do not run the document pipeline and the model again.
+    """
+
+    def __init__(self, idempotency_cache: ActivityIdempotencyCache):
+        """
+        Initialize the IdempotencyMiddleware.
+
+        :param idempotency_cache: The cache of processed activities.
+        :type idempotency_cache: ActivityIdempotencyCache
+        """
+        self.idempotency_cache = idempotency_cache
+
+    async def on_turn(
+        self, context: TurnContext, logic: Callable[[TurnContext], Awaitable]
+    ):
+        activity = context.activity
+        if (
+            activity.type != ActivityTypes.message
+            or not activity.id
+            or activity.conversation is None
+            or not activity.conversation.id
+        ):
+            return await logic()
+
+        await self.idempotency_cache.run_once(
+            conversation_id=activity.conversation.id,
+            activity_id=activity.id,
+            logic=logic,
+        )
+
+
+class ConversationLockMiddleware(Middleware):
+    """
+    Middleware which processes the turns of a conversation one after another,
+    so that concurrent messages of a conversation, e.g. retries or repeated
+    clicks on suggested actions, see the state written by the previous turn.
+    """
+
+    def __init__(self, keyed_lock: KeyedLock):
+        """
+        Initialize the ConversationLockMiddleware.
+
+        :param keyed_lock: The lock shared by all adapters of the process.
+        :type keyed_lock: KeyedLock
+        """
+        self.keyed_lock = keyed_lock
+
+    async def on_turn(
+        self, context: TurnContext, logic: Callable[[TurnContext], Awaitable]
+    ):
+        conversation = context.activity.conversation
+        if conversation is None or not conversation.id:
+            return await logic()
+
+        async with self.keyed_lock.acquire(conversation.id):
+            return await logic()
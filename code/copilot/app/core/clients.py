@@ -0,0 +1,70 @@
+import functools
+import threading
+
+from app.logs import setup_logging
+from azure.identity.aio import DefaultAzureCredential, get_bearer_token_provider
+from openai import AsyncOpenAI
+
+logger = setup_logging(__name__)
+
+COGNITIVE_SERVICES_SCOPE = "https://cognitiveservices.azure.com/.default"
+
+_client_lock = threading.Lock()
+
+
+def get_credential(managed_identity_client_id: str = None) -> DefaultAzureCredential:
+    """
+    Get the credential of a managed identity, which is shared by all clients of
+    the process, so that tokens are cached across turns and acquired once by
+    the warm-up. Components are created concurrently in threads during startup,
+    so the credential is created under a lock.
+
+    :param managed_identity_client_id: The client id of the managed identity.
+    :type managed_identity_client_id: str
+    :return: The credential.
+    :rtype: DefaultAzureCredential
+    """
+    with _client_lock:
+        return _create_credential(managed_identity_client_id)
+
+
+def get_openai_client(
+    api_key: str, endpoint: str, managed_identity_client_id: str = None
+) -> AsyncOpenAI:
+    """
+    Get the OpenAI client of an endpoint, which is shared by all agents of the
+    process, so that pooled connections are reused across turns.
+
+    :param api_key: The API key or an empty string to authenticate with the managed identity.
+    :type api_key: str
+    :param endpoint: The API endpoint URL.
+    :type endpoint: str
+    :param managed_identity_client_id: The client id of the managed identity.
+    :type managed_identity_client_id: str
+    :return: The OpenAI client.
+    :rtype: AsyncOpenAI
+    """
+    credential = None if api_key else get_credential(managed_identity_client_id)
+    with _client_lock:
+        return _create_openai_client(api_key, endpoint, credential)
+
+
+@functools.cache
+def _create_credential(
+    managed_identity_client_id: str | None,
+) -> DefaultAzureCredential:
+    return DefaultAzureCredential(
+        managed_identity_client_id=managed_identity_client_id,
+    )
+
+
+@functools.cache
+def _create_openai_client(
+    api_key: str, endpoint: str, credential: DefaultAzureCredential | None
+) -> AsyncOpenAI:
+    logger.info(f"Creating OpenAI client for endpoint '{endpoint}'.")
+    return AsyncOpenAI(
+        api_key=api_key
+        or get_bearer_token_provider(credential, COGNITIVE_SERVICES_SCOPE),
+        base_url=f"{endpoint}openai/v1/",
+    )
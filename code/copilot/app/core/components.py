@@ -0,0 +1,161 @@
+import asyncio
+import contextlib
+import os
+import threading
+import time
+from typing import Any, Callable, Iterator
+
+from app.logs import setup_logging
+from opentelemetry import metrics
+
+logger = setup_logging(__name__)
+meter = metrics.get_meter(__name__)
+
+startup_duration_histogram = meter.create_histogram(
+    name="copilot.startup.duration",
+    unit="s",
+    description="Duration of startup phases and component creation by phase.",
+)
+
+
+class ComponentContainer:
+    """
+    Container of the components of the application, e.g. storages and agent
+    applications. Components are registered with a factory at import time and
+    created on first use, so that importing a module neither connects to Azure
+    nor requires all settings. The lifespan creates all components concurrently
+    in threads before the first request. The container also records how long
+    the startup phases took and reports them once the application is ready.
+    """
+
+    def __init__(self):
+        """
+        Initialize the ComponentContainer.
+        """
+        self._factories: dict[str, Callable[[], Any]] = {}
+        self._components: dict[str, Any] = {}
+        self._locks: dict[str, threading.Lock] = {}
+        self.durations: dict[str, float] = {}
+
+    def register(self, name: str, factory: Callable[[], Any]) -> None:
+        """
+        Register the factory of a component. Factories may get other components.
+
+        :param name: The name of the component.
+        :type name: str
+        :param factory: The function creating the component.
+        :type factory: Callable[[], Any]
+        """
+        if name in self._factories:
+            raise ValueError(f"Component '{name}' is already registered.")
+        self._factories[name] = factory
+        self._locks[name] = threading.Lock()
+
+    def get(self, name: str) -> Any:
+        """
+        Get a component and create it on first use.
+
+        :param name: The name of the component.
+        :type name: str
+        :return: The component.
+        :rtype: Any
+        """
+        if name in self._components:
+            return self._components[name]
+        if name not in self._factories:
+            raise KeyError(f"Component '{name}' is not registered.")
+
+        with self._locks[name]:
+            # Another thread may have created the component while waiting for the lock
+            if name in self._components:
+                return self._components[name]
+            start_time = time.perf_counter()
+            component = self._factories[name]()
+            self.record(
+                phase=f"component.{name}", duration=time.perf_counter() - start_time
+            )
+            self._components[name] = component
+            return component
+
+    async def initialize(self, names: list[str] = None) -> None:
+        """
+        Create components concurrently in threads, so that the event loop stays
+        responsive and independent components do not wait for each other.
+
+        :param names: The names of the components or None to create all registered components.
+        :type names: list[str]
+        """
+        await asyncio.gather(
+            *[
+                asyncio.to_thread(self.get, name)
+                for name in (names if names is not None else self._factories)
+            ]
+        )
+
+    def record(self, phase: str, duration: float) -> None:
+        """
+        Record the duration of a startup phase.
+
+        :param phase: The name of the phase.
+        :type phase: str
+        :param duration: The duration in seconds.
+        :type duration: float
+        """
+        self.durations[phase] = duration
+
+    @contextlib.contextmanager
+    def measure(self, phase: str) -> Iterator[None]:
+        """
+        Measure the duration of a startup phase.
+
+        :param phase: The name of the phase.
+        :type phase: str
+        """
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase=phase, duration=time.perf_counter() - start_time)
+
+    def record_import(self) -> None:
+        """
+        Record the time from the start of the process until the application was
+        imported, which includes the interpreter start and all imports.
+        """
+        self.record(phase="import", duration=get_process_age())
+
+    def log_report(self) -> None:
+        """
+        Log the durations of all recorded startup phases and record them as
+        metrics, once open telemetry is configured.
+        """
+        for phase, duration in self.durations.items():
+            startup_duration_histogram.record(duration, attributes={"phase": phase})
+        report = ", ".join(
+            f"{phase}: {duration:.3f}s" for phase, duration in self.durations.items()
+        )
+        logger.info(f"Startup timing report: {report}.")
+
+
+def get_process_age() -> float:
+    """
+    Get the time since the start of the process from the start time in clock
+    ticks after boot in /proc. Without /proc, the CPU time of the process is
+    used, which approximates the age during the CPU-bound interpreter start.
+
+    :return: The age of the process in seconds.
+    :rtype: float
+    """
+    try:
+        with open("/proc/self/stat", encoding="utf-8") as file:
+            # Skip pid and command name, which may contain spaces
+            fields = file.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime", encoding="utf-8") as file:
+            uptime = float(file.read().split()[0])
+        return uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return time.process_time()
+
+
+# Initialize component container
+components = ComponentContainer()
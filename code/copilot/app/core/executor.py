@@ -0,0 +1,177 @@
+import asyncio
+import functools
+import multiprocessing
+import pickle
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+from app.core.settings import settings
+from app.logs import setup_logging
+from app.models.core import ExecutorType
+from opentelemetry import metrics
+
+logger = setup_logging(__name__)
+meter = metrics.get_meter(__name__)
+
+event_loop_lag_histogram = meter.create_histogram(
+    name="copilot.event_loop.lag",
+    unit="s",
+    description="Delay of the event loop in scheduling a timer beyond its deadline.",
+)
+cpu_task_duration_histogram = meter.create_histogram(
+    name="copilot.executor.task.duration",
+    unit="s",
+    description="Duration of CPU-bound tasks including the time waiting for a worker.",
+)
+
+T = TypeVar("T")
+
+_executor: Executor | None = None
+_picklable_functions: dict[str, bool] = {}
+
+
+def get_executor() -> Executor | None:
+    """
+    Get the executor for CPU-bound work configured in the settings. The executor
+    is created on first use.
+
+    :return: The executor or None if CPU-bound work runs on the event loop.
+    :rtype: Executor | None
+    """
+    global _executor
+    if _executor is None and settings.CPU_EXECUTOR_TYPE != ExecutorType.NONE:
+        logger.info(
+            f"Creating {settings.CPU_EXECUTOR_TYPE.value} pool executor with {settings.CPU_EXECUTOR_MAX_WORKERS} workers."
+        )
+        match settings.CPU_EXECUTOR_TYPE:
+            case ExecutorType.PROCESS:
+                # Spawn workers since forking a process with running threads is unsafe
+                _executor = ProcessPoolExecutor(
+                    max_workers=settings.CPU_EXECUTOR_MAX_WORKERS,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            case ExecutorType.THREAD:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.CPU_EXECUTOR_MAX_WORKERS,
+                    thread_name_prefix="cpu-executor",
+                )
+    return _executor
+
+
+def is_picklable(function: Callable) -> bool:
+    """
+    Check whether a function can be sent to a process pool. The result is cached
+    per function name, so that each function is only pickled once.
+
+    :param function: The function to check.
+    :type function: Callable
+    :return: True if the function can be pickled.
+    :rtype: bool
+    """
+    name = getattr(function, "__qualname__", str(function))
+    if name not in _picklable_functions:
+        try:
+            pickle.dumps(function)
+            _picklable_functions[name] = True
+        except (pickle.PicklingError, AttributeError, TypeError):
+            logger.warning(
+                f"Function '{name}' cannot be pickled and runs in a thread instead of the process pool."
+            )
+            _picklable_functions[name] = False
+    return _picklable_functions[name]
+
+
+def shutdown_executor() -> None:
+    """
+    Shut down the executor for CPU-bound work.
+    """
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+        logger.info("Shut down executor for CPU-bound work.")
+
+
+async def run_cpu_bound(function: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a CPU-bound function in the configured executor, so that the event loop
+    stays responsive. With a process pool, the function, its arguments and its
+    result must be picklable, i.e. functions must be defined at module or class
+    level. Functions which cannot be pickled run in a thread instead.
+
+    :param function: The function to run.
+    :type function: Callable[..., T]
+    :return: The result of the function.
+    :rtype: T
+    """
+    executor = get_executor()
+    if executor is None:
+        return function(*args, **kwargs)
+
+    loop = asyncio.get_running_loop()
+    start_time = loop.time()
+    if isinstance(executor, ProcessPoolExecutor) and not is_picklable(function):
+        executor = None
+    result = await loop.run_in_executor(
+        executor, functools.partial(function, *args, **kwargs)
+    )
+    cpu_task_duration_histogram.record(
+        loop.time() - start_time,
+        attributes={"function": getattr(function, "__qualname__", str(function))},
+    )
+    return result
+
+
+class EventLoopLagMonitor:
+    """
+    Monitor which measures how late the event loop wakes up a sleeping task.
+    A lag close to zero shows that no blocking work runs on the event loop.
+    """
+
+    def __init__(self, interval_seconds: float, warning_threshold_seconds: float):
+        """
+        Initialize the EventLoopLagMonitor.
+
+        :param interval_seconds: The interval between two measurements.
+        :type interval_seconds: float
+        :param warning_threshold_seconds: The lag above which a warning is logged.
+        :type warning_threshold_seconds: float
+        """
+        self.interval_seconds = interval_seconds
+        self.warning_threshold_seconds = warning_threshold_seconds
+        self._task: asyncio.Task | None = None
+
+    def start(self) -> None:
+        """
+        Start the monitor on the running event loop.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(
+                self._monitor(), name="event-loop-lag-monitor"
+            )
+
+    async def stop(self) -> None:
+        """
+        Stop the monitor.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _monitor(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start_time = loop.time()
+            await asyncio.sleep(self.interval_seconds)
+            lag = max(loop.time() - start_time - self.interval_seconds, 0.0)
+            event_loop_lag_histogram.record(lag)
+            if lag > self.warning_threshold_seconds:
+                logger.warning(f"Event loop was blocked for {lag:.3f}s.")
+
+
+# Initialize event loop lag monitor
+event_loop_lag_monitor = EventLoopLagMonitor(
+    interval_seconds=settings.EVENT_LOOP_LAG_INTERVAL_SECONDS,
+    warning_threshold_seconds=settings.EVENT_LOOP_LAG_WARNING_SECONDS,
+)
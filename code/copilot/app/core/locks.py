@@ -0,0 +1,75 @@
+import asyncio
+import contextlib
+import time
+from typing import AsyncIterator
+
+from app.logs import setup_logging
+from opentelemetry import metrics
+
+logger = setup_logging(__name__)
+meter = metrics.get_meter(__name__)
+
+lock_wait_histogram = meter.create_histogram(
+    name="copilot.lock.wait",
+    unit="s",
+    description="Time spent waiting for a keyed lock.",
+)
+lock_contention_counter = meter.create_counter(
+    name="copilot.lock.contended",
+    unit="{acquisition}",
+    description="Number of keyed lock acquisitions which had to wait for another holder.",
+)
+
+
+class KeyedLock:
+    """
+    Collection of async locks by key, e.g. to process the turns of a conversation
+    one after another while turns of other conversations run concurrently. Locks
+    are removed once no task holds or waits for them.
+    """
+
+    def __init__(self, name: str):
+        """
+        Initialize the KeyedLock.
+
+        :param name: The name of the lock used for logging and metrics.
+        :type name: str
+        """
+        self.name = name
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._users: dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    @contextlib.asynccontextmanager
+    async def acquire(self, key: str) -> AsyncIterator[None]:
+        """
+        Acquire the lock of a key.
+
+        :param key: The key to lock.
+        :type key: str
+        """
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self._users[key] = self._users.get(key, 0) + 1
+        try:
+            contended = lock.locked()
+            if contended:
+                logger.info(f"Waiting for {self.name} lock of '{key}'.")
+                lock_contention_counter.add(1, attributes={"lock": self.name})
+            start_time = time.perf_counter()
+            async with lock:
+                lock_wait_histogram.record(
+                    time.perf_counter() - start_time,
+                    attributes={"lock": self.name, "contended": contended},
+                )
+                yield
+        finally:
+            self._users[key] -= 1
+            if not self._users[key]:
+                del self._users[key]
+                del self._locks[key]
+
+
+# Initialize conversation lock
+conversation_lock = KeyedLock(name="conversation")
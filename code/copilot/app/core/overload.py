@@ -0,0 +1,239 @@
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator
+
+from app.core.settings import settings
+from app.logs import setup_logging
+from microsoft_agents.activity import Activity, ActivityTypes
+from opentelemetry import metrics
+
+logger = setup_logging(__name__)
+meter = metrics.get_meter(__name__)
+
+admitted_turns_counter = meter.create_counter(
+    name="copilot.turns.admitted",
+    unit="{turn}",
+    description="Number of admitted turns by budget and whether they were queued.",
+)
+shed_turns_counter = meter.create_counter(
+    name="copilot.turns.shed",
+    unit="{turn}",
+    description="Number of turns rejected due to overload by budget and reason.",
+)
+queued_turns_counter = meter.create_up_down_counter(
+    name="copilot.turns.queue.depth",
+    unit="{turn}",
+    description="Number of turns waiting for admission by budget.",
+)
+active_turns_counter = meter.create_up_down_counter(
+    name="copilot.turns.active",
+    unit="{turn}",
+    description="Number of admitted turns by budget.",
+)
+wait_time_histogram = meter.create_histogram(
+    name="copilot.turns.queue.wait_time",
+    unit="s",
+    description="Time turns waited for admission by budget and outcome.",
+)
+
+IGNORED_ATTACHMENT_CONTENT_TYPES = {"text/html"}
+
+
+class OverloadError(Exception):
+    """
+    Raised if a turn is rejected, because the budget of the replica is
+    exhausted.
+    """
+
+    def __init__(self, budget: str, reason: str, retry_after_seconds: float):
+        super().__init__(f"Turn rejected by budget '{budget}': {reason}.")
+        self.budget = budget
+        self.reason = reason
+        self.retry_after_seconds = retry_after_seconds
+
+
+class AdmissionLimiter:
+    """
+    Per-instance admission control for turns of one budget. Turns are admitted
+    in order of arrival as long as the number of active turns stays below the
+    concurrency limit. Turns wait in a bounded queue for at most the maximum
+    wait time and are rejected otherwise, so that callers back off instead of
+    piling up turns which would all be served late.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int,
+        max_queue_size: int,
+        max_wait_seconds: float,
+        retry_after_seconds: float,
+    ):
+        """
+        Initialize the AdmissionLimiter.
+
+        :param name: The name of the budget used for metrics and errors.
+        :type name: str
+        :param max_concurrency: The maximum number of concurrent turns.
+        :type max_concurrency: int
+        :param max_queue_size: The maximum number of turns waiting for admission.
+        :type max_queue_size: int
+        :param max_wait_seconds: The maximum time a turn waits for admission.
+        :type max_wait_seconds: float
+        :param retry_after_seconds: The time after which rejected callers should retry.
+        :type retry_after_seconds: float
+        """
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue_size = max_queue_size
+        self.max_wait_seconds = max_wait_seconds
+        self.retry_after_seconds = retry_after_seconds
+        self.active = 0
+        self._waiters: deque[object] = deque()
+        self._condition = asyncio.Condition()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def _shed(self, reason: str) -> OverloadError:
+        shed_turns_counter.add(1, attributes={"budget": self.name, "reason": reason})
+        logger.warning(
+            f"Rejecting turn of budget '{self.name}' with {self.active} active and {self.queue_depth} queued turns: {reason}."
+        )
+        return OverloadError(
+            budget=self.name,
+            reason=reason,
+            retry_after_seconds=self.retry_after_seconds,
+        )
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncGenerator[None, None]:
+        """
+        Wait for admission of a turn and release it afterwards.
+
+        :raises OverloadError: If the queue is full or the turn waited longer than the maximum wait time.
+        """
+        await self._acquire()
+        try:
+            yield
+        finally:
+            await self._release()
+
+    async def _acquire(self) -> None:
+        # Admit immediately if there is capacity and nobody is waiting, which
+        # needs no lock since the event loop does not switch tasks in between
+        if self.active < self.max_concurrency and not self._waiters:
+            self._admit(queued=False)
+            return
+
+        async with self._condition:
+            if self.active < self.max_concurrency and not self._waiters:
+                self._admit(queued=False)
+                return
+
+            # Reject immediately if the queue is full
+            if self.queue_depth >= self.max_queue_size:
+                raise self._shed("queue_full")
+
+            waiter = object()
+            self._waiters.append(waiter)
+            queued_turns_counter.add(1, attributes={"budget": self.name})
+            start_time = time.perf_counter()
+            admitted = False
+            try:
+                await asyncio.wait_for(
+                    self._condition.wait_for(
+                        lambda: self._waiters[0] is waiter
+                        and self.active < self.max_concurrency
+                    ),
+                    timeout=self.max_wait_seconds,
+                )
+                admitted = True
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                self._waiters.remove(waiter)
+                queued_turns_counter.add(-1, attributes={"budget": self.name})
+                wait_time_histogram.record(
+                    time.perf_counter() - start_time,
+                    attributes={
+                        "budget": self.name,
+                        "outcome": "admitted" if admitted else "shed",
+                    },
+                )
+                # Wake up the next waiter
+                self._condition.notify_all()
+
+            if not admitted:
+                raise self._shed("queue_timeout")
+            self._admit(queued=True)
+
+    def _admit(self, queued: bool) -> None:
+        self.active += 1
+        active_turns_counter.add(1, attributes={"budget": self.name})
+        admitted_turns_counter.add(
+            1, attributes={"budget": self.name, "queued": queued}
+        )
+
+    async def _release(self) -> None:
+        self.active -= 1
+        active_turns_counter.add(-1, attributes={"budget": self.name})
+
+        # Wake up waiters, if any
+        if self._waiters:
+            async with self._condition:
+                self._condition.notify_all()
+
+
+def get_retry_after_header(retry_after_seconds: float) -> str:
+    """
+    Get the value of the `Retry-After` header, which is given in whole seconds.
+
+    :param retry_after_seconds: The time after which callers should retry.
+    :type retry_after_seconds: float
+    :return: The header value.
+    :rtype: str
+    """
+    return str(max(math.ceil(retry_after_seconds), 1))
+
+
+def get_turn_budget(activity: Activity) -> str:
+    """
+    Get the budget of a turn from its activity. Message activities with file
+    attachments are upload turns, which download and extract documents. Teams
+    adds an HTML attachment with the text to every message, which is ignored.
+
+    :param activity: The activity received from the Bot Connector.
+    :type activity: Activity
+    :return: The name of the budget, either `upload` or `chat`.
+    :rtype: str
+    """
+    if activity.type == ActivityTypes.message and any(
+        attachment.content_type not in IGNORED_ATTACHMENT_CONTENT_TYPES
+        for attachment in activity.attachments or []
+    ):
+        return "upload"
+    return "chat"
+
+
+# Initialize turn limiters
+turn_limiters = {
+    "chat": AdmissionLimiter(
+        name="chat",
+        max_concurrency=settings.OVERLOAD_CHAT_MAX_CONCURRENCY,
+        max_queue_size=settings.OVERLOAD_CHAT_MAX_QUEUE_SIZE,
+        max_wait_seconds=settings.OVERLOAD_MAX_WAIT_SECONDS,
+        retry_after_seconds=settings.OVERLOAD_RETRY_AFTER_SECONDS,
+    ),
+    "upload": AdmissionLimiter(
+        name="upload",
+        max_concurrency=settings.OVERLOAD_UPLOAD_MAX_CONCURRENCY,
+        max_queue_size=settings.OVERLOAD_UPLOAD_MAX_QUEUE_SIZE,
+        max_wait_seconds=settings.OVERLOAD_MAX_WAIT_SECONDS,
+        retry_after_seconds=settings.OVERLOAD_RETRY_AFTER_SECONDS,
+    ),
+}
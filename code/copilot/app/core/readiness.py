@@ -0,0 +1,199 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable
+
+from app.core.clients import get_credential, get_openai_client
+from app.core.components import components
+from app.core.settings import settings
+from app.logs import setup_logging
+from app.models.heartbeat import DependencyStatus, ReadinessResult
+from azure.ai.documentintelligence.aio import DocumentIntelligenceAdministrationClient
+from azure.core.credentials import AzureKeyCredential
+from opentelemetry import metrics
+
+logger = setup_logging(__name__)
+meter = metrics.get_meter(__name__)
+
+warm_up_duration_histogram = meter.create_histogram(
+    name="copilot.readiness.warm_up.duration",
+    unit="s",
+    description="Duration of the warm-up of a dependency by dependency and outcome.",
+)
+
+BOT_FRAMEWORK_RESOURCE = "https://api.botframework.com"
+
+
+class ReadinessTracker:
+    """
+    Warm-up of the dependencies of the replica, e.g. acquiring tokens, opening
+    pooled connections and issuing lightweight requests, so that the first
+    turns after a scale-out are served at steady-state latency. The replica is
+    ready once all required dependencies are warm. Failed optional dependencies
+    are reported but do not take the replica out of rotation, since all other
+    replicas would be affected alike. Failed required dependencies are retried
+    in the background.
+    """
+
+    def __init__(self, timeout_seconds: float, retry_interval_seconds: float):
+        """
+        Initialize the ReadinessTracker.
+
+        :param timeout_seconds: The maximum time a dependency may take to warm up.
+        :type timeout_seconds: float
+        :param retry_interval_seconds: The interval between attempts of required dependencies which failed.
+        :type retry_interval_seconds: float
+        """
+        self.timeout_seconds = timeout_seconds
+        self.retry_interval_seconds = retry_interval_seconds
+        self.dependencies: dict[str, DependencyStatus] = {}
+        self._probes: dict[str, Callable[[], Awaitable[Any]]] = {}
+        self._task: asyncio.Task | None = None
+
+    @property
+    def is_ready(self) -> bool:
+        return bool(self.dependencies) and all(
+            dependency.ready
+            for dependency in self.dependencies.values()
+            if dependency.required
+        )
+
+    def register(
+        self, name: str, probe: Callable[[], Awaitable[Any]], required: bool = True
+    ) -> None:
+        """
+        Register the warm-up probe of a dependency.
+
+        :param name: The name of the dependency.
+        :type name: str
+        :param probe: The function warming up the dependency, which raises if the dependency is unavailable.
+        :type probe: Callable[[], Awaitable[Any]]
+        :param required: Whether the replica is only ready if the dependency is warm.
+        :type required: bool
+        """
+        self._probes[name] = probe
+        self.dependencies[name] = DependencyStatus(name=name, required=required)
+
+    async def _warm_up(self, name: str) -> bool:
+        dependency = self.dependencies[name]
+        start_time = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._probes[name](), timeout=self.timeout_seconds)
+            dependency.ready = True
+            dependency.error = None
+        except Exception as e:
+            dependency.ready = False
+            dependency.error = str(e) or type(e).__name__
+        dependency.duration_seconds = time.perf_counter() - start_time
+        warm_up_duration_histogram.record(
+            dependency.duration_seconds,
+            attributes={
+                "dependency": name,
+                "outcome": "success" if dependency.ready else "failure",
+            },
+        )
+        if dependency.ready:
+            logger.info(
+                f"Warmed up dependency '{name}' in {dependency.duration_seconds:.3f}s."
+            )
+        else:
+            logger.warning(
+                f"Failed to warm up dependency '{name}' after {dependency.duration_seconds:.3f}s: '{dependency.error}'"
+            )
+        return dependency.ready
+
+    async def warm_up(self) -> bool:
+        """
+        Warm up all dependencies concurrently and retry failed required
+        dependencies in the background.
+
+        :return: True if the replica is ready.
+        :rtype: bool
+        """
+        await asyncio.gather(*[self._warm_up(name) for name in self._probes])
+        if not self.is_ready and self._task is None:
+            self._task = asyncio.create_task(self._retry(), name="readiness-retry")
+        logger.info(f"Replica is {'ready' if self.is_ready else 'not ready'}.")
+        return self.is_ready
+
+    async def stop(self) -> None:
+        """
+        Stop retrying failed dependencies.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _retry(self) -> None:
+        while not self.is_ready:
+            await asyncio.sleep(self.retry_interval_seconds)
+            await asyncio.gather(
+                *[
+                    self._warm_up(name)
+                    for name, dependency in self.dependencies.items()
+                    if dependency.required and not dependency.ready
+                ]
+            )
+        logger.info("Replica is ready.")
+        self._task = None
+
+    def get_result(self) -> ReadinessResult:
+        """
+        Get the readiness of the replica and the warm-up of every dependency.
+
+        :return: The readiness result.
+        :rtype: ReadinessResult
+        """
+        return ReadinessResult(
+            isReady=self.is_ready,
+            dependencies=list(self.dependencies.values()),
+        )
+
+
+async def warm_up_bot_connector() -> None:
+    """
+    Acquire the token for replies to the Bot Connector, which is cached by the
+    connection.
+    """
+    await components.initialize(["connection_manager"])
+    connection_manager = components.get("connection_manager")
+    await connection_manager.get_default_connection().get_access_token(
+        BOT_FRAMEWORK_RESOURCE, settings.SCOPES
+    )
+
+
+async def warm_up_openai() -> None:
+    """
+    Acquire a token and open a pooled connection of the shared OpenAI client by
+    listing the models of the endpoint.
+    """
+    openai_client = get_openai_client(
+        api_key=settings.AZURE_OPENAI_API_KEY,
+        endpoint=settings.AZURE_OPENAI_ENDPOINT,
+        managed_identity_client_id=settings.MANAGED_IDENTITY_CLIENT_ID,
+    )
+    await openai_client.models.list()
+
+
+async def warm_up_document_intelligence() -> None:
+    """
+    Acquire a token for Document Intelligence and verify the endpoint by reading
+    the details of the resource.
+    """
+    if settings.AZURE_DOCUMENT_INTELLIGENCE_API_KEY:
+        credential = AzureKeyCredential(
+            key=settings.AZURE_DOCUMENT_INTELLIGENCE_API_KEY
+        )
+    else:
+        credential = get_credential(settings.MANAGED_IDENTITY_CLIENT_ID)
+    async with DocumentIntelligenceAdministrationClient(
+        endpoint=settings.AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT, credential=credential
+    ) as client:
+        await client.get_resource_details()
+
+
+# Initialize readiness tracker
+readiness_tracker = ReadinessTracker(
+    timeout_seconds=settings.READINESS_WARM_UP_TIMEOUT_SECONDS,
+    retry_interval_seconds=settings.READINESS_RETRY_INTERVAL_SECONDS,
+)
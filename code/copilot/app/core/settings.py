@@ -1,7 +1,12 @@
 import logging
 from typing import Optional
 
-from app.models.core import AuthorizationTypes
+from app.models.core import (
+    AuthorizationTypes,
+    CompressionCodec,
+    ExecutorType,
+    ProcessingStrategy,
+)
 from pydantic import AliasChoices, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -29,6 +34,13 @@ class Settings(BaseSettings):
     LOGGING_SAMPLING_RATIO: float = 1.0
     LOGGING_SCHEDULE_DELAY: int = 5000
     LOGGING_FORMAT: str = "[%(asctime)s] [%(levelname)s] [%(module)-8.8s] %(message)s"
+    LOGGING_QUEUE_SIZE: int = 10000
+    LOGGING_RATE_LIMITED_LOGGERS: list[str] = [
+        "app.api.v1.endpoints.heartbeat",
+        "microsoft_agents.hosting.core.app.agent_application",
+    ]
+    LOGGING_RATE_LIMIT_PER_SECOND: float = 1.0
+    LOGGING_RATE_LIMIT_BURST: int = 10
     APPLICATIONINSIGHTS_CONNECTION_STRING: str
     APPLICATIONINSIGHTS_AUTHENTICATION_STRING: str = ""
 
@@ -55,6 +67,45 @@ class Settings(BaseSettings):
     )
     AZURE_COSMOS_DATABASE_ID: str
     AZURE_COSMOS_CONTAINER_ID: str = "user-state"
+    AZURE_COSMOS_DOCUMENT_CONTAINER_ID: str = "documents"
+    AZURE_COSMOS_PARTITION_KEY_PATH: str = "/id"
+    AZURE_COSMOS_INDEXING_EXCLUDED_PATHS: list[str] = ["/document/*"]
+
+    # Storage cache settings
+    STORAGE_CACHE_ENABLED: bool = True
+    STORAGE_CACHE_SIZE_MB: int = 64
+    STORAGE_CACHE_TTL_SECONDS: float = 30.0
+
+    # Storage instrumentation settings
+    STORAGE_INSTRUMENTATION_ENABLED: bool = True
+    STORAGE_INSTRUMENTATION_PAYLOAD_SAMPLE_RATE: float = 0.05
+    STORAGE_INSTRUMENTATION_COMPRESSION_SAMPLE_RATE: float = 0.05
+
+    # State settings
+    STATE_WRITE_MAX_ATTEMPTS: int = 3
+
+    # Storage time to live settings
+    STORAGE_TTL_ENABLED: bool = True
+    STORAGE_TTL_STATE_SECONDS: int = 30 * 24 * 60 * 60
+    STORAGE_TTL_DOCUMENT_SECONDS: int = 30 * 24 * 60 * 60
+    STORAGE_TTL_JOB_SECONDS: int = 7 * 24 * 60 * 60
+    STORAGE_TTL_REFRESH_RATIO: float = 0.5
+    STORAGE_JANITOR_INTERVAL_SECONDS: float = 300.0
+
+    # Idempotency settings
+    IDEMPOTENCY_ENABLED: bool = True
+    IDEMPOTENCY_TTL_SECONDS: float = 900.0
+
+    # Document store settings
+    DOCUMENT_STORE_CHUNK_SIZE_KB: int = 1024
+
+    # Compression settings
+    COMPRESSION_CODEC: CompressionCodec = CompressionCodec.ZSTD
+    COMPRESSION_LEVEL: Optional[int] = 9
+    COMPRESSION_ZSTD_DICTIONARY_PATH: str = ""
+
+    # Local storage settings
+    LOCAL_STORAGE_DIRECTORY: str = ""
 
     # Open AI settings
     AZURE_OPENAI_ENDPOINT: str
@@ -69,6 +120,84 @@ class Settings(BaseSettings):
             "AZURE_OPENAI_MODEL_SLM_NAME", "AZURE_OPENAI_SLM_DEPLOYMENT_NAME"
         ),
     )
+    AZURE_OPENAI_EMBEDDING_MODEL_NAME: str = Field(
+        default="",
+        alias=AliasChoices(
+            "AZURE_OPENAI_EMBEDDING_MODEL_NAME",
+            "AZURE_OPENAI_EMBEDDING_DEPLOYMENT_NAME",
+        ),
+    )
+
+    # Retrieval settings
+    RETRIEVAL_ENABLED: bool = False
+    RETRIEVAL_TOP_K: int = 8
+    RETRIEVAL_CHUNK_MAX_CHARACTERS: int = 2000
+    RETRIEVAL_HYBRID_ALPHA: float = 0.5
+    RETRIEVAL_EMBEDDING_DIMENSIONS: int = 256
+
+    # Section index settings
+    SECTION_INDEX_ENABLED: bool = True
+
+    # Compaction settings
+    COMPACTION_ENABLED: bool = True
+    COMPACTION_DEDUPLICATE_PAGE_FURNITURE: bool = True
+    COMPACTION_PAGE_MARKERS: bool = True
+    COMPACTION_STRIP_COMMENTS: bool = True
+    COMPACTION_STRIP_FIGURES: bool = True
+    COMPACTION_COMPACT_TABLES: bool = True
+    COMPACTION_COLLAPSE_WHITESPACE: bool = True
+
+    # Token budget settings
+    TOKEN_ESTIMATE_CHARACTERS_PER_TOKEN: float = 4.0
+    AZURE_OPENAI_MODEL_CONTEXT_TOKENS: int = 272000
+    AZURE_OPENAI_MAX_INSTRUCTIONS_LENGTH: int = 1048576
+    CONTEXT_RESERVED_TOKENS: int = 32000
+    OVERSIZED_DOCUMENT_STRATEGY: ProcessingStrategy = ProcessingStrategy.RETRIEVAL
+
+    # Map-reduce settings
+    MAP_REDUCE_ENABLED: bool = True
+    MAP_REDUCE_CHUNK_MAX_TOKENS: int = 20000
+    MAP_REDUCE_REDUCE_MAX_TOKENS: int = 60000
+    MAP_REDUCE_MAX_CONCURRENCY: int = 4
+    MAP_REDUCE_CACHE_MAX_ENTRIES: int = 512
+
+    # Job queue settings
+    JOB_QUEUE_ENABLED: bool = True
+    JOB_WORKER_CONCURRENCY: int = 8
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_DELAY_SECONDS: float = 10.0
+    JOB_LEASE_SECONDS: int = 900
+    JOB_RECOVERY_INTERVAL_SECONDS: float = 60.0
+    JOB_PROGRESS_UPDATE_INTERVAL_SECONDS: float = 10.0
+
+    # Extraction scheduler settings
+    EXTRACTION_MAX_CONCURRENCY: int = 2
+    EXTRACTION_MEMORY_BUDGET_MB: int = 1024
+    EXTRACTION_MEMORY_PER_FILE_BYTE: float = 4.0
+    EXTRACTION_MEMORY_PER_PAGE_MB: float = 0.5
+    EXTRACTION_AVERAGE_PAGE_SIZE_KB: int = 100
+    EXTRACTION_DEFAULT_FILE_SIZE_MB: int = 10
+
+    # Executor settings
+    CPU_EXECUTOR_TYPE: ExecutorType = ExecutorType.PROCESS
+    CPU_EXECUTOR_MAX_WORKERS: int = 2
+    EVENT_LOOP_LAG_INTERVAL_SECONDS: float = 0.5
+    EVENT_LOOP_LAG_WARNING_SECONDS: float = 1.0
+
+    # Readiness settings
+    READINESS_WARM_UP_TIMEOUT_SECONDS: float = 30.0
+    READINESS_RETRY_INTERVAL_SECONDS: float = 15.0
+
+    # Overload settings
+    OVERLOAD_CHAT_MAX_CONCURRENCY: int = 32
+    OVERLOAD_CHAT_MAX_QUEUE_SIZE: int = 64
+    OVERLOAD_UPLOAD_MAX_CONCURRENCY: int = 4
+    OVERLOAD_UPLOAD_MAX_QUEUE_SIZE: int = 8
+    OVERLOAD_MAX_WAIT_SECONDS: float = 5.0
+    OVERLOAD_RETRY_AFTER_SECONDS: float = 10.0
+
+    # Progress settings
+    PROGRESS_UPDATE_INTERVAL_SECONDS: float = 2.0
 
     # Instruction settings
     INSTRUCTIONS_DOCUMENT_AGENT: str = """
@@ -80,6 +209,7 @@ class Settings(BaseSettings):
     - Document Extraction: A JSON structure containing all the information of the respective document the user refers to. The JSON will appear in the "Document Extraction" section in this prompt.
       - The Document Extraction JSON contains:
         - Content: All the file content in markdown format generated from a complex OCR process.
+        - Pages: Page markers such as "[Page 3]" or page break comments separate the pages of the content.
     - User Input: The query from the user.
 
     # Instructions
@@ -103,6 +233,117 @@ class Settings(BaseSettings):
     # Context
     ## Document Extraction
     """
+    INSTRUCTIONS_DOCUMENT_RETRIEVAL_AGENT: str = """
+    # Objective
+    You are a helpful assistant that extracts relevant information from PDF documents based on user queries.
+
+    # Input
+    You have access to the following input:
+    - Document Passages: A JSON structure containing the passages of the respective document that are most relevant to the user query. The JSON will appear in the "Document Passages" section in this prompt.
+      - The Document Passages JSON contains a list of passages with:
+        - Page: The page number of the passage within the document.
+        - Section: The heading of the section the passage belongs to, if any.
+        - Content: The passage content in markdown format generated from a complex OCR process.
+    - User Input: The query from the user.
+
+    # Instructions
+    - Analyze the provided Document Passages to find the information needed to answer the user's question.
+    - Only the most relevant passages of the document are provided. If the passages do not contain the answer, say so and suggest a more specific question.
+    - Always cite the page numbers of the passages you used, for example "(p. 4)".
+    - You cannot generate files or images, only tables in a response.
+      - Never suggest generating a file output.
+      - If the user asks for a file, then apologize and mention that you cannot do that.
+      - Generate tables in markdown where appropriate.
+
+    # Response Format
+    - Provide all responses in markdown format.
+    - Provide structured answers with headers and bullet points.
+    - Provide clear, short and concise answers.
+    - Always suggest exactly 3 follow-up activities at the end of your response.
+      - Use a header called "Suggested Next Steps".
+      - Use a separate bullet point for each suggested follow-up activity.
+
+    # Context
+    ## Document Passages
+    """
+    INSTRUCTIONS_DOCUMENT_EXCERPT_AGENT: str = """
+    # Objective
+    You are a helpful assistant that extracts relevant information from PDF documents based on user queries.
+
+    # Input
+    You have access to the following input:
+    - Document Excerpt: A JSON structure containing the part of the respective document the user refers to. The JSON will appear in the "Document Excerpt" section in this prompt.
+      - The Document Excerpt JSON contains:
+        - Excerpt: A description of the section or page range the user refers to.
+        - Pages: The first and last page number of the excerpt within the document.
+        - Content: The excerpt content in markdown format generated from a complex OCR process.
+    - User Input: The query from the user.
+
+    # Instructions
+    - Analyze the provided Document Excerpt to find the information needed to answer the user's question.
+    - Only the section or page range the user refers to is provided. If the excerpt does not contain the answer, say so and suggest a more specific question.
+    - Always cite the section or pages of the excerpt you used.
+    - You cannot generate files or images, only tables in a response.
+      - Never suggest generating a file output.
+      - If the user asks for a file, then apologize and mention that you cannot do that.
+      - Generate tables in markdown where appropriate.
+
+    # Response Format
+    - Provide all responses in markdown format.
+    - Provide structured answers with headers and bullet points.
+    - Provide clear, short and concise answers.
+    - Always suggest exactly 3 follow-up activities at the end of your response.
+      - Use a header called "Suggested Next Steps".
+      - Use a separate bullet point for each suggested follow-up activity.
+
+    # Context
+    ## Document Excerpt
+    """
+    INSTRUCTIONS_MAP_AGENT: str = """
+    # Objective
+    You are a helpful assistant that processes one part of a large PDF document as a step of a larger task.
+
+    # Input
+    You have access to the following input:
+    - Document Part: One part of the document in markdown format generated from a complex OCR process. Each page starts with a page marker such as "[Page 3]".
+    - Task: The task that is performed over the whole document. The task will appear in the "Task" section in this prompt.
+
+    # Instructions
+    - Only use the provided document part. Other parts of the document are processed separately.
+    - Extract all information from the document part that is relevant for the task.
+    - Keep key details such as names, numbers, dates and the page numbers where they appear.
+    - Do not write an introduction or a conclusion and do not suggest follow-up activities.
+    - If the document part does not contain relevant information, respond with "No relevant information."
+
+    # Response Format
+    - Provide the result in markdown format.
+    - Use bullet points and keep the result short and concise.
+
+    # Context
+    ## Task
+    """
+    INSTRUCTIONS_REDUCE_AGENT: str = """
+    # Objective
+    You are a helpful assistant that combines partial results of a task that was performed over all parts of a large PDF document.
+
+    # Input
+    You have access to the following input:
+    - Partial Results: The results of the task for consecutive parts of the document in document order. Each partial result appears in a section called "Partial Result".
+    - Task: The task that is performed over the whole document. The task will appear in the "Task" section in this prompt.
+
+    # Instructions
+    - Combine the partial results into a single result for the task.
+    - Remove duplicates and resolve overlaps between the partial results.
+    - Keep key details such as names, numbers, dates and page numbers.
+    - Ignore partial results that do not contain relevant information.
+    - Only use the information of the partial results.
+
+    # Response Format
+    - Follow the response format of the task.
+
+    # Context
+    ## Task
+    """
     INSTRUCTIONS_SUGGESTED_ACTIONS_AGENT: str = """
     # Objective
     You are a helpful assistant that creates suggested follow-up actions based on the provided content and user queries.
@@ -0,0 +1,304 @@
+import base64
+import functools
+import struct
+import zlib
+from abc import ABC, abstractmethod
+
+import lz4.frame
+import zstandard
+from app.core.settings import settings
+from app.logs import setup_logging
+from app.models.core import CompressionCodec
+
+logger = setup_logging(__name__)
+
+# Header of encoded payloads: magic, format version, codec id and zstd dictionary id.
+# Legacy payloads are plain zlib streams, which never start with a null byte.
+HEADER_MAGIC = b"\x00CP"
+HEADER_VERSION = 1
+HEADER_FORMAT = ">3sBBI"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+
+class Codec(ABC):
+    """
+    Compression codec for stored document payloads.
+    """
+
+    codec: CompressionCodec
+    codec_id: int
+
+    @property
+    def dictionary_id(self) -> int:
+        return 0
+
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        pass
+
+    @abstractmethod
+    def decompress(self, data: bytes) -> bytes:
+        pass
+
+
+class NoneCodec(Codec):
+    """
+    Codec storing the raw bytes without compression.
+    """
+
+    codec = CompressionCodec.NONE
+    codec_id = 0
+
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+    def decompress(self, data: bytes) -> bytes:
+        return data
+
+
+class ZlibCodec(Codec):
+    """
+    Codec compressing with zlib.
+    """
+
+    codec = CompressionCodec.ZLIB
+    codec_id = 1
+
+    def __init__(self, level: int = 6):
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, level=self.level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+
+class ZstdCodec(Codec):
+    """
+    Codec compressing with zstd and an optional dictionary trained on extracted
+    documents, which mainly improves the ratio of small payloads.
+    """
+
+    codec = CompressionCodec.ZSTD
+    codec_id = 2
+
+    def __init__(self, level: int = 3, dictionary: bytes = None):
+        self.level = level
+        self.dictionary = None
+        if dictionary:
+            # Digest the dictionary once instead of with every compressor
+            self.dictionary = zstandard.ZstdCompressionDict(dictionary)
+            self.dictionary.precompute_compress(level=level)
+
+    @property
+    def dictionary_id(self) -> int:
+        return self.dictionary.dict_id() if self.dictionary else 0
+
+    def compress(self, data: bytes) -> bytes:
+        return zstandard.ZstdCompressor(
+            level=self.level, dict_data=self.dictionary
+        ).compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zstandard.ZstdDecompressor(dict_data=self.dictionary).decompress(data)
+
+
+class Lz4Codec(Codec):
+    """
+    Codec compressing with the lz4 frame format.
+    """
+
+    codec = CompressionCodec.LZ4
+    codec_id = 3
+
+    def __init__(self, level: int = 0):
+        self.level = level
+
+    def compress(self, data: bytes) -> bytes:
+        return lz4.frame.compress(data, compression_level=self.level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return lz4.frame.decompress(data)
+
+
+def create_codec(
+    codec: CompressionCodec, level: int = None, dictionary: bytes = None
+) -> Codec:
+    """
+    Create a codec.
+
+    :param codec: The compression codec.
+    :type codec: CompressionCodec
+    :param level: The compression level or None to use the default level of the codec.
+    :type level: int
+    :param dictionary: The zstd dictionary or None to compress without dictionary.
+    :type dictionary: bytes
+    :return: The codec.
+    :rtype: Codec
+    """
+    kwargs = {} if level is None else {"level": level}
+    match codec:
+        case CompressionCodec.NONE:
+            return NoneCodec()
+        case CompressionCodec.ZLIB:
+            return ZlibCodec(**kwargs)
+        case CompressionCodec.ZSTD:
+            return ZstdCodec(dictionary=dictionary, **kwargs)
+        case CompressionCodec.LZ4:
+            return Lz4Codec(**kwargs)
+    raise ValueError(f"Unsupported compression codec '{codec}'.")
+
+
+@functools.cache
+def get_zstd_dictionary() -> bytes | None:
+    """
+    Load the zstd dictionary configured in the settings.
+
+    :return: The dictionary or None if no dictionary is configured.
+    :rtype: bytes | None
+    """
+    if not settings.COMPRESSION_ZSTD_DICTIONARY_PATH:
+        return None
+    with open(settings.COMPRESSION_ZSTD_DICTIONARY_PATH, "rb") as file:
+        return file.read()
+
+
+@functools.cache
+def get_codec() -> Codec:
+    """
+    Get the codec configured in the settings for new payloads.
+
+    :return: The codec.
+    :rtype: Codec
+    """
+    codec = create_codec(
+        codec=settings.COMPRESSION_CODEC,
+        level=settings.COMPRESSION_LEVEL,
+        dictionary=get_zstd_dictionary(),
+    )
+    logger.info(f"Using compression codec '{codec.codec.value}' for stored documents.")
+    return codec
+
+
+@functools.cache
+def get_decoder(codec_id: int, dictionary_id: int) -> Codec:
+    """
+    Get the codec which decodes payloads with the given header.
+
+    :param codec_id: The codec id of the payload.
+    :type codec_id: int
+    :param dictionary_id: The zstd dictionary id of the payload.
+    :type dictionary_id: int
+    :return: The codec.
+    :rtype: Codec
+    """
+    match codec_id:
+        case NoneCodec.codec_id:
+            return NoneCodec()
+        case ZlibCodec.codec_id:
+            return ZlibCodec()
+        case ZstdCodec.codec_id:
+            decoder = ZstdCodec(
+                dictionary=get_zstd_dictionary() if dictionary_id else None
+            )
+            if decoder.dictionary_id != dictionary_id:
+                raise ValueError(
+                    f"Payload requires zstd dictionary '{dictionary_id}', which is not configured."
+                )
+            return decoder
+        case Lz4Codec.codec_id:
+            return Lz4Codec()
+    raise ValueError(f"Unsupported codec id '{codec_id}' in payload header.")
+
+
+def compress_bytes(data: bytes, codec: Codec = None) -> bytes:
+    """
+    Compress bytes and prepend a header describing the codec, for backends
+    storing binary data.
+
+    :param data: The bytes to compress.
+    :type data: bytes
+    :param codec: The codec or None to use the codec configured in the settings.
+    :type codec: Codec
+    :return: The header followed by the compressed bytes.
+    :rtype: bytes
+    """
+    codec = codec or get_codec()
+    header = struct.pack(
+        HEADER_FORMAT,
+        HEADER_MAGIC,
+        HEADER_VERSION,
+        codec.codec_id,
+        codec.dictionary_id,
+    )
+    return header + codec.compress(data)
+
+
+def decompress_bytes(payload: bytes, codec: Codec = None) -> bytes:
+    """
+    Decompress bytes with the codec described in the header. Payloads without
+    header are decompressed with zlib.
+
+    :param payload: The compressed payload.
+    :type payload: bytes
+    :param codec: The codec to use if it matches the header, e.g. with a dictionary which is not configured in the settings.
+    :type codec: Codec
+    :return: The decompressed bytes.
+    :rtype: bytes
+    """
+    if not payload.startswith(HEADER_MAGIC):
+        return zlib.decompress(payload)
+    _, version, codec_id, dictionary_id = struct.unpack_from(HEADER_FORMAT, payload)
+    if version != HEADER_VERSION:
+        raise ValueError(f"Unsupported payload header version '{version}'.")
+    if not (
+        codec and codec.codec_id == codec_id and codec.dictionary_id == dictionary_id
+    ):
+        codec = get_decoder(codec_id=codec_id, dictionary_id=dictionary_id)
+    return codec.decompress(payload[HEADER_SIZE:])
+
+
+def compress_string(input_string: str, codec: Codec = None) -> str:
+    """
+    Compress a string and encode it with base64, for backends storing JSON.
+
+    :param input_string: The string to compress.
+    :type input_string: str
+    :param codec: The codec or None to use the codec configured in the settings.
+    :type codec: Codec
+    :return: The compressed and base64-encoded string.
+    :rtype: str
+    """
+    payload = compress_bytes(input_string.encode("utf-8"), codec=codec)
+    return base64.b64encode(payload).decode("utf-8")
+
+
+def decompress_string(compressed_string: str, codec: Codec = None) -> str:
+    """
+    Decompress a base64-encoded string created by `compress_string` or by
+    previous versions, which used zlib without header.
+
+    :param compressed_string: The compressed string to decompress.
+    :type compressed_string: str
+    :param codec: The codec to use if it matches the header.
+    :type codec: Codec
+    :return: The decompressed string.
+    :rtype: str
+    """
+    payload = base64.b64decode(compressed_string.encode("utf-8"))
+    return decompress_bytes(payload, codec=codec).decode("utf-8")
+
+
+def train_zstd_dictionary(samples: list[bytes], dictionary_size: int) -> bytes:
+    """
+    Train a zstd dictionary on sample payloads, e.g. extracted documents.
+
+    :param samples: The sample payloads.
+    :type samples: list[bytes]
+    :param dictionary_size: The maximum size of the dictionary in bytes.
+    :type dictionary_size: int
+    :return: The dictionary.
+    :rtype: bytes
+    """
+    return zstandard.train_dictionary(dictionary_size, samples).as_bytes()
@@ -0,0 +1,336 @@
+import bisect
+import html
+import re
+from typing import Tuple
+
+from app.files.pages import PAGE_BREAK_PATTERN, format_page_marker
+from app.logs import setup_logging
+
+logger = setup_logging(__name__)
+
+PAGE_FURNITURE_ROLES = ("pageHeader", "pageFooter")
+PAGE_NUMBER_ROLE = "pageNumber"
+COMMENT_PATTERN = re.compile(r"<!--.*?-->", re.DOTALL)
+FIGURE_TAG_PATTERN = re.compile(r"</?(?:figure|figcaption)\b[^>]*>", re.IGNORECASE)
+TABLE_PATTERN = re.compile(r"<table\b[^>]*>.*?</table>", re.IGNORECASE | re.DOTALL)
+TABLE_CAPTION_PATTERN = re.compile(
+    r"<caption\b[^>]*>(.*?)</caption>", re.IGNORECASE | re.DOTALL
+)
+TABLE_ROW_PATTERN = re.compile(r"<tr\b[^>]*>(.*?)</tr>", re.IGNORECASE | re.DOTALL)
+TABLE_CELL_PATTERN = re.compile(
+    r"<(th|td)\b[^>]*>(.*?)</\1>", re.IGNORECASE | re.DOTALL
+)
+TAG_PATTERN = re.compile(r"<[^>]+>")
+INLINE_WHITESPACE_PATTERN = re.compile(r"[ \t]{2,}|[ \t]+(?=\n|$)")
+BLANK_LINES_PATTERN = re.compile(r"\n[ \t]*(?:\n[ \t]*){2,}")
+DIGITS_PATTERN = re.compile(r"\d+")
+
+
+class OffsetMap:
+    """
+    Maps character offsets of the original content to offsets of the compacted
+    content, so that offsets such as section boundaries remain valid.
+    """
+
+    def __init__(self, edits: list[Tuple[int, int, str]]):
+        """
+        Initialize the OffsetMap.
+
+        :param edits: The sorted and non-overlapping edits as tuples of start, end and replacement.
+        :type edits: list[Tuple[int, int, str]]
+        """
+        self._starts = []
+        self._ends = []
+        self._new_starts = []
+        self._deltas = []
+        delta = 0
+        for start, end, replacement in edits:
+            self._starts.append(start)
+            self._ends.append(end)
+            self._new_starts.append(start + delta)
+            delta += len(replacement) - (end - start)
+            self._deltas.append(delta)
+        self._next: OffsetMap | None = None
+
+    def then(self, offset_map: "OffsetMap") -> "OffsetMap":
+        """
+        Chain another offset map that is applied after this one.
+
+        :param offset_map: The offset map of the next compaction step.
+        :type offset_map: OffsetMap
+        :return: This offset map.
+        :rtype: OffsetMap
+        """
+        if self._next is None:
+            self._next = offset_map
+        else:
+            self._next.then(offset_map)
+        return self
+
+    def map(self, offset: int) -> int:
+        """
+        Map an offset of the original content to the compacted content.
+
+        :param offset: The offset within the original content.
+        :type offset: int
+        :return: The offset within the compacted content.
+        :rtype: int
+        """
+        position = bisect.bisect_right(self._starts, offset) - 1
+        if position < 0:
+            mapped_offset = offset
+        elif offset < self._ends[position]:
+            mapped_offset = self._new_starts[position]
+        else:
+            mapped_offset = offset + self._deltas[position]
+        return self._next.map(mapped_offset) if self._next else mapped_offset
+
+
+def _overlaps(edit: Tuple[int, int, str], start: int, end: int) -> bool:
+    """
+    Check whether an edit overlaps a range. Insertions only overlap ranges they split.
+
+    :param edit: The edit as tuple of start, end and replacement.
+    :type edit: Tuple[int, int, str]
+    :param start: The start of the range.
+    :type start: int
+    :param end: The end of the range.
+    :type end: int
+    :return: True if the edit overlaps the range.
+    :rtype: bool
+    """
+    edit_start, edit_end, _ = edit
+    if edit_start == edit_end and start == end:
+        return False
+    if edit_start == edit_end:
+        return start < edit_start < end
+    if start == end:
+        return edit_start < start < edit_end
+    return edit_start < end and start < edit_end
+
+
+def apply_edits(
+    content: str, edits: list[Tuple[int, int, str]]
+) -> Tuple[str, OffsetMap]:
+    """
+    Apply replacements to a text. Edits overlapping a previous edit are skipped.
+
+    :param content: The text to edit.
+    :type content: str
+    :param edits: The edits as tuples of start, end and replacement in order of precedence.
+    :type edits: list[Tuple[int, int, str]]
+    :return: A tuple containing the edited text and the offset map.
+    :rtype: Tuple[str, OffsetMap]
+    """
+    accepted: list[Tuple[int, int, str]] = []
+    keys: list[Tuple[int, int]] = []
+    for start, end, replacement in edits:
+        position = bisect.bisect_left(keys, (start, end))
+        neighbors = accepted[max(position - 2, 0) : position + 2]
+        if any(_overlaps(neighbor, start, end) for neighbor in neighbors):
+            continue
+        accepted.insert(position, (start, end, replacement))
+        keys.insert(position, (start, end))
+
+    parts = []
+    cursor = 0
+    for start, end, replacement in accepted:
+        parts.append(content[cursor:start])
+        parts.append(replacement)
+        cursor = end
+    parts.append(content[cursor:])
+
+    return "".join(parts), OffsetMap(accepted)
+
+
+def compact_table(table: str) -> str:
+    """
+    Convert an HTML table of Document Intelligence into a compact markdown table.
+
+    :param table: The HTML table.
+    :type table: str
+    :return: The table in markdown format.
+    :rtype: str
+    """
+
+    def clean_cell(cell: str) -> str:
+        text = html.unescape(TAG_PATTERN.sub(" ", cell))
+        return " ".join(text.split()).replace("|", "\\|")
+
+    lines = []
+    caption_match = TABLE_CAPTION_PATTERN.search(table)
+    if caption_match:
+        lines.append(clean_cell(caption_match.group(1)))
+
+    for row_index, row_match in enumerate(TABLE_ROW_PATTERN.finditer(table)):
+        cells = TABLE_CELL_PATTERN.findall(row_match.group(1))
+        if not cells:
+            continue
+        lines.append("|" + "|".join(clean_cell(cell) for _, cell in cells) + "|")
+        if row_index == 0:
+            lines.append("|" + "|".join("-" for _ in cells) + "|")
+
+    return "\n".join(lines)
+
+
+class DocumentCompactor:
+    """
+    Compactor which reduces the tokens of the markdown content generated by
+    Document Intelligence without removing information relevant for the agent.
+    """
+
+    def __init__(
+        self,
+        deduplicate_page_furniture: bool = True,
+        page_markers: bool = True,
+        strip_comments: bool = True,
+        strip_figures: bool = True,
+        compact_tables: bool = True,
+        collapse_whitespace: bool = True,
+    ):
+        """
+        Initialize the DocumentCompactor.
+
+        :param deduplicate_page_furniture: Whether to keep only the first occurrence of repeated page headers and footers.
+        :type deduplicate_page_furniture: bool
+        :param page_markers: Whether to replace page breaks with compact page markers.
+        :type page_markers: bool
+        :param strip_comments: Whether to remove remaining HTML comments.
+        :type strip_comments: bool
+        :param strip_figures: Whether to remove figure tags while keeping their content.
+        :type strip_figures: bool
+        :param compact_tables: Whether to convert HTML tables into markdown tables.
+        :type compact_tables: bool
+        :param collapse_whitespace: Whether to collapse runs of whitespace.
+        :type collapse_whitespace: bool
+        """
+        self.deduplicate_page_furniture = deduplicate_page_furniture
+        self.page_markers = page_markers
+        self.strip_comments = strip_comments
+        self.strip_figures = strip_figures
+        self.compact_tables = compact_tables
+        self.collapse_whitespace = collapse_whitespace
+
+    def _get_page_furniture_edits(self, data: dict) -> list[Tuple[int, int, str]]:
+        """
+        Create edits which remove repeated page headers, page footers and page numbers.
+
+        :param data: The extracted data as a dictionary.
+        :type data: dict
+        :return: The list of edits.
+        :rtype: list[Tuple[int, int, str]]
+        """
+        edits = []
+        seen = set()
+        for paragraph in data.get("paragraphs", []):
+            role = paragraph.get("role")
+            spans = paragraph.get("spans") or []
+            if not spans or role not in PAGE_FURNITURE_ROLES + (PAGE_NUMBER_ROLE,):
+                continue
+
+            # Keep the first occurrence of each header and footer as plain text
+            replacement = ""
+            if role in PAGE_FURNITURE_ROLES:
+                text = " ".join(paragraph.get("content", "").split())
+                key = (role, DIGITS_PATTERN.sub("#", text.lower()))
+                if key not in seen:
+                    seen.add(key)
+                    replacement = text
+
+            for span in spans:
+                edits.append(
+                    (span["offset"], span["offset"] + span["length"], replacement)
+                )
+                replacement = ""
+        return edits
+
+    def _get_markup_edits(self, content: str) -> list[Tuple[int, int, str]]:
+        """
+        Create edits which replace non-semantic markup.
+
+        :param content: The markdown content.
+        :type content: str
+        :return: The list of edits.
+        :rtype: list[Tuple[int, int, str]]
+        """
+        edits = []
+        if self.page_markers:
+            edits.append((0, 0, f"{format_page_marker(1)}\n"))
+            for page_index, match in enumerate(PAGE_BREAK_PATTERN.finditer(content)):
+                edits.append(
+                    (
+                        match.start(),
+                        match.end(),
+                        f"\n{format_page_marker(page_index + 2)}\n",
+                    )
+                )
+        if self.compact_tables:
+            edits.extend(
+                (match.start(), match.end(), compact_table(match.group(0)))
+                for match in TABLE_PATTERN.finditer(content)
+            )
+        if self.strip_comments:
+            edits.extend(
+                (match.start(), match.end(), "")
+                for match in COMMENT_PATTERN.finditer(content)
+                if self.page_markers or not PAGE_BREAK_PATTERN.fullmatch(match.group(0))
+            )
+        if self.strip_figures:
+            edits.extend(
+                (match.start(), match.end(), "")
+                for match in FIGURE_TAG_PATTERN.finditer(content)
+            )
+        return edits
+
+    @staticmethod
+    def _get_whitespace_edits(content: str) -> list[Tuple[int, int, str]]:
+        """
+        Create edits which collapse runs of whitespace and blank lines.
+
+        :param content: The markdown content.
+        :type content: str
+        :return: The list of edits.
+        :rtype: list[Tuple[int, int, str]]
+        """
+        edits = [
+            (match.start(), match.end(), "\n\n")
+            for match in BLANK_LINES_PATTERN.finditer(content)
+        ]
+        edits.extend(
+            (
+                match.start(),
+                match.end(),
+                "" if content[match.end() : match.end() + 1] in ("", "\n") else " ",
+            )
+            for match in INLINE_WHITESPACE_PATTERN.finditer(content)
+        )
+        return edits
+
+    def compact(self, data: dict) -> Tuple[str, OffsetMap]:
+        """
+        Compact the markdown content of a Document Intelligence layout result.
+
+        :param data: The extracted data as a dictionary.
+        :type data: dict
+        :return: A tuple containing the compacted content and the map from original to compacted offsets.
+        :rtype: Tuple[str, OffsetMap]
+        """
+        content = data.get("content", "")
+
+        # Replace page furniture and markup of the original content
+        edits = (
+            self._get_page_furniture_edits(data)
+            if self.deduplicate_page_furniture
+            else []
+        )
+        edits.extend(self._get_markup_edits(content))
+        compacted_content, offset_map = apply_edits(content, edits)
+
+        # Collapse whitespace left behind by the previous step
+        if self.collapse_whitespace:
+            compacted_content, whitespace_offset_map = apply_edits(
+                compacted_content, self._get_whitespace_edits(compacted_content)
+            )
+            offset_map.then(whitespace_offset_map)
+
+        return compacted_content, offset_map
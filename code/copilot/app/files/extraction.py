@@ -1,23 +1,30 @@
 import asyncio
-import base64
 import json
-import zlib
 from typing import Tuple
 
 import aiohttp
 from app.agents.summarizer import SummarizerAgent
+from app.core.clients import get_credential
+from app.core.executor import run_cpu_bound
+from app.files.progress import ProgressReporter
+from app.files.projection import project_analyze_result
 from app.logs import setup_logging
-from azure.ai.documentintelligence import DocumentIntelligenceClient
+from app.models.core import ProgressStage
+from azure.ai.documentintelligence.aio import DocumentIntelligenceClient
 from azure.ai.documentintelligence.models import (
     AnalyzeDocumentRequest,
+    AnalyzeResult,
     DocumentAnalysisFeature,
     DocumentContentFormat,
 )
 from azure.core.credentials import AzureKeyCredential
-from azure.identity import DefaultAzureCredential
+from azure.core.polling import AsyncLROPoller
 
 logger = setup_logging(__name__)
 
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+POLLER_STATUS_INTERVAL_SECONDS = 1.0
+
 
 class FileExtractionClient:
     def __init__(
@@ -41,14 +48,26 @@ def __init__(
         if api_key:
             credential = AzureKeyCredential(key=api_key)
         else:
-            credential = DefaultAzureCredential(
-                managed_identity_client_id=managed_identity_client_id,
-            )
+            credential = get_credential(managed_identity_client_id)
         self.document_intelligence_client = DocumentIntelligenceClient(
             endpoint=endpoint, credential=credential
         )
 
-    async def extract_data(self, file_url: str) -> dict:
+    async def close(self) -> None:
+        """
+        Close the Document Intelligence client.
+
+        :param self: The instance of the FileExtractionClient.
+        :type self: FileExtractionClient
+        """
+        await self.document_intelligence_client.close()
+
+    async def extract_data(
+        self,
+        file_url: str,
+        keep_paragraphs: bool = False,
+        progress: ProgressReporter = None,
+    ) -> dict:
         """
         Extract data from a document at the given URL.
 
@@ -56,6 +75,10 @@ async def extract_data(self, file_url: str) -> dict:
         :type self: FileExtractionClient
         :param file_url: The URL of the file to extract data from.
         :type file_url: str
+        :param keep_paragraphs: Whether to extract all paragraphs instead of only the structural ones.
+        :type keep_paragraphs: bool
+        :param progress: The reporter receiving download and analysis progress.
+        :type progress: ProgressReporter
         :return: The extracted data as a dictionary.
         :rtype: dict
         """
@@ -66,6 +89,8 @@ async def extract_data(self, file_url: str) -> dict:
                 file_url,
                 features=[],  # [DocumentAnalysisFeature.OCR_HIGH_RESOLUTION],
                 content_format=DocumentContentFormat.MARKDOWN,
+                keep_paragraphs=keep_paragraphs,
+                progress=progress or ProgressReporter(),
             )
         )
 
@@ -76,6 +101,8 @@ async def _extract_data(
         file_url: str,
         features: list[DocumentAnalysisFeature],
         content_format: DocumentContentFormat,
+        keep_paragraphs: bool,
+        progress: ProgressReporter,
     ) -> dict:
         """
         Extract data from a document at the given URL using specified features.
@@ -86,33 +113,145 @@ async def _extract_data(
         :type file_url: str
         :param features: The features to use for document analysis.
         :type features: list[DocumentAnalysisFeature]
-        :return: The extracted data as a dictionary.
+        :param keep_paragraphs: Whether to extract all paragraphs instead of only the structural ones.
+        :type keep_paragraphs: bool
+        :param progress: The reporter receiving download and analysis progress.
+        :type progress: ProgressReporter
+        :return: The extracted data projected onto the fields used by the copilot.
         :rtype: dict
         """
         try:
             # Download file content
-            async with aiohttp.ClientSession() as session:
-                async with session.get(file_url) as response:
-                    file_content = await response.read()
+            file_content = await self._download_file(
+                file_url=file_url, progress=progress
+            )
 
             # Create body for analysis
             body = AnalyzeDocumentRequest(bytes_source=file_content)
 
             # Analyze document
-            poller = self.document_intelligence_client.begin_analyze_document(
+            await progress.report(
+                ProgressStage.ANALYSIS, "Submitting document for analysis ... "
+            )
+            poller = await self.document_intelligence_client.begin_analyze_document(
                 model_id="prebuilt-layout",
                 body=body,
                 features=features,
                 output_content_format=content_format,
             )
-            result = poller.result()
-            result_dict = result.as_dict()
+            result = await self._wait_for_result(poller=poller, progress=progress)
+            result_dict = project_analyze_result(
+                result, keep_paragraphs=keep_paragraphs
+            )
         except Exception as e:
             logger.error(f"Error during document analysis: {e}")
             raise e
 
         return result_dict
 
+    @staticmethod
+    async def get_file_size(file_url: str) -> int | None:
+        """
+        Get the size of a file without downloading it.
+
+        :param file_url: The URL of the file.
+        :type file_url: str
+        :return: The size of the file in bytes or None if the server does not report it.
+        :rtype: int | None
+        """
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.head(file_url, allow_redirects=True) as response:
+                    if response.ok:
+                        return response.content_length
+        except aiohttp.ClientError as e:
+            logger.warning(f"Failed to get file size: '{e}'")
+        return None
+
+    @staticmethod
+    async def _download_file(file_url: str, progress: ProgressReporter) -> bytes:
+        """
+        Download a file in chunks and report the downloaded bytes.
+
+        :param file_url: The URL of the file to download.
+        :type file_url: str
+        :param progress: The reporter receiving download progress.
+        :type progress: ProgressReporter
+        :return: The file content.
+        :rtype: bytes
+        """
+        async with aiohttp.ClientSession() as session:
+            async with session.get(file_url) as response:
+                total_bytes = response.content_length
+                file_content = bytearray()
+                await progress.report(
+                    ProgressStage.DOWNLOAD, "Downloading file ... ", fraction=0.0
+                )
+                async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_SIZE):
+                    file_content.extend(chunk)
+                    downloaded_megabytes = len(file_content) / 2**20
+                    if total_bytes:
+                        message = f"Downloading file ({downloaded_megabytes:.1f} of {total_bytes / 2**20:.1f} MB) ... "
+                    else:
+                        message = (
+                            f"Downloading file ({downloaded_megabytes:.1f} MB) ... "
+                        )
+                    await progress.report(
+                        ProgressStage.DOWNLOAD,
+                        message,
+                        fraction=(
+                            len(file_content) / total_bytes if total_bytes else None
+                        ),
+                        downloaded_bytes=len(file_content),
+                    )
+
+        logger.info(f"Downloaded file with {len(file_content)} bytes.")
+        return bytes(file_content)
+
+    @staticmethod
+    async def _wait_for_result(
+        poller: AsyncLROPoller, progress: ProgressReporter
+    ) -> AnalyzeResult:
+        """
+        Wait for the result of the document analysis and report status transitions
+        of the poller. Since the service does not report a completed fraction, the
+        elapsed time is reported while the analysis is running.
+
+        :param poller: The poller of the document analysis.
+        :type poller: AsyncLROPoller
+        :param progress: The reporter receiving analysis progress.
+        :type progress: ProgressReporter
+        :return: The analysis result.
+        :rtype: AnalyzeResult
+        """
+        loop = asyncio.get_running_loop()
+        start_time = loop.time()
+        result_task = asyncio.ensure_future(poller.result())
+        status = None
+        try:
+            while not result_task.done():
+                await asyncio.wait(
+                    {result_task}, timeout=POLLER_STATUS_INTERVAL_SECONDS
+                )
+                elapsed_seconds = int(loop.time() - start_time)
+                status_changed = poller.status() != status
+                if status_changed:
+                    status = poller.status()
+                    logger.info(
+                        f"Document analysis status changed to '{status}' after {elapsed_seconds}s."
+                    )
+                await progress.report(
+                    ProgressStage.ANALYSIS,
+                    f"Analyzing document layout ({status}, {elapsed_seconds}s) ... ",
+                    force=status_changed,
+                    status=status,
+                    elapsed_seconds=elapsed_seconds,
+                )
+        finally:
+            if not result_task.done():
+                result_task.cancel()
+        return result_task.result()
+
     async def _summarize_tables(
         self,
         tables: list[dict],
@@ -122,6 +261,7 @@ async def _summarize_tables(
         instructions: str,
         managed_identity_client_id: str = None,
         reasoning_effort: str = "minimal",
+        progress: ProgressReporter = None,
     ) -> Tuple[dict, dict]:
         """
         Summarize tables using the SummarizerAgent.
@@ -142,6 +282,8 @@ async def _summarize_tables(
         :type managed_identity_client_id: str
         :param reasoning_effort: The level of reasoning effort for the agent.
         :type reasoning_effort: str
+        :param progress: The reporter receiving the completion of table summaries.
+        :type progress: ProgressReporter
         :return: A tuple containing the table summaries and the table collection.
         :rtype: Tuple[dict, dict]
         """
@@ -161,18 +303,30 @@ async def _summarize_tables(
 
         # Define task list
         tasks = []
+        progress = progress or ProgressReporter()
+        completed = 0
+
+        async def summarize_table(table_content: str):
+            nonlocal completed
+            table_summary_response = await summarizer_agent.get_table_summary(
+                table=table_content,
+                last_response_id=None,
+            )
+            completed += 1
+            await progress.report(
+                ProgressStage.CLEANING,
+                f"Summarizing tables ({completed}/{len(tables)}) ... ",
+                fraction=completed / len(tables),
+                completed_tables=completed,
+            )
+            return table_summary_response
 
         for table in tables:
             # Summarize each table
             table_content = json.dumps(table)
 
             # Create task
-            task = asyncio.create_task(
-                await summarizer_agent.get_table_summary(
-                    table=table_content,
-                    last_response_id=None,
-                )
-            )
+            task = asyncio.create_task(summarize_table(table_content))
             tasks.append((task, table_content))
 
         # Gather results
@@ -203,13 +357,14 @@ async def clean_extracted_data(
         model_name: str,
         instructions: str,
         reasoning_effort: str = "minimal",
+        progress: ProgressReporter = None,
     ) -> Tuple[str, dict]:
         """
         Clean and minify the extracted data.
 
         :param self: The instance of the FileExtractionClient.
         :type self: FileExtractionClient
-        :param data: The data to clean.
+        :param data: The extracted data projected by `project_analyze_result`.
         :type data: dict
         :param keep_paragraphs: Whether to keep paragraphs in the cleaned data.
         :type keep_paragraphs: bool
@@ -227,93 +382,69 @@ async def clean_extracted_data(
         :type instructions: str
         :param reasoning_effort: The level of reasoning effort for the agent.
         :type reasoning_effort: str
+        :param progress: The reporter receiving the cleaning steps.
+        :type progress: ProgressReporter
         :return: A tuple containing the cleaned and minified data as a JSON string and the table collection.
         :rtype: Tuple[str, dict]
         """
-        # Implement any cleaning logic here
-        cleaned_data = {}
-        table_collection = {}
-
-        # Process content
-        data_content = data.get("content", "")
-        cleaned_data["content"] = data_content
-
-        # Process paragraphs
-        if keep_paragraphs:
-            data_paragraphs = data.get("paragraphs", [])
-            for paragraph in data_paragraphs:
-                if "spans" in paragraph:
-                    del paragraph["spans"]
-                if "boundingRegions" in paragraph:
-                    paragraph["pageNumber"] = paragraph["boundingRegions"][0][
-                        "pageNumber"
-                    ]
-                    del paragraph["boundingRegions"]
-            cleaned_data["paragraphs"] = data_paragraphs
+        progress = progress or ProgressReporter()
+        await progress.report(
+            ProgressStage.CLEANING, "Cleaning extracted data ... ", fraction=0.0
+        )
 
-        # Process tables
-        if keep_tables:
-            data_tables = data.get("tables", [])
-            for table in data_tables:
-                if "boundingRegions" in table:
-                    table["pageNumber"] = table["boundingRegions"][0]["pageNumber"]
-                    del table["boundingRegions"]
-                if "spans" in table:
-                    del table["spans"]
-                if "caption" in table:
-                    del table["caption"]["spans"]
-                    del table["caption"]["elements"]
-
-                for cell in table.get("cells", []):
-                    if "spans" in cell:
-                        del cell["spans"]
-                    if "elements" in cell:
-                        del cell["elements"]
-                    if "boundingRegions" in cell:
-                        del cell["boundingRegions"]
-
-            cleaned_data["tables"] = data_tables
-
-            # Summarize tables
-            if summarize_tables:
-                table_summaries, table_collection = await self._summarize_tables(
-                    tables=cleaned_data["tables"],
-                    api_key=api_key,
-                    endpoint=endpoint,
-                    model_name=model_name,
-                    instructions=instructions,
-                    reasoning_effort=reasoning_effort,
-                )
-            cleaned_data["tables"] = table_summaries
+        # Summarize tables
+        tables = data.get("tables", []) if keep_tables else None
+        table_collection = {}
+        if keep_tables and summarize_tables:
+            tables, table_collection = await self._summarize_tables(
+                tables=data.get("tables", []),
+                api_key=api_key,
+                endpoint=endpoint,
+                model_name=model_name,
+                instructions=instructions,
+                reasoning_effort=reasoning_effort,
+                progress=progress,
+            )
 
-        # Minify JSON structure by removing unnecessary whitespace
-        cleaned_data_minified = json.dumps(cleaned_data, separators=(",", ":"))
+        # Build and serialize the cleaned data in the executor for CPU-bound work
+        cleaned_data_minified = await run_cpu_bound(
+            FileExtractionClient.serialize_cleaned_data,
+            content=data.get("content", ""),
+            paragraphs=data.get("paragraphs", []) if keep_paragraphs else None,
+            tables=tables,
+        )
 
         return cleaned_data_minified, table_collection
 
     @staticmethod
-    def compress_string(input_string: str) -> str:
+    def serialize_cleaned_data(
+        content: str, paragraphs: list[dict] | None, tables: list[dict] | dict | None
+    ) -> str:
         """
-        Compress a string using zlib and encode it with base64.
-
-        :param input_string: The string to compress.
-        :type input_string: str
-        :return: The compressed and base64-encoded string.
+        Build the cleaned data in a single pass without mutating the extracted data
+        and minify it.
+
+        :param content: The markdown content.
+        :type content: str
+        :param paragraphs: The paragraphs to keep or None to drop paragraphs.
+        :type paragraphs: list[dict] | None
+        :param tables: The tables or table summaries to keep or None to drop tables.
+        :type tables: list[dict] | dict | None
+        :return: The cleaned and minified data as a JSON string.
         :rtype: str
         """
-        compressed = zlib.compress(input_string.encode("utf-8"), level=9)
-        return base64.b64encode(compressed).decode("utf-8")
+        cleaned_data = {"content": content}
 
-    @staticmethod
-    def decompress_string(compressed_string: str) -> str:
-        """
-        Decompress a base64-encoded zlib-compressed string.
+        # Process paragraphs
+        if paragraphs is not None:
+            cleaned_data["paragraphs"] = [
+                {key: value for key, value in paragraph.items() if key != "spans"}
+                for paragraph in paragraphs
+            ]
 
-        :param compressed_string: The compressed string to decompress.
-        :type compressed_string: str
-        :return: The decompressed string.
-        :rtype: str
-        """
-        compressed_bytes = base64.b64decode(compressed_string.encode("utf-8"))
-        decompressed = zlib.decompress(compressed_bytes)
-        return decompressed.decode("utf-8")
+        # Process tables
+        if tables is not None:
+            cleaned_data["tables"] = tables
+
+        # Minify JSON structure by removing unnecessary whitespace
+        return json.dumps(cleaned_data, separators=(",", ":"))
@@ -0,0 +1,47 @@
+import re
+
+PAGE_BREAK_PATTERN = re.compile(r"<!--\s*PageBreak\s*-->")
+PAGE_MARKER_PATTERN = re.compile(r"^\[Page (\d+)\][ \t]*$", re.MULTILINE)
+
+
+def format_page_marker(page_number: int) -> str:
+    """
+    Format the compact page marker used in compacted document content.
+
+    :param page_number: The page number.
+    :type page_number: int
+    :return: The page marker.
+    :rtype: str
+    """
+    return f"[Page {page_number}]"
+
+
+def split_pages(content: str) -> list[tuple[int, str]]:
+    """
+    Split the markdown content of a document into pages. Both the page breaks of
+    Document Intelligence and the page markers of compacted content are supported.
+
+    :param content: The markdown content of the document.
+    :type content: str
+    :return: A list of tuples containing the page number and the page content without page marker.
+    :rtype: list[tuple[int, str]]
+    """
+    markers = list(PAGE_MARKER_PATTERN.finditer(content))
+    if not markers:
+        return [
+            (page_index + 1, page_content)
+            for page_index, page_content in enumerate(PAGE_BREAK_PATTERN.split(content))
+        ]
+
+    pages = []
+    leading_content = content[: markers[0].start()]
+    if leading_content.strip():
+        pages.append((max(int(markers[0].group(1)) - 1, 1), leading_content))
+    for position, marker in enumerate(markers):
+        end = (
+            markers[position + 1].start()
+            if position + 1 < len(markers)
+            else len(content)
+        )
+        pages.append((int(marker.group(1)), content[marker.end() : end]))
+    return pages
@@ -0,0 +1,263 @@
+from app.core.components import components
+from app.core.executor import run_cpu_bound
+from app.core.settings import settings
+from app.files.compaction import DocumentCompactor
+from app.files.extraction import FileExtractionClient
+from app.files.progress import ProgressReporter
+from app.files.retrieval import DocumentIndex, get_embedding_provider
+from app.files.scheduler import (
+    ExtractionScheduler,
+    ExtractionTicket,
+    estimate_memory,
+    extraction_scheduler,
+)
+from app.files.sections import SectionIndex
+from app.files.tokens import estimate_tokens, select_processing_strategy
+from app.logs import setup_logging
+from app.models.core import ProcessingStrategy, ProgressStage
+from app.models.documents import ProcessedDocument
+from app.storage.documents import DocumentStore
+from opentelemetry import metrics, trace
+
+logger = setup_logging(__name__)
+meter = metrics.get_meter(__name__)
+
+document_tokens_histogram = meter.create_histogram(
+    name="copilot.document.tokens.estimated",
+    unit="{token}",
+    description="Estimated number of tokens of uploaded documents.",
+)
+compaction_tokens_histogram = meter.create_histogram(
+    name="copilot.document.compaction.tokens_saved",
+    unit="{token}",
+    description="Estimated number of tokens removed from uploaded documents by compaction.",
+)
+
+
+class DocumentProcessor:
+    """
+    Pipeline which turns an uploaded document into the artifacts stored in the
+    user state: extraction, section index, compaction, cleaning, token estimate,
+    processing strategy and retrieval index. It is shared by the inline upload
+    turn and the background extraction workers.
+    """
+
+    def __init__(
+        self,
+        progress: ProgressReporter = None,
+        scheduler: ExtractionScheduler = extraction_scheduler,
+        document_store: DocumentStore = None,
+    ):
+        """
+        Initialize the DocumentProcessor.
+
+        :param progress: The reporter receiving progress events of all processing steps.
+        :type progress: ProgressReporter
+        :param scheduler: The scheduler admitting extractions of this instance.
+        :type scheduler: ExtractionScheduler
+        :param document_store: The store persisting the document and its indexes or None to use the shared document store.
+        :type document_store: DocumentStore
+        """
+        self.progress = progress or ProgressReporter()
+        self.scheduler = scheduler
+        self.document_store = document_store or components.get("document_store")
+        self.file_extraction_client = FileExtractionClient(
+            api_key=settings.AZURE_DOCUMENT_INTELLIGENCE_API_KEY,
+            endpoint=settings.AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT,
+            managed_identity_client_id=settings.MANAGED_IDENTITY_CLIENT_ID,
+        )
+
+    async def process(
+        self, attachment_name: str, download_url: str
+    ) -> ProcessedDocument:
+        """
+        Process a single document.
+
+        :param attachment_name: The name of the attachment.
+        :type attachment_name: str
+        :param download_url: The download url of the attachment.
+        :type download_url: str
+        :return: The processed document with references to the stored instructions and indexes.
+        :rtype: ProcessedDocument
+        """
+        logger.info(f"Processing attachment: {attachment_name}")
+
+        # Wait for admission based on the estimated memory of the extraction
+        file_size = await FileExtractionClient.get_file_size(file_url=download_url)
+        try:
+            async with self.scheduler.admit(
+                estimated_bytes=estimate_memory(file_size=file_size),
+                progress=self.progress,
+            ) as ticket:
+                return await self._process(
+                    attachment_name=attachment_name,
+                    download_url=download_url,
+                    file_size=file_size,
+                    ticket=ticket,
+                )
+        finally:
+            await self.file_extraction_client.close()
+
+    async def _process(
+        self,
+        attachment_name: str,
+        download_url: str,
+        file_size: int | None,
+        ticket: ExtractionTicket,
+    ) -> ProcessedDocument:
+        """
+        Run all processing steps for a single document.
+
+        :param attachment_name: The name of the attachment.
+        :type attachment_name: str
+        :param download_url: The download url of the attachment.
+        :type download_url: str
+        :param file_size: The size of the file in bytes or None if unknown.
+        :type file_size: int | None
+        :param ticket: The admission ticket of the extraction.
+        :type ticket: ExtractionTicket
+        :return: The processed document with references to the stored instructions and indexes.
+        :rtype: ProcessedDocument
+        """
+        # Extract text from file using FileExtractionClient
+        extracted_data = await self.file_extraction_client.extract_data(
+            file_url=download_url, keep_paragraphs=False, progress=self.progress
+        )
+
+        # Update memory estimate with the actual page count
+        await ticket.resize(
+            estimate_memory(
+                file_size=file_size,
+                page_count=len(extracted_data.get("pages", [])) or None,
+            )
+        )
+        logger.debug("Extracted Data from file %s: %s", attachment_name, extracted_data)
+
+        # TODO: Check for harmful content in extracted data which could impact the agent response.
+
+        # Build section index from the paragraph roles and spans
+        content_offset = len(settings.INSTRUCTIONS_DOCUMENT_AGENT) + 1
+        section_index = None
+        if settings.SECTION_INDEX_ENABLED:
+            section_index = SectionIndex.build(
+                data=extracted_data,
+                content_offset=content_offset,
+            )
+
+        # Compact document content
+        tokens_saved, tokens_saved_ratio = None, None
+        if settings.COMPACTION_ENABLED:
+            await self.progress.report(
+                ProgressStage.COMPACTION, "Compacting document ... "
+            )
+            document_compactor = DocumentCompactor(
+                deduplicate_page_furniture=settings.COMPACTION_DEDUPLICATE_PAGE_FURNITURE,
+                page_markers=settings.COMPACTION_PAGE_MARKERS,
+                strip_comments=settings.COMPACTION_STRIP_COMMENTS,
+                strip_figures=settings.COMPACTION_STRIP_FIGURES,
+                compact_tables=settings.COMPACTION_COMPACT_TABLES,
+                collapse_whitespace=settings.COMPACTION_COLLAPSE_WHITESPACE,
+            )
+            content_tokens = estimate_tokens(extracted_data.get("content", ""))
+            compacted_content, offset_map = await run_cpu_bound(
+                document_compactor.compact, data=extracted_data
+            )
+            compacted_content_tokens = estimate_tokens(compacted_content)
+            extracted_data["content"] = compacted_content
+            if section_index:
+                section_index.remap(
+                    offset_map=offset_map,
+                    content_length=len(compacted_content),
+                )
+
+            # Report token reduction
+            tokens_saved = content_tokens - compacted_content_tokens
+            tokens_saved_ratio = tokens_saved / max(content_tokens, 1)
+            logger.info(
+                f"Compacted document from {content_tokens} to {compacted_content_tokens} estimated tokens ({tokens_saved_ratio:.1%} saved)."
+            )
+            compaction_tokens_histogram.record(tokens_saved)
+            trace.get_current_span().set_attributes(
+                {
+                    "document.compaction.tokens_before": content_tokens,
+                    "document.compaction.tokens_after": compacted_content_tokens,
+                }
+            )
+
+        # Clean extracted data
+        cleaned_data, _ = await self.file_extraction_client.clean_extracted_data(
+            data=extracted_data,
+            keep_paragraphs=False,
+            keep_tables=False,
+            summarize_tables=False,
+            api_key=settings.AZURE_OPENAI_API_KEY,
+            endpoint=settings.AZURE_OPENAI_ENDPOINT,
+            model_name=settings.AZURE_OPENAI_MODEL_SLM_NAME,
+            instructions=settings.INSTRUCTIONS_TABLE_SUMMARY_AGENT,
+            reasoning_effort="minimal",
+            progress=self.progress,
+        )
+        logger.debug("Cleaned Data from file %s: %s", attachment_name, cleaned_data)
+
+        # Estimate tokens and select processing strategy
+        instructions = settings.INSTRUCTIONS_DOCUMENT_AGENT + f"\n{cleaned_data}"
+        token_estimate = estimate_tokens(instructions)
+        processing_strategy = select_processing_strategy(
+            instructions=instructions, compacted=settings.COMPACTION_ENABLED
+        )
+        logger.info(
+            f"Document has {token_estimate} estimated tokens. Selected processing strategy '{processing_strategy.value}'."
+        )
+        document_tokens_histogram.record(
+            token_estimate,
+            attributes={"processing_strategy": processing_strategy.value},
+        )
+        trace.get_current_span().set_attributes(
+            {
+                "document.tokens.estimated": token_estimate,
+                "document.processing_strategy": processing_strategy.value,
+            }
+        )
+
+        # Build retrieval index, which also answers free-form questions under map-reduce
+        document_index = None
+        if processing_strategy in (
+            ProcessingStrategy.RETRIEVAL,
+            ProcessingStrategy.MAP_REDUCE,
+        ):
+            document_index = await DocumentIndex.build(
+                content=extracted_data.get("content", ""),
+                embedding_provider=get_embedding_provider(),
+                max_characters=settings.RETRIEVAL_CHUNK_MAX_CHARACTERS,
+                progress=self.progress,
+            )
+
+        # Store document and indexes in the document store
+        instructions_reference = await self.document_store.put(instructions)
+        document_index_reference = (
+            await self.document_store.put(document_index.to_string())
+            if document_index
+            else None
+        )
+        section_index_reference = (
+            await self.document_store.put(section_index.to_string())
+            if section_index
+            else None
+        )
+
+        logger.info(f"Attachment '{attachment_name}' processed successfully.")
+        await self.progress.report(
+            ProgressStage.COMPLETED, "File processing completed.", fraction=1.0
+        )
+
+        return ProcessedDocument(
+            attachment_name=attachment_name,
+            instructions_reference=instructions_reference,
+            content_offset=content_offset,
+            token_estimate=token_estimate,
+            processing_strategy=processing_strategy,
+            document_index_reference=document_index_reference,
+            section_index_reference=section_index_reference,
+            tokens_saved=tokens_saved,
+            tokens_saved_ratio=tokens_saved_ratio,
+        )
@@ -0,0 +1,126 @@
+import time
+from typing import Awaitable, Callable
+
+from app.logs import setup_logging
+from app.models.core import ProgressStage
+from app.models.documents import ProgressEvent
+from opentelemetry import trace
+
+logger = setup_logging(__name__)
+
+# Share of the overall progress covered by each processing stage
+STAGE_RANGES = {
+    ProgressStage.QUEUED: (0.0, 0.0),
+    ProgressStage.DOWNLOAD: (0.0, 0.1),
+    ProgressStage.ANALYSIS: (0.1, 0.7),
+    ProgressStage.COMPACTION: (0.7, 0.75),
+    ProgressStage.CLEANING: (0.75, 0.85),
+    ProgressStage.INDEXING: (0.85, 1.0),
+    ProgressStage.COMPLETED: (1.0, 1.0),
+}
+
+ProgressSink = Callable[[ProgressEvent], Awaitable[None]]
+
+
+class ProgressReporter:
+    """
+    Reporter for the progress of document processing. Every event is recorded as
+    span event on the current span, while sinks such as the Teams streaming
+    response only receive events when the stage changes or the minimum interval
+    since the previous forwarded event has elapsed.
+    """
+
+    def __init__(
+        self, sinks: list[ProgressSink] = None, min_interval_seconds: float = 2.0
+    ):
+        """
+        Initialize the ProgressReporter.
+
+        :param sinks: The coroutines receiving rate-limited progress events.
+        :type sinks: list[ProgressSink]
+        :param min_interval_seconds: The minimum interval between events forwarded to the sinks within a stage.
+        :type min_interval_seconds: float
+        """
+        self.sinks = sinks or []
+        self.min_interval_seconds = min_interval_seconds
+        self._last_stage: ProgressStage | None = None
+        self._last_forwarded_at = 0.0
+
+    async def report(
+        self,
+        stage: ProgressStage,
+        message: str,
+        fraction: float = None,
+        force: bool = False,
+        **attributes: str | int | float | bool,
+    ) -> None:
+        """
+        Report a progress event.
+
+        :param stage: The processing stage.
+        :type stage: ProgressStage
+        :param message: The progress message for the user.
+        :type message: str
+        :param fraction: The completed fraction of the stage or None if unknown.
+        :type fraction: float
+        :param force: Whether to forward the event to the sinks regardless of the rate limit, e.g. for status transitions.
+        :type force: bool
+        :param attributes: Additional attributes recorded with the span event.
+        :type attributes: str | int | float | bool
+        """
+        stage_start, stage_end = STAGE_RANGES[stage]
+        if fraction is not None:
+            fraction = min(max(fraction, 0.0), 1.0)
+        event = ProgressEvent(
+            stage=stage,
+            message=message,
+            fraction=fraction,
+            progress=stage_start + (stage_end - stage_start) * (fraction or 0.0),
+            attributes=attributes,
+        )
+
+        # Record span event
+        span_attributes = {
+            "progress.message": message,
+            "progress.overall": event.progress,
+            **{f"progress.{key}": value for key, value in attributes.items()},
+        }
+        if fraction is not None:
+            span_attributes["progress.fraction"] = fraction
+        trace.get_current_span().add_event(
+            name=f"document.progress.{stage.value}", attributes=span_attributes
+        )
+        logger.debug(
+            "Document processing progress %.0f%% (%s): %s",
+            event.progress * 100,
+            stage.value,
+            message,
+        )
+
+        # Forward rate-limited event to sinks
+        now = time.monotonic()
+        if (
+            not force
+            and stage == self._last_stage
+            and now - self._last_forwarded_at < self.min_interval_seconds
+        ):
+            return
+        self._last_stage = stage
+        self._last_forwarded_at = now
+        for sink in self.sinks:
+            try:
+                await sink(event)
+            except Exception as e:
+                logger.warning(f"Failed to forward progress event to sink: '{e}'")
+
+
+def format_progress_event(event: ProgressEvent) -> str:
+    """
+    Format a progress event for the user.
+
+    :param event: The progress event.
+    :type event: ProgressEvent
+    :return: The formatted progress message.
+    :rtype: str
+    """
+    return f"({event.progress:4.0%}) {event.message}"
@@ -0,0 +1,102 @@
+from typing import Any, Mapping
+
+STRUCTURAL_ROLES = ("title", "sectionHeading", "pageHeader", "pageFooter", "pageNumber")
+TABLE_CELL_FIELDS = ("kind", "rowIndex", "columnIndex", "rowSpan", "columnSpan")
+
+
+def _get_page_number(item: Mapping[str, Any]) -> int | None:
+    """
+    Get the page number of the first bounding region of an item.
+
+    :param item: The paragraph, table or caption.
+    :type item: Mapping[str, Any]
+    :return: The page number or None if the item has no bounding regions.
+    :rtype: int | None
+    """
+    bounding_regions = item.get("boundingRegions")
+    return bounding_regions[0]["pageNumber"] if bounding_regions else None
+
+
+def _project_spans(item: Mapping[str, Any]) -> list[dict]:
+    """
+    Project the spans of an item.
+
+    :param item: The page or paragraph.
+    :type item: Mapping[str, Any]
+    :return: The spans as list of dictionaries.
+    :rtype: list[dict]
+    """
+    return [
+        {"offset": span["offset"], "length": span["length"]}
+        for span in item.get("spans") or []
+    ]
+
+
+def project_analyze_result(
+    result: Mapping[str, Any], keep_paragraphs: bool = False
+) -> dict:
+    """
+    Project a Document Intelligence layout result onto the fields used by the
+    copilot in a single pass. The result is read through its mapping interface,
+    so no deep copy of the SDK model is created and words, lines, polygons and
+    elements are never materialized. Spans are only kept for pages and for
+    paragraphs with a structural role, which are required by the section index
+    and the compactor. Other paragraphs are only projected if requested.
+
+    :param result: The AnalyzeResult of the SDK or the raw JSON result as dictionary.
+    :type result: Mapping[str, Any]
+    :param keep_paragraphs: Whether to project all paragraphs instead of only the structural ones.
+    :type keep_paragraphs: bool
+    :return: The projected result as dictionary.
+    :rtype: dict
+    """
+    pages = [
+        {"pageNumber": page["pageNumber"], "spans": _project_spans(page)}
+        for page in result.get("pages") or []
+    ]
+
+    paragraphs = []
+    for paragraph in result.get("paragraphs") or []:
+        role = paragraph.get("role")
+        if not keep_paragraphs and role not in STRUCTURAL_ROLES:
+            continue
+
+        projected_paragraph = {
+            "content": paragraph["content"],
+            "pageNumber": _get_page_number(paragraph),
+        }
+        if role:
+            projected_paragraph["role"] = role
+            if role in STRUCTURAL_ROLES:
+                projected_paragraph["spans"] = _project_spans(paragraph)
+        paragraphs.append(projected_paragraph)
+
+    tables = []
+    for table in result.get("tables") or []:
+        projected_table = {
+            "rowCount": table["rowCount"],
+            "columnCount": table["columnCount"],
+            "pageNumber": _get_page_number(table),
+            "cells": [
+                {
+                    **{
+                        field: cell[field]
+                        for field in TABLE_CELL_FIELDS
+                        if cell.get(field) is not None
+                    },
+                    "content": cell["content"],
+                }
+                for cell in table.get("cells") or []
+            ],
+        }
+        caption = table.get("caption")
+        if caption:
+            projected_table["caption"] = {"content": caption["content"]}
+        tables.append(projected_table)
+
+    return {
+        "content": result.get("content", ""),
+        "pages": pages,
+        "paragraphs": paragraphs,
+        "tables": tables,
+    }
@@ -0,0 +1,511 @@
+import asyncio
+import base64
+import json
+import math
+import re
+import zlib
+from abc import ABC, abstractmethod
+from collections import Counter
+
+import numpy as np
+from app.core.clients import get_openai_client
+from app.core.settings import settings
+from app.files.pages import split_pages
+from app.files.progress import ProgressReporter
+from app.logs import setup_logging
+from app.models.core import ProgressStage
+from app.models.documents import DocumentChunk, DocumentPassage
+
+logger = setup_logging(__name__)
+
+HEADING_PATTERN = re.compile(r"^#{1,6}\s+(.+)$")
+BLOCK_SEPARATOR_PATTERN = re.compile(r"\n\s*\n")
+TOKEN_PATTERN = re.compile(r"\w+")
+INDEX_SHARD_SIZE = 64
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    Split a text into lowercase word tokens.
+
+    :param text: The text to tokenize.
+    :type text: str
+    :return: The list of tokens.
+    :rtype: list[str]
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def chunk_document(content: str, max_characters: int) -> list[DocumentChunk]:
+    """
+    Split the markdown content of a document into chunks. Chunks never cross page
+    boundaries and a new chunk is started at every section heading.
+
+    :param content: The markdown content generated by Document Intelligence.
+    :type content: str
+    :param max_characters: The maximum number of characters per chunk.
+    :type max_characters: int
+    :return: The list of document chunks.
+    :rtype: list[DocumentChunk]
+    """
+    chunks: list[DocumentChunk] = []
+    heading = None
+
+    def flush(page_number: int, blocks: list[str]) -> None:
+        if blocks:
+            chunks.append(
+                DocumentChunk(
+                    chunk_id=len(chunks),
+                    page_number=page_number,
+                    heading=heading,
+                    content="\n\n".join(blocks),
+                )
+            )
+
+    for page_number, page_content in split_pages(content):
+        blocks: list[str] = []
+        blocks_length = 0
+
+        for block in BLOCK_SEPARATOR_PATTERN.split(page_content):
+            block = block.strip()
+            if not block:
+                continue
+
+            # Start a new chunk at each section heading
+            heading_match = HEADING_PATTERN.match(block)
+            if heading_match:
+                flush(page_number, blocks)
+                blocks, blocks_length = [], 0
+                heading = heading_match.group(1).strip()
+
+            # Start a new chunk if the block does not fit anymore
+            if blocks and blocks_length + len(block) > max_characters:
+                flush(page_number, blocks)
+                blocks, blocks_length = [], 0
+
+            # Split blocks which exceed the chunk size on their own
+            while len(block) > max_characters:
+                flush(page_number, [block[:max_characters]])
+                block = block[max_characters:]
+
+            blocks.append(block)
+            blocks_length += len(block) + 2
+
+        flush(page_number, blocks)
+
+    return chunks
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    """
+    Normalize the rows of a matrix to unit length.
+
+    :param matrix: The matrix to normalize.
+    :type matrix: np.ndarray
+    :return: The normalized matrix.
+    :rtype: np.ndarray
+    """
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+def _min_max(scores: np.ndarray) -> np.ndarray:
+    """
+    Scale scores to the range [0, 1].
+
+    :param scores: The scores to scale.
+    :type scores: np.ndarray
+    :return: The scaled scores.
+    :rtype: np.ndarray
+    """
+    minimum = scores.min()
+    spread = scores.max() - minimum
+    if spread <= 0:
+        return np.zeros_like(scores)
+    return (scores - minimum) / spread
+
+
+class EmbeddingProvider(ABC):
+    """
+    Abstract base class for embedding providers used by the document index.
+    """
+
+    name: str = "abstract"
+
+    @abstractmethod
+    async def embed(self, texts: list[str]) -> np.ndarray:
+        """
+        Embed a list of texts into a matrix of unit length vectors.
+
+        :param texts: The texts to embed.
+        :type texts: list[str]
+        :return: A matrix with one row per text.
+        :rtype: np.ndarray
+        """
+        pass
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    Local embedding provider based on signed feature hashing of word tokens. It
+    requires no network calls and is used for development and tests.
+    """
+
+    def __init__(self, dimensions: int = 256):
+        self.dimensions = dimensions
+        self.name = f"hashing-{dimensions}"
+
+    async def embed(self, texts: list[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            tokens = tokenize(text)
+            if not tokens:
+                continue
+            hashes = np.fromiter(
+                (zlib.crc32(token.encode("utf-8")) for token in tokens),
+                dtype=np.uint32,
+                count=len(tokens),
+            )
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(matrix[row], hashes % self.dimensions, signs)
+        return _normalize(matrix)
+
+
+class AzureOpenAIEmbeddingProvider(EmbeddingProvider):
+    """
+    Embedding provider backed by an Azure OpenAI embedding deployment.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        endpoint: str,
+        model_name: str,
+        managed_identity_client_id: str = None,
+        batch_size: int = 64,
+    ):
+        """
+        Initialize the AzureOpenAIEmbeddingProvider.
+
+        :param api_key: The API key for authentication.
+        :type api_key: str
+        :param endpoint: The API endpoint URL.
+        :type endpoint: str
+        :param model_name: The name of the embedding deployment.
+        :type model_name: str
+        :param managed_identity_client_id: The client id of the managed identity.
+        :type managed_identity_client_id: str
+        :param batch_size: The number of texts sent per embedding request.
+        :type batch_size: int
+        """
+        self.client = get_openai_client(
+            api_key=api_key,
+            endpoint=endpoint,
+            managed_identity_client_id=managed_identity_client_id,
+        )
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.name = f"azure-openai-{model_name}"
+
+    async def embed(self, texts: list[str]) -> np.ndarray:
+        responses = await asyncio.gather(
+            *(
+                self.client.embeddings.create(
+                    model=self.model_name,
+                    input=texts[start : start + self.batch_size],
+                )
+                for start in range(0, len(texts), self.batch_size)
+            )
+        )
+        vectors = [item.embedding for response in responses for item in response.data]
+        return _normalize(np.asarray(vectors, dtype=np.float32))
+
+
+def get_embedding_provider() -> EmbeddingProvider:
+    """
+    Get the embedding provider configured in the settings.
+
+    :return: The configured embedding provider.
+    :rtype: EmbeddingProvider
+    """
+    if settings.AZURE_OPENAI_EMBEDDING_MODEL_NAME:
+        return AzureOpenAIEmbeddingProvider(
+            api_key=settings.AZURE_OPENAI_API_KEY,
+            endpoint=settings.AZURE_OPENAI_ENDPOINT,
+            model_name=settings.AZURE_OPENAI_EMBEDDING_MODEL_NAME,
+            managed_identity_client_id=settings.MANAGED_IDENTITY_CLIENT_ID,
+        )
+    return HashingEmbeddingProvider(dimensions=settings.RETRIEVAL_EMBEDDING_DIMENSIONS)
+
+
+class DocumentIndex:
+    """
+    Hybrid search index over the chunks of a single document combining BM25
+    keyword scores with embedding similarity.
+    """
+
+    VERSION = 1
+
+    def __init__(
+        self,
+        chunks: list[DocumentChunk],
+        embeddings: np.ndarray,
+        provider_name: str,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        self.chunks = chunks
+        self.embeddings = embeddings.astype(np.float32)
+        self.provider_name = provider_name
+        self.k1 = k1
+        self.b = b
+        self._postings: dict[str, tuple[np.ndarray, np.ndarray]] | None = None
+        self._chunk_lengths: np.ndarray | None = None
+
+    @classmethod
+    async def build(
+        cls,
+        content: str,
+        embedding_provider: EmbeddingProvider,
+        max_characters: int,
+        progress: ProgressReporter = None,
+        shard_size: int = INDEX_SHARD_SIZE,
+    ) -> "DocumentIndex":
+        """
+        Chunk the document content and build the index. Chunks are embedded in
+        shards, so that the completion of each shard can be reported.
+
+        :param content: The markdown content generated by Document Intelligence.
+        :type content: str
+        :param embedding_provider: The provider used to embed the chunks.
+        :type embedding_provider: EmbeddingProvider
+        :param max_characters: The maximum number of characters per chunk.
+        :type max_characters: int
+        :param progress: The reporter receiving the completion of shards.
+        :type progress: ProgressReporter
+        :param shard_size: The number of chunks embedded per shard.
+        :type shard_size: int
+        :return: The document index.
+        :rtype: DocumentIndex
+        """
+        chunks = chunk_document(content=content, max_characters=max_characters)
+        logger.info(f"Building document index over {len(chunks)} chunks.")
+        if chunks:
+            progress = progress or ProgressReporter()
+            shards = [
+                [chunk.content for chunk in chunks[start : start + shard_size]]
+                for start in range(0, len(chunks), shard_size)
+            ]
+            completed = 0
+
+            async def embed_shard(texts: list[str]) -> np.ndarray:
+                nonlocal completed
+                shard_embeddings = await embedding_provider.embed(texts)
+                completed += 1
+                await progress.report(
+                    ProgressStage.INDEXING,
+                    f"Indexing document ({completed}/{len(shards)} shards) ... ",
+                    fraction=completed / len(shards),
+                    completed_shards=completed,
+                )
+                return shard_embeddings
+
+            embeddings = np.vstack(
+                await asyncio.gather(*(embed_shard(texts) for texts in shards))
+            )
+        else:
+            embeddings = np.zeros((0, 0), dtype=np.float32)
+        return cls(
+            chunks=chunks,
+            embeddings=embeddings,
+            provider_name=embedding_provider.name,
+        )
+
+    def _build_postings(self) -> None:
+        """
+        Build the inverted index used for BM25 scoring.
+        """
+        postings: dict[str, tuple[list[int], list[int]]] = {}
+        chunk_lengths = []
+        for chunk in self.chunks:
+            tokens = tokenize(chunk.content)
+            chunk_lengths.append(len(tokens))
+            for term, count in Counter(tokens).items():
+                chunk_ids, counts = postings.setdefault(term, ([], []))
+                chunk_ids.append(chunk.chunk_id)
+                counts.append(count)
+
+        self._postings = {
+            term: (np.asarray(chunk_ids), np.asarray(counts, dtype=np.float32))
+            for term, (chunk_ids, counts) in postings.items()
+        }
+        self._chunk_lengths = np.asarray(chunk_lengths, dtype=np.float32)
+
+    def _bm25_scores(self, query_tokens: list[str]) -> np.ndarray:
+        """
+        Compute the BM25 score of every chunk for the query tokens.
+
+        :param query_tokens: The tokens of the query.
+        :type query_tokens: list[str]
+        :return: The BM25 score per chunk.
+        :rtype: np.ndarray
+        """
+        if self._postings is None:
+            self._build_postings()
+
+        chunk_count = len(self.chunks)
+        average_length = max(float(self._chunk_lengths.mean()), 1.0)
+        scores = np.zeros(chunk_count, dtype=np.float32)
+        for term in set(query_tokens):
+            if term not in self._postings:
+                continue
+            chunk_ids, counts = self._postings[term]
+            idf = math.log(
+                1 + (chunk_count - len(chunk_ids) + 0.5) / (len(chunk_ids) + 0.5)
+            )
+            length_norm = self.k1 * (
+                1 - self.b + self.b * self._chunk_lengths[chunk_ids] / average_length
+            )
+            scores[chunk_ids] += idf * counts * (self.k1 + 1) / (counts + length_norm)
+        return scores
+
+    async def search(
+        self,
+        query: str,
+        embedding_provider: EmbeddingProvider,
+        top_k: int,
+        alpha: float,
+        page_range: tuple[int, int] | None = None,
+    ) -> list[DocumentPassage]:
+        """
+        Search the index for the passages most relevant to the query.
+
+        :param query: The user query.
+        :type query: str
+        :param embedding_provider: The provider used to embed the query.
+        :type embedding_provider: EmbeddingProvider
+        :param top_k: The number of passages to return.
+        :type top_k: int
+        :param alpha: The weight of the embedding similarity in the hybrid score.
+        :type alpha: float
+        :param page_range: The first and last page of the passages, if restricted.
+        :type page_range: tuple[int, int] | None
+        :return: The passages ordered by descending relevance.
+        :rtype: list[DocumentPassage]
+        """
+        # Select candidate chunks
+        candidate_ids = np.arange(len(self.chunks))
+        if page_range is not None:
+            candidate_ids = np.asarray(
+                [
+                    chunk.chunk_id
+                    for chunk in self.chunks
+                    if page_range[0] <= chunk.page_number <= page_range[1]
+                ],
+                dtype=np.int64,
+            )
+        if candidate_ids.size == 0:
+            return []
+
+        scores = (1 - alpha) * _min_max(self._bm25_scores(tokenize(query)))
+
+        # Only use embeddings if the query is embedded into the same vector space
+        if embedding_provider.name == self.provider_name:
+            query_embedding = (await embedding_provider.embed([query]))[0]
+            scores += alpha * _min_max(self.embeddings @ query_embedding)
+        else:
+            logger.warning(
+                f"Embedding provider '{embedding_provider.name}' does not match index provider '{self.provider_name}'. Using keyword search only."
+            )
+
+        candidate_scores = scores[candidate_ids]
+        top_k = min(top_k, len(candidate_ids))
+        top_ids = np.argpartition(-candidate_scores, top_k - 1)[:top_k]
+        top_ids = candidate_ids[top_ids[np.argsort(-candidate_scores[top_ids])]]
+        return [
+            DocumentPassage(chunk=self.chunks[chunk_id], score=float(scores[chunk_id]))
+            for chunk_id in top_ids
+        ]
+
+    def to_string(self) -> str:
+        """
+        Serialize the index into a compact JSON string. Embeddings are stored as
+        base64 encoded float16 values and BM25 statistics are rebuilt on load.
+
+        :return: The serialized index.
+        :rtype: str
+        """
+        payload = {
+            "version": self.VERSION,
+            "provider": self.provider_name,
+            "shape": list(self.embeddings.shape),
+            "chunks": [
+                [chunk.page_number, chunk.heading, chunk.content]
+                for chunk in self.chunks
+            ],
+            "embeddings": base64.b64encode(
+                self.embeddings.astype(np.float16).tobytes()
+            ).decode("utf-8"),
+        }
+        return json.dumps(payload, separators=(",", ":"))
+
+    @classmethod
+    def from_string(cls, data: str) -> "DocumentIndex":
+        """
+        Deserialize an index created by `to_string`.
+
+        :param data: The serialized index.
+        :type data: str
+        :return: The document index.
+        :rtype: DocumentIndex
+        """
+        payload = json.loads(data)
+        chunks = [
+            DocumentChunk(
+                chunk_id=chunk_id,
+                page_number=page_number,
+                heading=heading,
+                content=content,
+            )
+            for chunk_id, (page_number, heading, content) in enumerate(
+                payload["chunks"]
+            )
+        ]
+        embeddings = np.frombuffer(
+            base64.b64decode(payload["embeddings"]), dtype=np.float16
+        ).reshape(payload["shape"])
+        return cls(
+            chunks=chunks,
+            embeddings=embeddings,
+            provider_name=payload["provider"],
+        )
+
+
+def format_passages(passages: list[DocumentPassage]) -> str:
+    """
+    Format passages as minified JSON for the agent instructions. Passages are
+    ordered by page so that the model reads them in document order.
+
+    :param passages: The passages to format.
+    :type passages: list[DocumentPassage]
+    :return: The passages as a JSON string.
+    :rtype: str
+    """
+    ordered_passages = sorted(
+        passages,
+        key=lambda passage: (passage.chunk.page_number, passage.chunk.chunk_id),
+    )
+    return json.dumps(
+        {
+            "passages": [
+                {
+                    "page": passage.chunk.page_number,
+                    "section": passage.chunk.heading,
+                    "content": passage.chunk.content,
+                }
+                for passage in ordered_passages
+            ]
+        },
+        separators=(",", ":"),
+    )
@@ -0,0 +1,221 @@
+import asyncio
+import math
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator
+
+from app.core.settings import settings
+from app.files.progress import ProgressReporter
+from app.logs import setup_logging
+from app.models.core import ProgressStage
+from opentelemetry import metrics
+
+logger = setup_logging(__name__)
+meter = metrics.get_meter(__name__)
+
+queue_depth_counter = meter.create_up_down_counter(
+    name="copilot.extraction.queue.depth",
+    unit="{extraction}",
+    description="Number of extractions waiting for admission.",
+)
+active_extractions_counter = meter.create_up_down_counter(
+    name="copilot.extraction.active",
+    unit="{extraction}",
+    description="Number of admitted extractions.",
+)
+reserved_memory_counter = meter.create_up_down_counter(
+    name="copilot.extraction.memory.reserved",
+    unit="By",
+    description="Estimated memory reserved by admitted extractions.",
+)
+wait_time_histogram = meter.create_histogram(
+    name="copilot.extraction.queue.wait_time",
+    unit="s",
+    description="Time extractions waited for admission.",
+)
+
+
+def estimate_memory(file_size: int | None, page_count: int | None = None) -> int:
+    """
+    Estimate the peak memory of an extraction. The raw file is held as bytes and
+    as base64 encoded request body, while the analysis result, the compacted
+    content and the cleaned JSON grow with the number of pages.
+
+    :param file_size: The size of the file in bytes or None if unknown.
+    :type file_size: int | None
+    :param page_count: The number of pages or None to estimate it from the file size.
+    :type page_count: int | None
+    :return: The estimated memory in bytes.
+    :rtype: int
+    """
+    if file_size is None:
+        file_size = settings.EXTRACTION_DEFAULT_FILE_SIZE_MB * 2**20
+    if page_count is None:
+        page_count = max(
+            math.ceil(file_size / (settings.EXTRACTION_AVERAGE_PAGE_SIZE_KB * 2**10)),
+            1,
+        )
+    return int(
+        file_size * settings.EXTRACTION_MEMORY_PER_FILE_BYTE
+        + page_count * settings.EXTRACTION_MEMORY_PER_PAGE_MB * 2**20
+    )
+
+
+class ExtractionTicket:
+    """
+    Admission of a single extraction holding a share of the memory budget.
+    """
+
+    def __init__(self, scheduler: "ExtractionScheduler", reserved_bytes: int):
+        self.scheduler = scheduler
+        self.reserved_bytes = reserved_bytes
+
+    async def resize(self, estimated_bytes: int) -> None:
+        """
+        Update the reserved memory once a better estimate is available, e.g.
+        after the page count is known. The reservation may exceed the budget, in
+        which case no further extractions are admitted until memory is released.
+
+        :param estimated_bytes: The new memory estimate in bytes.
+        :type estimated_bytes: int
+        """
+        await self.scheduler._resize(self, estimated_bytes)
+
+
+class ExtractionScheduler:
+    """
+    Per-instance admission control for extractions. Extractions are admitted in
+    order of arrival as long as the number of active extractions stays below the
+    concurrency limit and their estimated memory fits into the memory budget. A
+    single extraction is always admitted if no other extraction is active, so
+    documents larger than the budget are processed on their own. Waiting
+    extractions report their position in the queue.
+    """
+
+    def __init__(self, max_concurrency: int, memory_budget_bytes: int):
+        """
+        Initialize the ExtractionScheduler.
+
+        :param max_concurrency: The maximum number of concurrent extractions.
+        :type max_concurrency: int
+        :param memory_budget_bytes: The estimated memory available for extractions.
+        :type memory_budget_bytes: int
+        """
+        self.max_concurrency = max_concurrency
+        self.memory_budget_bytes = memory_budget_bytes
+        self.active = 0
+        self.reserved_bytes = 0
+        self._waiters: deque[object] = deque()
+        self._condition = asyncio.Condition()
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._waiters)
+
+    def _can_admit(self, estimated_bytes: int) -> bool:
+        if self.active == 0:
+            return True
+        return (
+            self.active < self.max_concurrency
+            and self.reserved_bytes + estimated_bytes <= self.memory_budget_bytes
+        )
+
+    @asynccontextmanager
+    async def admit(
+        self, estimated_bytes: int, progress: ProgressReporter = None
+    ) -> AsyncGenerator[ExtractionTicket, None]:
+        """
+        Wait for admission of an extraction and release it afterwards.
+
+        :param estimated_bytes: The estimated memory of the extraction in bytes.
+        :type estimated_bytes: int
+        :param progress: The reporter receiving the position in the queue.
+        :type progress: ProgressReporter
+        :return: The ticket of the admitted extraction.
+        :rtype: AsyncGenerator[ExtractionTicket, None]
+        """
+        ticket = await self._acquire(
+            estimated_bytes=estimated_bytes, progress=progress or ProgressReporter()
+        )
+        try:
+            yield ticket
+        finally:
+            await self._release(ticket)
+
+    async def _acquire(
+        self, estimated_bytes: int, progress: ProgressReporter
+    ) -> ExtractionTicket:
+        waiter = object()
+        loop = asyncio.get_running_loop()
+        start_time = loop.time()
+        reported_position = None
+
+        async with self._condition:
+            self._waiters.append(waiter)
+        queue_depth_counter.add(1)
+        try:
+            while True:
+                async with self._condition:
+                    if self._waiters[0] is waiter and self._can_admit(estimated_bytes):
+                        self._waiters.popleft()
+                        self.active += 1
+                        self.reserved_bytes += estimated_bytes
+                        self._condition.notify_all()
+                        break
+
+                    position = self._waiters.index(waiter) + 1
+                    if position == reported_position:
+                        await self._condition.wait()
+                        continue
+
+                # Report position outside of the lock since sinks may do I/O
+                reported_position = position
+                logger.info(
+                    f"Extraction with an estimated memory of {estimated_bytes / 2**20:.0f} MB is waiting at position {position} ({self.active} active, {self.reserved_bytes / 2**20:.0f} MB reserved)."
+                )
+                await progress.report(
+                    ProgressStage.QUEUED,
+                    f"Waiting for processing capacity (position {position} in queue) ... ",
+                    force=True,
+                    queue_position=position,
+                )
+        except BaseException:
+            async with self._condition:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                self._condition.notify_all()
+            raise
+        finally:
+            queue_depth_counter.add(-1)
+
+        wait_time = loop.time() - start_time
+        wait_time_histogram.record(wait_time)
+        active_extractions_counter.add(1)
+        reserved_memory_counter.add(estimated_bytes)
+        logger.info(
+            f"Admitted extraction with an estimated memory of {estimated_bytes / 2**20:.0f} MB after waiting {wait_time:.1f}s."
+        )
+        return ExtractionTicket(scheduler=self, reserved_bytes=estimated_bytes)
+
+    async def _resize(self, ticket: ExtractionTicket, estimated_bytes: int) -> None:
+        async with self._condition:
+            delta = estimated_bytes - ticket.reserved_bytes
+            self.reserved_bytes += delta
+            ticket.reserved_bytes = estimated_bytes
+            self._condition.notify_all()
+        reserved_memory_counter.add(delta)
+
+    async def _release(self, ticket: ExtractionTicket) -> None:
+        async with self._condition:
+            self.active -= 1
+            self.reserved_bytes -= ticket.reserved_bytes
+            self._condition.notify_all()
+        active_extractions_counter.add(-1)
+        reserved_memory_counter.add(-ticket.reserved_bytes)
+
+
+# Initialize extraction scheduler
+extraction_scheduler = ExtractionScheduler(
+    max_concurrency=settings.EXTRACTION_MAX_CONCURRENCY,
+    memory_budget_bytes=settings.EXTRACTION_MEMORY_BUDGET_MB * 2**20,
+)
@@ -0,0 +1,407 @@
+import bisect
+import json
+import re
+
+from app.files.compaction import OffsetMap
+from app.logs import setup_logging
+from app.models.documents import DocumentPage, DocumentSection, DocumentSlice
+
+logger = setup_logging(__name__)
+
+HEADING_ROLES = ("title", "sectionHeading")
+NUMBERED_HEADING_PATTERN = re.compile(
+    r"^(?:(?:section|clause|article|chapter|part|§)\s*)?(\d+(?:\.\d+)*)\.?\)?\s+(.+)$",
+    re.IGNORECASE,
+)
+ROMAN_HEADING_PATTERN = re.compile(
+    r"^(?:section|clause|article|chapter|part)\s+([IVXLC]+)\b[.:)]?\s*(.*)$",
+    re.IGNORECASE,
+)
+QUERY_SECTION_PATTERN = re.compile(
+    r"(?:\b(?:section|clause|article|chapter|part|paragraph)|§)\s*((?:\d+\.)*\d+|[ivxlc]+)\b",
+    re.IGNORECASE,
+)
+QUERY_PAGE_PATTERN = re.compile(
+    r"\b(?:pages?|pp?\.)\s*(\d+)(?:\s*(?:-|–|—|to|through|until|and)\s*(\d+))?",
+    re.IGNORECASE,
+)
+MIN_TITLE_MATCH_LENGTH = 8
+
+
+def parse_heading(text: str) -> tuple[str | None, str, int]:
+    """
+    Parse the numbering of a heading.
+
+    :param text: The heading text.
+    :type text: str
+    :return: A tuple containing the heading number, the heading title and the nesting level derived from the number.
+    :rtype: tuple[str | None, str, int]
+    """
+    text = " ".join(text.split())
+    numbered_match = NUMBERED_HEADING_PATTERN.match(text)
+    if numbered_match:
+        number = numbered_match.group(1)
+        return number, numbered_match.group(2), number.count(".") + 1
+
+    roman_match = ROMAN_HEADING_PATTERN.match(text)
+    if roman_match:
+        return roman_match.group(1).upper(), roman_match.group(2) or text, 1
+
+    return None, text, 1
+
+
+class SectionIndex:
+    """
+    Structural index of a document built from the Document Intelligence paragraph
+    roles. It maps section headings and pages to character ranges of the markdown
+    content, so that questions targeting a section or page range can be answered
+    from a slice of the document.
+    """
+
+    VERSION = 1
+
+    def __init__(
+        self,
+        sections: list[DocumentSection],
+        pages: list[DocumentPage],
+        content_length: int,
+        content_offset: int = 0,
+    ):
+        """
+        Initialize the SectionIndex.
+
+        :param sections: The sections of the document in document order.
+        :type sections: list[DocumentSection]
+        :param pages: The pages of the document in document order.
+        :type pages: list[DocumentPage]
+        :param content_length: The length of the markdown content.
+        :type content_length: int
+        :param content_offset: The offset of the document JSON within the stored agent instructions.
+        :type content_offset: int
+        """
+        self.sections = sections
+        self.pages = pages
+        self.content_length = content_length
+        self.content_offset = content_offset
+        self._page_offsets = [page.offset_start for page in pages]
+
+    @classmethod
+    def build(cls, data: dict, content_offset: int = 0) -> "SectionIndex":
+        """
+        Build the section index from a Document Intelligence layout result.
+
+        :param data: The extracted data as a dictionary.
+        :type data: dict
+        :param content_offset: The offset of the document JSON within the stored agent instructions.
+        :type content_offset: int
+        :return: The section index.
+        :rtype: SectionIndex
+        """
+        content_length = len(data.get("content", ""))
+
+        # Collect page ranges
+        pages = []
+        for page in data.get("pages", []):
+            spans = page.get("spans") or []
+            if not spans:
+                continue
+            pages.append(
+                DocumentPage(
+                    page_number=page["pageNumber"],
+                    offset_start=spans[0]["offset"],
+                    offset_end=spans[-1]["offset"] + spans[-1]["length"],
+                )
+            )
+
+        index = cls(
+            sections=[],
+            pages=pages,
+            content_length=content_length,
+            content_offset=content_offset,
+        )
+
+        # Collect headings and build the section tree
+        stack: list[DocumentSection] = []
+        for paragraph in data.get("paragraphs", []):
+            role = paragraph.get("role")
+            spans = paragraph.get("spans") or []
+            if role not in HEADING_ROLES or not spans:
+                continue
+
+            number, title, level = parse_heading(paragraph.get("content", ""))
+            if role == "title":
+                level = 0
+
+            while stack and stack[-1].level >= level:
+                stack.pop()
+
+            offset_start = spans[0]["offset"]
+            page_number = index.get_page_number(offset_start)
+            section = DocumentSection(
+                section_id=len(index.sections),
+                parent_id=stack[-1].section_id if stack else None,
+                number=number,
+                title=title,
+                level=level,
+                page_start=page_number,
+                page_end=page_number,
+                offset_start=offset_start,
+                offset_end=content_length,
+            )
+            index.sections.append(section)
+            stack.append(section)
+
+        # Sections end where the next section of the same or a higher level starts
+        for position, section in enumerate(index.sections):
+            for following in index.sections[position + 1 :]:
+                if following.level <= section.level:
+                    section.offset_end = following.offset_start
+                    break
+            section.page_end = index.get_page_number(
+                max(section.offset_end - 1, section.offset_start)
+            )
+
+        logger.info(
+            f"Built section index with {len(index.sections)} sections over {len(pages)} pages."
+        )
+        return index
+
+    def remap(self, offset_map: OffsetMap, content_length: int) -> None:
+        """
+        Remap all offsets after the content has been compacted.
+
+        :param offset_map: The map from original to compacted offsets.
+        :type offset_map: OffsetMap
+        :param content_length: The length of the compacted content.
+        :type content_length: int
+        """
+        for item in [*self.pages, *self.sections]:
+            item.offset_start = offset_map.map(item.offset_start)
+            item.offset_end = min(offset_map.map(item.offset_end), content_length)
+        self.content_length = content_length
+        self._page_offsets = [page.offset_start for page in self.pages]
+
+    def get_page_number(self, offset: int) -> int:
+        """
+        Get the page number containing a character offset.
+
+        :param offset: The character offset within the content.
+        :type offset: int
+        :return: The page number or 1 if the document has no page information.
+        :rtype: int
+        """
+        if not self.pages:
+            return 1
+        position = max(bisect.bisect_right(self._page_offsets, offset) - 1, 0)
+        return self.pages[position].page_number
+
+    def _resolve_pages(self, query: str) -> DocumentSlice | None:
+        """
+        Resolve a page range referenced in the query.
+
+        :param query: The user query.
+        :type query: str
+        :return: The document slice or None if the query does not reference pages of this document.
+        :rtype: DocumentSlice | None
+        """
+        page_match = QUERY_PAGE_PATTERN.search(query)
+        if not page_match or not self.pages:
+            return None
+
+        page_start = int(page_match.group(1))
+        page_end = int(page_match.group(2) or page_start)
+        page_start, page_end = min(page_start, page_end), max(page_start, page_end)
+        selected_pages = [
+            page for page in self.pages if page_start <= page.page_number <= page_end
+        ]
+        if not selected_pages:
+            return None
+
+        description = (
+            f"page {page_start}"
+            if page_start == page_end
+            else f"pages {page_start}-{page_end}"
+        )
+        return DocumentSlice(
+            description=description,
+            page_start=selected_pages[0].page_number,
+            page_end=selected_pages[-1].page_number,
+            offset_start=selected_pages[0].offset_start,
+            offset_end=selected_pages[-1].offset_end,
+        )
+
+    def _resolve_section(self, query: str) -> DocumentSlice | None:
+        """
+        Resolve a section referenced by number or title in the query.
+
+        :param query: The user query.
+        :type query: str
+        :return: The document slice or None if the query does not reference a section of this document.
+        :rtype: DocumentSlice | None
+        """
+        section = None
+
+        # Match sections by number, e.g. "section 4.2" or "article IV"
+        section_match = QUERY_SECTION_PATTERN.search(query)
+        if section_match:
+            number = section_match.group(1).upper()
+            section = next(
+                (
+                    section
+                    for section in self.sections
+                    if section.number and section.number.upper() == number
+                ),
+                None,
+            )
+
+        # Match sections by title, preferring the longest title
+        if section is None:
+            normalized_query = " ".join(query.lower().split())
+            candidates = [
+                section
+                for section in self.sections
+                if section.level > 0
+                and len(section.title) >= MIN_TITLE_MATCH_LENGTH
+                and section.title.lower() in normalized_query
+            ]
+            if candidates:
+                section = max(candidates, key=lambda section: len(section.title))
+
+        if section is None:
+            return None
+
+        description = (
+            f"section {section.number} '{section.title}'"
+            if section.number
+            else f"section '{section.title}'"
+        )
+        return DocumentSlice(
+            description=description,
+            page_start=section.page_start,
+            page_end=section.page_end,
+            offset_start=section.offset_start,
+            offset_end=section.offset_end,
+        )
+
+    def resolve(self, query: str) -> DocumentSlice | None:
+        """
+        Resolve the part of the document a query refers to.
+
+        :param query: The user query.
+        :type query: str
+        :return: The document slice or None if the query does not target a specific section or page range.
+        :rtype: DocumentSlice | None
+        """
+        return self._resolve_section(query) or self._resolve_pages(query)
+
+    def get_content(self, instructions: str) -> str:
+        """
+        Get the markdown content from the stored agent instructions.
+
+        :param instructions: The decompressed agent instructions.
+        :type instructions: str
+        :return: The markdown content of the document.
+        :rtype: str
+        """
+        return json.loads(instructions[self.content_offset :]).get("content", "")
+
+    def to_string(self) -> str:
+        """
+        Serialize the index into a compact JSON string.
+
+        :return: The serialized index.
+        :rtype: str
+        """
+        payload = {
+            "version": self.VERSION,
+            "content_length": self.content_length,
+            "content_offset": self.content_offset,
+            "pages": [
+                [page.page_number, page.offset_start, page.offset_end]
+                for page in self.pages
+            ],
+            "sections": [
+                [
+                    section.parent_id,
+                    section.number,
+                    section.title,
+                    section.level,
+                    section.page_start,
+                    section.page_end,
+                    section.offset_start,
+                    section.offset_end,
+                ]
+                for section in self.sections
+            ],
+        }
+        return json.dumps(payload, separators=(",", ":"))
+
+    @classmethod
+    def from_string(cls, data: str) -> "SectionIndex":
+        """
+        Deserialize an index created by `to_string`.
+
+        :param data: The serialized index.
+        :type data: str
+        :return: The section index.
+        :rtype: SectionIndex
+        """
+        payload = json.loads(data)
+        pages = [
+            DocumentPage(
+                page_number=page_number,
+                offset_start=offset_start,
+                offset_end=offset_end,
+            )
+            for page_number, offset_start, offset_end in payload["pages"]
+        ]
+        sections = [
+            DocumentSection(
+                section_id=section_id,
+                parent_id=parent_id,
+                number=number,
+                title=title,
+                level=level,
+                page_start=page_start,
+                page_end=page_end,
+                offset_start=offset_start,
+                offset_end=offset_end,
+            )
+            for section_id, (
+                parent_id,
+                number,
+                title,
+                level,
+                page_start,
+                page_end,
+                offset_start,
+                offset_end,
+            ) in enumerate(payload["sections"])
+        ]
+        return cls(
+            sections=sections,
+            pages=pages,
+            content_length=payload["content_length"],
+            content_offset=payload["content_offset"],
+        )
+
+
+def format_slice(document_slice: DocumentSlice, content: str) -> str:
+    """
+    Format a document slice as minified JSON for the agent instructions.
+
+    :param document_slice: The document slice.
+    :type document_slice: DocumentSlice
+    :param content: The markdown content of the document.
+    :type content: str
+    :return: The slice as a JSON string.
+    :rtype: str
+    """
+    return json.dumps(
+        {
+            "excerpt": document_slice.description,
+            "pages": [document_slice.page_start, document_slice.page_end],
+            "content": content[document_slice.offset_start : document_slice.offset_end],
+        },
+        separators=(",", ":"),
+    )
@@ -0,0 +1,179 @@
+import math
+import re
+
+from app.core.settings import settings
+from app.files.pages import format_page_marker, split_pages
+from app.models.core import ProcessingStrategy
+
+BLOCK_SEPARATOR_PATTERN = re.compile(r"\n\s*\n")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the number of tokens of a text without loading a tokenizer.
+
+    :param text: The text to estimate.
+    :type text: str
+    :return: The estimated number of tokens.
+    :rtype: int
+    """
+    return math.ceil(len(text) / settings.TOKEN_ESTIMATE_CHARACTERS_PER_TOKEN)
+
+
+def get_context_budget() -> int:
+    """
+    Get the number of tokens available for the document in the model context.
+
+    :return: The token budget for the agent instructions.
+    :rtype: int
+    """
+    return settings.AZURE_OPENAI_MODEL_CONTEXT_TOKENS - settings.CONTEXT_RESERVED_TOKENS
+
+
+def fits_context(instructions: str) -> bool:
+    """
+    Check whether agent instructions fit into the model context.
+
+    :param instructions: The agent instructions including the document.
+    :type instructions: str
+    :return: True if the instructions fit into the token budget and the maximum instructions length.
+    :rtype: bool
+    """
+    return (
+        len(instructions) <= settings.AZURE_OPENAI_MAX_INSTRUCTIONS_LENGTH
+        and estimate_tokens(instructions) <= get_context_budget()
+    )
+
+
+def select_processing_strategy(
+    instructions: str, compacted: bool = False
+) -> ProcessingStrategy:
+    """
+    Select the processing strategy for a document before the first question is asked.
+    Documents exceeding the context use the configured oversized document
+    strategy, which falls back to retrieval if map-reduce is disabled.
+
+    :param instructions: The agent instructions including the document.
+    :type instructions: str
+    :param compacted: Whether the document in the instructions has been compacted.
+    :type compacted: bool
+    :return: The processing strategy.
+    :rtype: ProcessingStrategy
+    """
+    if settings.RETRIEVAL_ENABLED:
+        return ProcessingStrategy.RETRIEVAL
+    if fits_context(instructions):
+        return (
+            ProcessingStrategy.COMPACTED
+            if compacted
+            else ProcessingStrategy.FULL_CONTEXT
+        )
+    if (
+        settings.OVERSIZED_DOCUMENT_STRATEGY == ProcessingStrategy.MAP_REDUCE
+        and not settings.MAP_REDUCE_ENABLED
+    ):
+        return ProcessingStrategy.RETRIEVAL
+    return settings.OVERSIZED_DOCUMENT_STRATEGY
+
+
+def _pack(parts: list[str], max_tokens: int, separator: str) -> list[str]:
+    """
+    Greedily pack consecutive parts into groups that stay below a token budget.
+
+    :param parts: The parts to pack.
+    :type parts: list[str]
+    :param max_tokens: The maximum number of tokens per group.
+    :type max_tokens: int
+    :param separator: The separator used to join the parts of a group.
+    :type separator: str
+    :return: The packed groups.
+    :rtype: list[str]
+    """
+    groups: list[str] = []
+    current: list[str] = []
+    current_tokens = 0
+    separator_tokens = estimate_tokens(separator)
+
+    for part in parts:
+        part_tokens = estimate_tokens(part)
+        if current and current_tokens + separator_tokens + part_tokens > max_tokens:
+            groups.append(separator.join(current))
+            current, current_tokens = [], 0
+        current.append(part)
+        current_tokens += part_tokens + (separator_tokens if len(current) > 1 else 0)
+
+    if current:
+        groups.append(separator.join(current))
+    return groups
+
+
+def split_by_tokens(content: str, max_tokens: int) -> list[str]:
+    """
+    Split the markdown content of a document into chunks below a token budget.
+    Whole pages are kept together where possible, pages that exceed the budget
+    are split at block boundaries and oversized blocks are split hard. Each page
+    starts with a page marker, so page numbers can be cited from every chunk.
+
+    :param content: The markdown content generated by Document Intelligence.
+    :type content: str
+    :param max_tokens: The maximum number of tokens per chunk.
+    :type max_tokens: int
+    :return: The list of chunks.
+    :rtype: list[str]
+    """
+    max_characters = max(
+        int(max_tokens * settings.TOKEN_ESTIMATE_CHARACTERS_PER_TOKEN), 1
+    )
+    parts: list[str] = []
+
+    for page_number, page_content in split_pages(content):
+        page_content = page_content.strip()
+        if not page_content:
+            continue
+        page_marker = format_page_marker(page_number)
+        if estimate_tokens(page_content) <= max_tokens:
+            parts.append(f"{page_marker}\n{page_content}")
+            continue
+
+        # Split oversized pages at block boundaries
+        blocks: list[str] = []
+        for block in BLOCK_SEPARATOR_PATTERN.split(page_content):
+            block = block.strip()
+            blocks.extend(
+                block[start : start + max_characters]
+                for start in range(0, len(block), max_characters)
+            )
+        parts.extend(
+            f"{page_marker}\n{group}"
+            for group in _pack(blocks, max_tokens=max_tokens, separator="\n\n")
+        )
+
+    return _pack(parts, max_tokens=max_tokens, separator="\n\n")
+
+
+def group_by_tokens(texts: list[str], max_tokens: int) -> list[list[str]]:
+    """
+    Group consecutive texts so that each group stays below a token budget.
+
+    :param texts: The texts to group.
+    :type texts: list[str]
+    :param max_tokens: The maximum number of tokens per group.
+    :type max_tokens: int
+    :return: The list of groups.
+    :rtype: list[list[str]]
+    """
+    groups: list[list[str]] = []
+    current: list[str] = []
+    current_tokens = 0
+
+    for text in texts:
+        text_tokens = estimate_tokens(text)
+        if current and current_tokens + text_tokens > max_tokens:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += text_tokens
+
+    if current:
+        groups.append(current)
+    return groups
@@ -0,0 +1,219 @@
+import asyncio
+import random
+from typing import Callable, Type, TypeVar
+
+from app.logs import setup_logging
+from app.models.core import JobStatus
+from app.models.jobs import ExtractionJob, ExtractionJobIndex, get_timestamp
+from app.models.storage import ItemMetadata
+from app.storage.cosmos import CosmosDBMetadataStorage, StorageConflictError
+from app.storage.instrumentation import InstrumentedStorage
+from microsoft_agents.hosting.core import Storage, StoreItem
+
+logger = setup_logging(__name__)
+
+StoreItemT = TypeVar("StoreItemT", bound=StoreItem)
+
+
+class ExtractionJobStore:
+    """
+    Job table for background extraction jobs persisted in the configured storage.
+    Each job is stored as a separate item. Since the storage does not support
+    queries, an index item keeps track of the pending jobs, which are recovered
+    after a restart.
+
+    Replicas share the index, which is therefore written conditionally on its
+    ETag and read again on conflict. Jobs keep the ETag of their last read or
+    write, so that a job is only claimed and updated by the replica holding its
+    latest version. Storages without ETags are only used by a single process,
+    whose writes are serialized by a lock.
+    """
+
+    KEY_PREFIX = "jobs/extraction"
+    INDEX_KEY = f"{KEY_PREFIX}/index"
+    MAX_INDEX_ATTEMPTS = 10
+
+    def __init__(self, storage: Storage):
+        """
+        Initialize the ExtractionJobStore.
+
+        :param storage: The storage used to persist jobs.
+        :type storage: Storage
+        """
+        self.storage = storage
+        self._lock = asyncio.Lock()
+
+    @property
+    def supports_metadata(self) -> bool:
+        if isinstance(self.storage, InstrumentedStorage):
+            return self.storage.supports_metadata
+        return isinstance(self.storage, CosmosDBMetadataStorage)
+
+    def _get_key(self, job_id: str) -> str:
+        return f"{self.KEY_PREFIX}/{job_id}"
+
+    async def _read(
+        self, keys: list[str], target_cls: Type[StoreItemT]
+    ) -> tuple[dict[str, StoreItemT], dict[str, ItemMetadata]]:
+        metadata: dict[str, ItemMetadata] = {}
+        if self.supports_metadata:
+            items = await self.storage.read(
+                keys, target_cls=target_cls, metadata=metadata
+            )
+        else:
+            items = await self.storage.read(keys, target_cls=target_cls)
+        return items, metadata
+
+    async def _write(
+        self, key: str, item: StoreItem, etag: str = None, create_only: bool = False
+    ) -> str | None:
+        if not self.supports_metadata:
+            await self.storage.write({key: item})
+            return None
+
+        metadata: dict[str, ItemMetadata] = {}
+        await self.storage.write(
+            {key: item},
+            metadata=metadata,
+            etags={key: etag} if etag else {},
+            create_only=create_only,
+        )
+        return metadata[key].etag if key in metadata else None
+
+    async def _update_index(
+        self, update_index: Callable[[ExtractionJobIndex], bool]
+    ) -> None:
+        """
+        Read, update and write the index until no other replica changed it in
+        between.
+
+        :param update_index: The function updating the index, which returns False if nothing changed.
+        :type update_index: Callable[[ExtractionJobIndex], bool]
+        """
+        for attempt in range(1, self.MAX_INDEX_ATTEMPTS + 1):
+            items, metadata = await self._read(
+                [self.INDEX_KEY], target_cls=ExtractionJobIndex
+            )
+            index = items.get(self.INDEX_KEY, ExtractionJobIndex())
+            if not update_index(index):
+                return
+
+            try:
+                await self._write(
+                    self.INDEX_KEY,
+                    index,
+                    etag=metadata.get(self.INDEX_KEY, ItemMetadata()).etag,
+                    create_only=self.INDEX_KEY not in items,
+                )
+                return
+            except StorageConflictError:
+                logger.info(
+                    f"Index of extraction jobs was changed by another replica in attempt {attempt}."
+                )
+                await asyncio.sleep(random.uniform(0, 0.05 * attempt))
+        raise StorageConflictError(self.INDEX_KEY)
+
+    async def create(self, job: ExtractionJob) -> None:
+        """
+        Persist a new job and add it to the index of pending jobs.
+
+        :param job: The job to create.
+        :type job: ExtractionJob
+        """
+
+        def add_job(index: ExtractionJobIndex) -> bool:
+            if job.job_id in index.job_ids:
+                return False
+            index.job_ids.append(job.job_id)
+            return True
+
+        async with self._lock:
+            job.etag = await self._write(
+                self._get_key(job.job_id), job, create_only=True
+            )
+            await self._update_index(add_job)
+
+    async def update(self, job: ExtractionJob) -> None:
+        """
+        Persist the current state of a job. Finished jobs are removed from the index.
+
+        :param job: The job to update.
+        :type job: ExtractionJob
+        :raises StorageConflictError: If another replica changed the job since it was read or written.
+        """
+
+        def remove_job(index: ExtractionJobIndex) -> bool:
+            if job.job_id not in index.job_ids:
+                return False
+            index.job_ids.remove(job.job_id)
+            return True
+
+        job.updated_at = get_timestamp()
+        async with self._lock:
+            job.etag = await self._write(self._get_key(job.job_id), job, etag=job.etag)
+            if not job.is_pending:
+                await self._update_index(remove_job)
+
+    async def claim(self, job: ExtractionJob, instance_id: str) -> bool:
+        """
+        Claim a job for an attempt by an instance. The claim fails if another
+        replica changed the job since it was read, e.g. because it claimed the
+        job first.
+
+        :param job: The job to claim.
+        :type job: ExtractionJob
+        :param instance_id: The id of the instance claiming the job.
+        :type instance_id: str
+        :return: True if the job was claimed.
+        :rtype: bool
+        """
+        job.status = JobStatus.RUNNING
+        job.instance_id = instance_id
+        job.attempts += 1
+        try:
+            await self.update(job)
+        except StorageConflictError:
+            logger.info(
+                f"Extraction job '{job.job_id}' was claimed by another replica."
+            )
+            return False
+        return True
+
+    async def get(self, job_id: str) -> ExtractionJob | None:
+        """
+        Get a job by id.
+
+        :param job_id: The id of the job.
+        :type job_id: str
+        :return: The job or None if it does not exist.
+        :rtype: ExtractionJob | None
+        """
+        key = self._get_key(job_id)
+        items, metadata = await self._read([key], target_cls=ExtractionJob)
+        job = items.get(key)
+        if job is not None:
+            job.etag = metadata.get(key, ItemMetadata()).etag
+        return job
+
+    async def get_pending_jobs(self) -> list[ExtractionJob]:
+        """
+        Get all queued and running jobs in order of creation.
+
+        :return: The list of pending jobs.
+        :rtype: list[ExtractionJob]
+        """
+        items, _ = await self._read([self.INDEX_KEY], target_cls=ExtractionJobIndex)
+        index = items.get(self.INDEX_KEY, ExtractionJobIndex())
+        if not index.job_ids:
+            return []
+
+        keys = [self._get_key(job_id) for job_id in index.job_ids]
+        items, metadata = await self._read(keys, target_cls=ExtractionJob)
+        jobs = []
+        for key in keys:
+            job = items.get(key)
+            if job is None or not job.is_pending:
+                continue
+            job.etag = metadata.get(key, ItemMetadata()).etag
+            jobs.append(job)
+        return jobs
@@ -0,0 +1,278 @@
+import asyncio
+import uuid
+from typing import Awaitable, Callable
+
+from app.jobs.store import ExtractionJobStore
+from app.logs import setup_logging
+from app.models.core import JobStatus
+from app.models.documents import ProcessedDocument
+from app.models.jobs import ExtractionJob
+from app.storage.cosmos import StorageConflictError
+from opentelemetry import metrics, trace
+
+logger = setup_logging(__name__)
+meter = metrics.get_meter(__name__)
+tracer = trace.get_tracer(__name__)
+
+job_duration_histogram = meter.create_histogram(
+    name="copilot.jobs.extraction.duration",
+    unit="s",
+    description="Duration of background extraction jobs.",
+)
+
+JobProcessor = Callable[[ExtractionJob], Awaitable[ProcessedDocument]]
+JobNotifier = Callable[[ExtractionJob, ProcessedDocument | None], Awaitable[None]]
+
+
+class ExtractionWorkerPool:
+    """
+    In-process worker pool for background extraction jobs. Jobs are persisted in
+    the job store before they are queued, processed by a bounded number of
+    workers and the user is notified once a job completed or finally failed.
+    Pending jobs are recovered from the job store when the pool starts and
+    periodically afterwards, so that jobs of replicas which scaled in or crashed
+    are taken over once their lease expired. Jobs are claimed with a
+    conditional write, so that only one replica runs an attempt of a job.
+    """
+
+    def __init__(
+        self,
+        job_store: ExtractionJobStore,
+        processor: JobProcessor,
+        notifier: JobNotifier,
+        instance_id: str,
+        concurrency: int = 2,
+        max_attempts: int = 3,
+        retry_delay_seconds: float = 10.0,
+        lease_seconds: int = 900,
+        recovery_interval_seconds: float = 60.0,
+    ):
+        """
+        Initialize the ExtractionWorkerPool.
+
+        :param job_store: The store persisting the jobs.
+        :type job_store: ExtractionJobStore
+        :param processor: The coroutine processing the document of a job.
+        :type processor: JobProcessor
+        :param notifier: The coroutine notifying the user about the result of a job.
+        :type notifier: JobNotifier
+        :param instance_id: The id of the application instance running the pool.
+        :type instance_id: str
+        :param concurrency: The maximum number of jobs processed concurrently.
+        :type concurrency: int
+        :param max_attempts: The maximum number of attempts per job.
+        :type max_attempts: int
+        :param retry_delay_seconds: The delay before a failed job is retried.
+        :type retry_delay_seconds: float
+        :param lease_seconds: The number of seconds after which pending jobs of other instances are taken over.
+        :type lease_seconds: int
+        :param recovery_interval_seconds: The interval between scans for pending jobs whose lease expired.
+        :type recovery_interval_seconds: float
+        """
+        self.job_store = job_store
+        self.processor = processor
+        self.notifier = notifier
+        self.instance_id = instance_id
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_delay_seconds = retry_delay_seconds
+        self.lease_seconds = lease_seconds
+        self.recovery_interval_seconds = recovery_interval_seconds
+        self._queue: asyncio.Queue[ExtractionJob] = asyncio.Queue()
+        self._workers: list[asyncio.Task] = []
+        self._retries: set[asyncio.Task] = set()
+        self._recovery: asyncio.Task | None = None
+        self._job_ids: set[str] = set()
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self._workers)
+
+    async def start(self) -> None:
+        """
+        Recover pending jobs from the job store and start the workers.
+        """
+        if self.is_running:
+            return
+
+        # Recover pending jobs
+        await self._recover()
+
+        # Start workers
+        logger.info(
+            f"Starting {self.concurrency} extraction workers with {self._queue.qsize()} recovered jobs."
+        )
+        self._workers = [
+            asyncio.create_task(self._work(), name=f"extraction-worker-{index}")
+            for index in range(self.concurrency)
+        ]
+        self._recovery = asyncio.create_task(
+            self._recover_periodically(), name="extraction-recovery"
+        )
+
+    async def _recover(self) -> None:
+        """
+        Queue pending jobs which are claimable by this instance and not yet
+        queued or running on it.
+        """
+        for job in await self.job_store.get_pending_jobs():
+            if job.job_id in self._job_ids or not job.is_claimable(
+                instance_id=self.instance_id, lease_seconds=self.lease_seconds
+            ):
+                continue
+            logger.info(
+                f"Recovering extraction job '{job.job_id}' with status '{job.status.value}'."
+            )
+            self._enqueue(job)
+
+    async def _recover_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.recovery_interval_seconds)
+            try:
+                await self._recover()
+            except Exception:
+                logger.error("Failed to recover extraction jobs.", exc_info=True)
+
+    def _enqueue(self, job: ExtractionJob) -> None:
+        self._job_ids.add(job.job_id)
+        self._queue.put_nowait(job)
+
+    async def stop(self) -> None:
+        """
+        Stop the workers. Running jobs remain pending in the job store and are
+        recovered on the next start.
+        """
+        tasks = [*self._workers, *self._retries]
+        if self._recovery is not None:
+            tasks.append(self._recovery)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._retries.clear()
+        self._recovery = None
+        self._job_ids.clear()
+        logger.info("Stopped extraction workers.")
+
+    async def submit(
+        self, conversation_reference: dict, attachment_name: str, download_url: str
+    ) -> ExtractionJob:
+        """
+        Persist and queue a new extraction job.
+
+        :param conversation_reference: The serialized reference of the conversation to notify.
+        :type conversation_reference: dict
+        :param attachment_name: The name of the attachment.
+        :type attachment_name: str
+        :param download_url: The download url of the attachment.
+        :type download_url: str
+        :return: The queued job.
+        :rtype: ExtractionJob
+        """
+        job = ExtractionJob(
+            job_id=uuid.uuid4().hex[:12],
+            conversation_reference=conversation_reference,
+            attachment_name=attachment_name,
+            download_url=download_url,
+            instance_id=self.instance_id,
+        )
+        await self.job_store.create(job)
+        self._enqueue(job)
+        logger.info(
+            f"Queued extraction job '{job.job_id}' for attachment '{attachment_name}'."
+        )
+        return job
+
+    async def _work(self) -> None:
+        """
+        Process queued jobs until the worker is cancelled.
+        """
+        while True:
+            job = await self._queue.get()
+            retried = False
+            try:
+                retried = await self._run(job)
+            except Exception:
+                logger.error(
+                    f"Unexpected error in extraction worker for job '{job.job_id}'.",
+                    exc_info=True,
+                )
+            finally:
+                if not retried:
+                    self._job_ids.discard(job.job_id)
+                self._queue.task_done()
+
+    async def _run(self, job: ExtractionJob) -> bool:
+        """
+        Run a single attempt of a job and notify the user about the result.
+
+        :param job: The job to run.
+        :type job: ExtractionJob
+        :return: True if the job is retried after a delay.
+        :rtype: bool
+        """
+        # Claim job, unless another replica claimed it first
+        if not await self.job_store.claim(job, instance_id=self.instance_id):
+            return False
+
+        loop = asyncio.get_running_loop()
+        start_time = loop.time()
+        with tracer.start_as_current_span("extraction_job") as span:
+            span.set_attributes(
+                {
+                    "job.id": job.job_id,
+                    "job.attempt": job.attempts,
+                }
+            )
+            try:
+                processed_document = await self.processor(job)
+                await self.notifier(job, processed_document)
+                job.status = JobStatus.COMPLETED
+                job.error = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(
+                    f"Extraction job '{job.job_id}' failed in attempt {job.attempts} of {self.max_attempts}.",
+                    exc_info=True,
+                )
+                span.record_exception(e)
+                job.error = str(e)
+                job.status = (
+                    JobStatus.QUEUED
+                    if job.attempts < self.max_attempts
+                    else JobStatus.FAILED
+                )
+
+        job_duration_histogram.record(
+            loop.time() - start_time, attributes={"status": job.status.value}
+        )
+
+        # Notify user about failed jobs
+        if job.status == JobStatus.FAILED:
+            try:
+                await self.notifier(job, None)
+            except Exception:
+                logger.error(
+                    f"Failed to notify user about failed extraction job '{job.job_id}'.",
+                    exc_info=True,
+                )
+        try:
+            await self.job_store.update(job)
+        except StorageConflictError:
+            logger.warning(
+                f"Extraction job '{job.job_id}' was taken over by another replica."
+            )
+            return False
+
+        # Retry job after a delay
+        if job.status == JobStatus.QUEUED:
+            retry = asyncio.create_task(self._retry(job))
+            self._retries.add(retry)
+            retry.add_done_callback(self._retries.discard)
+            return True
+        return False
+
+    async def _retry(self, job: ExtractionJob) -> None:
+        await asyncio.sleep(self.retry_delay_seconds * job.attempts)
+        self._queue.put_nowait(job)
@@ -1,26 +1,171 @@
+import atexit
 import logging
 import os
+import queue
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener
 
 from app.core.settings import settings
 from azure.identity import DefaultAzureCredential
 from azure.monitor.opentelemetry import configure_azure_monitor
 from microsoft_agents.activity import Activity
 from microsoft_agents.hosting.core.storage.transcript_logger import TranscriptLogger
+from opentelemetry import metrics
 from opentelemetry.instrumentation.aiohttp_client import AioHttpClientInstrumentor
 
+meter = metrics.get_meter(__name__)
+
+suppressed_records_counter = meter.create_counter(
+    name="copilot.logging.suppressed",
+    unit="{record}",
+    description="Number of log records suppressed by the rate limit of a logger.",
+)
+dropped_records_counter = meter.create_counter(
+    name="copilot.logging.dropped",
+    unit="{record}",
+    description="Number of log records dropped, because the logging queue was full.",
+)
+
+_logging_lock = threading.Lock()
+_queue_handler: QueueHandler | None = None
+_queue_listener: QueueListener | None = None
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Filter which limits the records of a logger with a token bucket, so that
+    loggers on hot paths like every turn or heartbeat cannot flood the logs.
+    Warnings and errors are never suppressed. The number of suppressed records
+    is appended to the next record which passes the filter.
+    """
+
+    def __init__(self, rate_per_second: float, burst: int):
+        """
+        Initialize the RateLimitFilter.
+
+        :param rate_per_second: The number of records per second passing the filter.
+        :type rate_per_second: float
+        :param burst: The number of records passing the filter at once.
+        :type burst: int
+        """
+        super().__init__()
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.suppressed = 0
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate_per_second
+            )
+            self._updated = now
+            if self._tokens < 1:
+                self.suppressed += 1
+                suppressed_records_counter.add(1, attributes={"logger": record.name})
+                return False
+            self._tokens -= 1
+            suppressed, self.suppressed = self.suppressed, 0
+
+        if suppressed:
+            record.msg = f"{record.msg} [{suppressed} records suppressed]"
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    QueueHandler which drops records if the queue is full instead of blocking
+    the event loop or reporting an error for every record.
+    """
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            dropped_records_counter.add(1)
+
+
+def create_stream_handler() -> logging.StreamHandler:
+    """
+    Create the handler writing log records to the console.
+
+    :return: The stream handler.
+    :rtype: logging.StreamHandler
+    """
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter(settings.LOGGING_FORMAT))
+    return stream_handler
+
+
+def configure_logging() -> None:
+    """
+    Configure the root logger once per process. Records are put into a queue
+    on the calling thread and written to the console by a listener thread, so
+    that no I/O happens on the event loop. Loggers of the application have no
+    handlers of their own and propagate to the root logger, which also holds
+    the handler of Azure Monitor, so that every record is emitted once.
+    """
+    global _queue_handler, _queue_listener
+    with _logging_lock:
+        if _queue_handler is not None:
+            return
+
+        # Create queue pipeline
+        _queue_handler = NonBlockingQueueHandler(
+            queue.Queue(maxsize=settings.LOGGING_QUEUE_SIZE)
+        )
+        _queue_listener = QueueListener(
+            _queue_handler.queue, create_stream_handler(), respect_handler_level=True
+        )
+        _queue_listener.start()
+        atexit.register(shutdown_logging)
+
+        # Configure root logger
+        root_logger = logging.getLogger()
+        root_logger.setLevel(settings.LOGGING_LEVEL)
+        root_logger.addHandler(_queue_handler)
+
+        # Limit records of loggers on hot paths
+        for name in settings.LOGGING_RATE_LIMITED_LOGGERS:
+            logging.getLogger(name).addFilter(
+                RateLimitFilter(
+                    rate_per_second=settings.LOGGING_RATE_LIMIT_PER_SECOND,
+                    burst=settings.LOGGING_RATE_LIMIT_BURST,
+                )
+            )
+
+
+def shutdown_logging() -> None:
+    """
+    Write all queued records and write further records synchronously.
+    """
+    global _queue_listener
+    with _logging_lock:
+        if _queue_listener is None:
+            return
+        _queue_listener.stop()
+        _queue_listener = None
+
+        root_logger = logging.getLogger()
+        root_logger.removeHandler(_queue_handler)
+        root_logger.addHandler(create_stream_handler())
+
 
 def setup_logging(module) -> logging.Logger:
     """Setup logging and event handler.
 
     RETURNS (Logger): The logger object to log activities.
     """
+    configure_logging()
     logger = logging.getLogger(module)
     logger.setLevel(settings.LOGGING_LEVEL)
-
-    # Create stream handler
-    stream_handler = logging.StreamHandler()
-    stream_handler.setFormatter(logging.Formatter(settings.LOGGING_FORMAT))
-    logger.addHandler(stream_handler)
     return logger
 
 
@@ -30,14 +175,8 @@ def setup_opentelemetry():
 
     RETURNS: None
     """
-    # Configure basic logging configuration
-    stream_handler = logging.StreamHandler()
-    stream_handler.setFormatter(logging.Formatter(settings.LOGGING_FORMAT))
-    logging.basicConfig(
-        format=settings.LOGGING_FORMAT,
-        handlers=[stream_handler],
-        level=settings.LOGGING_LEVEL,
-    )
+    # Configure logging
+    configure_logging()
 
     if settings.APPLICATIONINSIGHTS_AUTHENTICATION_STRING:
         credential = DefaultAzureCredential(
@@ -1,24 +1,111 @@
+import asyncio
 from contextlib import asynccontextmanager
-from typing import AsyncGenerator
+from typing import Any, AsyncGenerator, Callable
 
 from app.api.v1.router import api_v1_router
-from app.copilot.copilot import connection_manager
+from app.copilot.copilot import register_copilot_components
+from app.core.components import components
+from app.core.executor import event_loop_lag_monitor, shutdown_executor
+from app.core.readiness import (
+    readiness_tracker,
+    warm_up_bot_connector,
+    warm_up_document_intelligence,
+    warm_up_openai,
+)
 from app.core.settings import settings
 from app.logs import setup_opentelemetry
+from app.storage.factory import warm_up_storage
+from app.storage.lifecycle import storage_janitor
 from fastapi import FastAPI
+from microsoft_agents.hosting.core import Storage
 from microsoft_agents.hosting.fastapi import JwtAuthorizationMiddleware
 
 
+async def warm_up_component_storage(
+    component: str, name: str, get_component_storage: Callable[[Any], Storage]
+) -> None:
+    """
+    Create a component and warm up its storage, while other components are
+    still being created.
+
+    :param component: The name of the component.
+    :type component: str
+    :param name: The name of the storage used for logging.
+    :type name: str
+    :param get_component_storage: The function returning the storage of the component.
+    :type get_component_storage: Callable[[Any], Storage]
+    """
+    await components.initialize([component])
+    await warm_up_storage(
+        storage=get_component_storage(components.get(component)), name=name
+    )
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     """
     Gracefully start the application before the server reports readiness.
     """
-    # Configure open telemetry
-    setup_opentelemetry()
+    with components.measure("startup"):
+        # Configure open telemetry
+        with components.measure("opentelemetry"):
+            setup_opentelemetry()
+
+        # Start event loop lag monitor
+        event_loop_lag_monitor.start()
+
+        # Create components concurrently and warm up dependencies, so that the first turn does not pay for the cold start
+        readiness_tracker.register(
+            "storage.state",
+            lambda: warm_up_component_storage(
+                component="storage",
+                name="state",
+                get_component_storage=lambda storage: storage,
+            ),
+        )
+        readiness_tracker.register(
+            "storage.document",
+            lambda: warm_up_component_storage(
+                component="document_store",
+                name="document",
+                get_component_storage=lambda document_store: document_store.storage,
+            ),
+        )
+        if settings.CLIENT_ID:
+            readiness_tracker.register("bot_connector", warm_up_bot_connector)
+        readiness_tracker.register("openai", warm_up_openai, required=False)
+        readiness_tracker.register(
+            "document_intelligence", warm_up_document_intelligence, required=False
+        )
+        with components.measure("components"):
+            await asyncio.gather(
+                components.initialize(),
+                readiness_tracker.warm_up(),
+            )
+        app.state.agent_configuration = components.get(
+            "connection_manager"
+        ).get_default_connection_configuration()
+
+        # Start janitor for storages without native time to live
+        storage_janitor.start()
+
+        # Start background extraction workers
+        extraction_worker_pool = components.get("extraction_worker_pool")
+        if settings.JOB_QUEUE_ENABLED:
+            await extraction_worker_pool.start()
+    components.log_report()
 
     yield
 
+    # Stop background extraction workers, storage janitor and readiness retries
+    await extraction_worker_pool.stop()
+    await storage_janitor.stop()
+    await readiness_tracker.stop()
+
+    # Stop event loop lag monitor and executor for CPU-bound work
+    await event_loop_lag_monitor.stop()
+    shutdown_executor()
+
 
 def get_app() -> FastAPI:
     """
@@ -36,10 +123,10 @@ def get_app() -> FastAPI:
         lifespan=lifespan,
     )
 
-    # Add middleware
-    app.state.agent_configuration = (
-        connection_manager.get_default_connection_configuration()
-    )
+    # Register components, which are created by the lifespan
+    register_copilot_components(container=components)
+
+    # Add middleware, the agent configuration is set by the lifespan
     app.add_middleware(JwtAuthorizationMiddleware)
 
     # Add router
@@ -49,3 +136,4 @@ def get_app() -> FastAPI:
 
 
 app = get_app()
+components.record_import()
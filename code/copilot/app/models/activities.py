@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta, timezone
+
+from app.models.jobs import get_timestamp
+from microsoft_agents.hosting.core import StoreItem
+
+
+class ProcessedActivity(StoreItem):
+    def __init__(
+        self,
+        activity_id: str,
+        conversation_id: str,
+        instance_id: str = None,
+        created_at: str = None,
+    ):
+        self.activity_id = activity_id
+        self.conversation_id = conversation_id
+        self.instance_id = instance_id
+        self.created_at = created_at or get_timestamp()
+
+    def is_expired(self, ttl_seconds: float) -> bool:
+        """
+        Check whether the activity was processed longer ago than the time to live.
+
+        :param ttl_seconds: The number of seconds during which duplicates are suppressed.
+        :type ttl_seconds: float
+        :return: True if the record is expired.
+        :rtype: bool
+        """
+        expires_at = datetime.fromisoformat(self.created_at) + timedelta(
+            seconds=ttl_seconds
+        )
+        return expires_at <= datetime.now(timezone.utc)
+
+    def store_item_to_json(self) -> dict:
+        return {
+            "activity_id": self.activity_id,
+            "conversation_id": self.conversation_id,
+            "instance_id": self.instance_id,
+            "created_at": self.created_at,
+        }
+
+    @staticmethod
+    def from_json_to_store_item(json_data: dict) -> "ProcessedActivity":
+        return ProcessedActivity(
+            activity_id=json_data.get("activity_id"),
+            conversation_id=json_data.get("conversation_id"),
+            instance_id=json_data.get("instance_id", None),
+            created_at=json_data.get("created_at", None),
+        )
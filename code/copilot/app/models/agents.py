@@ -1,35 +1,129 @@
+import copy
+
 from microsoft_agents.hosting.core import StoreItem
 from pydantic import BaseModel, Field
 
+# Keys of compressed documents embedded in the user state by previous versions
+LEGACY_DOCUMENT_KEYS = ("instructions", "document_index", "section_index")
+
 
 class UserStateStoreItem(StoreItem):
     def __init__(
         self,
         file_uploaded: bool = False,
-        instructions: str = None,
+        instructions_reference: str = None,
+        content_offset: int = None,
+        document_index_reference: str = None,
+        section_index_reference: str = None,
+        token_estimate: int = None,
+        processing_strategy: str = None,
+        pending_job_id: str = None,
         last_response_id: str = None,
         suggested_actions: dict[str, str] = {},
+        legacy_documents: dict[str, str] = None,
     ):
         self.file_uploaded = file_uploaded
-        self.instructions = instructions
+        self.instructions_reference = instructions_reference
+        self.content_offset = content_offset
+        self.document_index_reference = document_index_reference
+        self.section_index_reference = section_index_reference
+        self.token_estimate = token_estimate
+        self.processing_strategy = processing_strategy
+        self.pending_job_id = pending_job_id
         self.last_response_id = last_response_id
         self.suggested_actions = suggested_actions
+        # Compressed documents embedded by previous versions until they are moved to the document store
+        self.legacy_documents = legacy_documents or {}
+        self.mark_clean()
+
+    def reset(self) -> None:
+        """
+        Reset all fields, e.g. to restart the conversation.
+        """
+        self.file_uploaded = False
+        self.instructions_reference = None
+        self.content_offset = None
+        self.document_index_reference = None
+        self.section_index_reference = None
+        self.legacy_documents = {}
+        self.token_estimate = None
+        self.processing_strategy = None
+        self.pending_job_id = None
+        self.last_response_id = None
+        self.suggested_actions = {}
+
+    def mark_clean(self) -> None:
+        """
+        Take a snapshot of the fields, against which changes are detected.
+        """
+        self._snapshot = copy.deepcopy(self.store_item_to_json())
+
+    def get_changed_fields(self) -> list[str]:
+        """
+        Get the fields which changed since the item was loaded or last marked clean.
+
+        :return: The names of the changed fields.
+        :rtype: list[str]
+        """
+        current = self.store_item_to_json()
+        return [
+            key
+            for key in current.keys() | self._snapshot.keys()
+            if current.get(key) != self._snapshot.get(key)
+        ]
+
+    def apply_changes(self, other: "UserStateStoreItem", fields: list[str]) -> None:
+        """
+        Copy fields from another item, e.g. to apply the changes of a turn to
+        the state written concurrently by another turn.
+
+        :param other: The item from which the fields are copied.
+        :type other: UserStateStoreItem
+        :param fields: The names of the fields as returned by `get_changed_fields`.
+        :type fields: list[str]
+        """
+        for field in fields:
+            if field in LEGACY_DOCUMENT_KEYS:
+                if field in other.legacy_documents:
+                    self.legacy_documents[field] = other.legacy_documents[field]
+                else:
+                    self.legacy_documents.pop(field, None)
+            else:
+                setattr(self, field, copy.deepcopy(getattr(other, field)))
 
     def store_item_to_json(self) -> dict:
         return {
             "file_uploaded": self.file_uploaded,
-            "instructions": self.instructions,
+            "instructions_reference": self.instructions_reference,
+            "content_offset": self.content_offset,
+            "document_index_reference": self.document_index_reference,
+            "section_index_reference": self.section_index_reference,
+            "token_estimate": self.token_estimate,
+            "processing_strategy": self.processing_strategy,
+            "pending_job_id": self.pending_job_id,
             "last_response_id": self.last_response_id,
             "suggested_actions": self.suggested_actions,
+            **self.legacy_documents,
         }
 
     @staticmethod
     def from_json_to_store_item(json_data: dict) -> "UserStateStoreItem":
         return UserStateStoreItem(
             file_uploaded=json_data.get("file_uploaded", False),
-            instructions=json_data.get("instructions", None),
+            instructions_reference=json_data.get("instructions_reference", None),
+            content_offset=json_data.get("content_offset", None),
+            document_index_reference=json_data.get("document_index_reference", None),
+            section_index_reference=json_data.get("section_index_reference", None),
+            token_estimate=json_data.get("token_estimate", None),
+            processing_strategy=json_data.get("processing_strategy", None),
+            pending_job_id=json_data.get("pending_job_id", None),
             last_response_id=json_data.get("last_response_id", None),
             suggested_actions=json_data.get("suggested_actions", {}),
+            legacy_documents={
+                key: json_data[key]
+                for key in LEGACY_DOCUMENT_KEYS
+                if json_data.get(key)
+            },
         )
 
 
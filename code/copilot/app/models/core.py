@@ -7,3 +7,40 @@ class AuthorizationTypes(str, Enum):
     SYSTEM_MANAGED_IDENTITY = "SystemManagedIdentity"
     FEDERATED_CREDENTIALS = "FederatedCredentials"
     WORKLOAD_IDENTITY = "WorkloadIdentity"
+
+
+class ProcessingStrategy(str, Enum):
+    FULL_CONTEXT = "full_context"
+    COMPACTED = "compacted"
+    RETRIEVAL = "retrieval"
+    MAP_REDUCE = "map_reduce"
+
+
+class JobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+class ProgressStage(str, Enum):
+    QUEUED = "queued"
+    DOWNLOAD = "download"
+    ANALYSIS = "analysis"
+    COMPACTION = "compaction"
+    CLEANING = "cleaning"
+    INDEXING = "indexing"
+    COMPLETED = "completed"
+
+
+class ExecutorType(str, Enum):
+    NONE = "none"
+    THREAD = "thread"
+    PROCESS = "process"
+
+
+class CompressionCodec(str, Enum):
+    NONE = "none"
+    ZLIB = "zlib"
+    ZSTD = "zstd"
+    LZ4 = "lz4"
@@ -0,0 +1,109 @@
+from typing import Optional
+
+from app.models.core import ProcessingStrategy, ProgressStage
+from microsoft_agents.hosting.core import StoreItem
+from pydantic import BaseModel, Field
+
+
+class DocumentChunk(BaseModel):
+    chunk_id: int = Field(..., alias="chunk_id")
+    page_number: int = Field(..., alias="page_number")
+    heading: Optional[str] = Field(default=None, alias="heading")
+    content: str = Field(..., alias="content")
+
+
+class DocumentPassage(BaseModel):
+    chunk: DocumentChunk = Field(..., alias="chunk")
+    score: float = Field(..., alias="score")
+
+
+class DocumentPage(BaseModel):
+    page_number: int = Field(..., alias="page_number")
+    offset_start: int = Field(..., alias="offset_start")
+    offset_end: int = Field(..., alias="offset_end")
+
+
+class DocumentSection(BaseModel):
+    section_id: int = Field(..., alias="section_id")
+    parent_id: Optional[int] = Field(default=None, alias="parent_id")
+    number: Optional[str] = Field(default=None, alias="number")
+    title: str = Field(..., alias="title")
+    level: int = Field(..., alias="level")
+    page_start: int = Field(..., alias="page_start")
+    page_end: int = Field(..., alias="page_end")
+    offset_start: int = Field(..., alias="offset_start")
+    offset_end: int = Field(..., alias="offset_end")
+
+
+class DocumentSlice(BaseModel):
+    description: str = Field(..., alias="description")
+    page_start: int = Field(..., alias="page_start")
+    page_end: int = Field(..., alias="page_end")
+    offset_start: int = Field(..., alias="offset_start")
+    offset_end: int = Field(..., alias="offset_end")
+
+
+class ProcessedDocument(BaseModel):
+    attachment_name: str = Field(..., alias="attachment_name")
+    instructions_reference: str = Field(..., alias="instructions_reference")
+    content_offset: int = Field(..., alias="content_offset")
+    token_estimate: int = Field(..., alias="token_estimate")
+    processing_strategy: ProcessingStrategy = Field(..., alias="processing_strategy")
+    document_index_reference: Optional[str] = Field(
+        default=None, alias="document_index_reference"
+    )
+    section_index_reference: Optional[str] = Field(
+        default=None, alias="section_index_reference"
+    )
+    tokens_saved: Optional[int] = Field(default=None, alias="tokens_saved")
+    tokens_saved_ratio: Optional[float] = Field(
+        default=None, alias="tokens_saved_ratio"
+    )
+
+
+class ProgressEvent(BaseModel):
+    stage: ProgressStage = Field(..., alias="stage")
+    message: str = Field(..., alias="message")
+    fraction: Optional[float] = Field(default=None, alias="fraction")
+    progress: float = Field(..., alias="progress")
+    attributes: dict[str, str | int | float | bool] = Field(
+        default_factory=dict, alias="attributes"
+    )
+
+
+class StoredDocument(StoreItem):
+    def __init__(self, digest: str, chunk_count: int = 1, size: int = 0):
+        self.digest = digest
+        self.chunk_count = chunk_count
+        self.size = size
+
+    def store_item_to_json(self) -> dict:
+        return {
+            "digest": self.digest,
+            "chunk_count": self.chunk_count,
+            "size": self.size,
+        }
+
+    @staticmethod
+    def from_json_to_store_item(json_data: dict) -> "StoredDocument":
+        return StoredDocument(
+            digest=json_data.get("digest"),
+            chunk_count=json_data.get("chunk_count", 1),
+            size=json_data.get("size", 0),
+        )
+
+
+class StoredDocumentChunk(StoreItem):
+    def __init__(self, data: str = ""):
+        self.data = data
+
+    def store_item_to_json(self) -> dict:
+        return {
+            "data": self.data,
+        }
+
+    @staticmethod
+    def from_json_to_store_item(json_data: dict) -> "StoredDocumentChunk":
+        return StoredDocumentChunk(
+            data=json_data.get("data", ""),
+        )
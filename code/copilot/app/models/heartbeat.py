@@ -1,5 +1,20 @@
-from pydantic import BaseModel
+from typing import Optional
+
+from pydantic import BaseModel, Field
 
 
 class HeartbeatResult(BaseModel):
     isAlive: bool
+
+
+class DependencyStatus(BaseModel):
+    name: str = Field(..., alias="name")
+    required: bool = Field(..., alias="required")
+    ready: bool = Field(default=False, alias="ready")
+    duration_seconds: Optional[float] = Field(default=None, alias="duration_seconds")
+    error: Optional[str] = Field(default=None, alias="error")
+
+
+class ReadinessResult(BaseModel):
+    isReady: bool
+    dependencies: list[DependencyStatus]
@@ -0,0 +1,118 @@
+from datetime import datetime, timedelta, timezone
+
+from app.models.core import JobStatus
+from microsoft_agents.hosting.core import StoreItem
+
+
+def get_timestamp() -> str:
+    """
+    Get the current UTC time as ISO 8601 string.
+
+    :return: The current UTC time.
+    :rtype: str
+    """
+    return datetime.now(timezone.utc).isoformat()
+
+
+class ExtractionJob(StoreItem):
+    def __init__(
+        self,
+        job_id: str,
+        status: JobStatus = JobStatus.QUEUED,
+        conversation_reference: dict = None,
+        attachment_name: str = None,
+        download_url: str = None,
+        instance_id: str = None,
+        attempts: int = 0,
+        error: str = None,
+        progress: str = None,
+        created_at: str = None,
+        updated_at: str = None,
+    ):
+        self.job_id = job_id
+        self.status = JobStatus(status)
+        self.conversation_reference = conversation_reference or {}
+        self.attachment_name = attachment_name
+        self.download_url = download_url
+        self.instance_id = instance_id
+        self.attempts = attempts
+        self.error = error
+        self.progress = progress
+        self.created_at = created_at or get_timestamp()
+        self.updated_at = updated_at or self.created_at
+
+        # ETag of the last read or write, which is not persisted
+        self.etag: str | None = None
+
+    @property
+    def is_pending(self) -> bool:
+        return self.status in (JobStatus.QUEUED, JobStatus.RUNNING)
+
+    def is_claimable(self, instance_id: str, lease_seconds: int) -> bool:
+        """
+        Check whether a pending job can be picked up by an instance. Jobs are
+        claimable by the instance that last worked on them or by any instance
+        once the lease of the previous instance has expired.
+
+        :param instance_id: The id of the instance recovering jobs.
+        :type instance_id: str
+        :param lease_seconds: The number of seconds a job stays leased to an instance after its last update.
+        :type lease_seconds: int
+        :return: True if the job can be picked up.
+        :rtype: bool
+        """
+        if not self.is_pending:
+            return False
+        if self.instance_id in (None, instance_id):
+            return True
+        lease_expires_at = datetime.fromisoformat(self.updated_at) + timedelta(
+            seconds=lease_seconds
+        )
+        return lease_expires_at <= datetime.now(timezone.utc)
+
+    def store_item_to_json(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "status": self.status.value,
+            "conversation_reference": self.conversation_reference,
+            "attachment_name": self.attachment_name,
+            "download_url": self.download_url,
+            "instance_id": self.instance_id,
+            "attempts": self.attempts,
+            "error": self.error,
+            "progress": self.progress,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
+
+    @staticmethod
+    def from_json_to_store_item(json_data: dict) -> "ExtractionJob":
+        return ExtractionJob(
+            job_id=json_data.get("job_id"),
+            status=json_data.get("status", JobStatus.QUEUED),
+            conversation_reference=json_data.get("conversation_reference", {}),
+            attachment_name=json_data.get("attachment_name", None),
+            download_url=json_data.get("download_url", None),
+            instance_id=json_data.get("instance_id", None),
+            attempts=json_data.get("attempts", 0),
+            error=json_data.get("error", None),
+            progress=json_data.get("progress", None),
+            created_at=json_data.get("created_at", None),
+            updated_at=json_data.get("updated_at", None),
+        )
+
+
+class ExtractionJobIndex(StoreItem):
+    def __init__(self, job_ids: list[str] = None):
+        self.job_ids = job_ids or []
+
+    def store_item_to_json(self) -> dict:
+        return {
+            "job_ids": self.job_ids,
+        }
+
+    @staticmethod
+    def from_json_to_store_item(json_data: dict) -> "ExtractionJobIndex":
+        return ExtractionJobIndex(
+            job_ids=json_data.get("job_ids", []),
+        )
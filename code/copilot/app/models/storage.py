@@ -0,0 +1,19 @@
+from typing import Optional
+
+from pydantic import BaseModel, Field
+
+
+class ItemMetadata(BaseModel):
+    etag: Optional[str] = Field(default=None, alias="etag")
+    request_charge: float = Field(default=0.0, alias="request_charge")
+
+
+class CacheEntry(BaseModel):
+    data: str = Field(..., alias="data")
+    etag: Optional[str] = Field(default=None, alias="etag")
+    request_charge: float = Field(default=0.0, alias="request_charge")
+    expires_at: float = Field(..., alias="expires_at")
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
@@ -0,0 +1,222 @@
+import json
+import time
+from collections import OrderedDict
+from typing import Callable, Type, TypeVar
+
+from app.logs import setup_logging
+from app.models.storage import CacheEntry, ItemMetadata
+from app.storage.cosmos import (
+    CosmosDBMetadataStorage,
+    StorageConflictError,
+    set_item_etag,
+)
+from app.storage.instrumentation import InstrumentedStorage
+from microsoft_agents.hosting.core import Storage, StoreItem
+from opentelemetry import metrics
+
+logger = setup_logging(__name__)
+meter = metrics.get_meter(__name__)
+
+cache_requests_counter = meter.create_counter(
+    name="copilot.storage.cache.requests",
+    unit="{item}",
+    description="Number of items read through the storage cache by result (hit, miss or bypass).",
+)
+cache_saved_request_units_counter = meter.create_counter(
+    name="copilot.storage.cache.saved_request_units",
+    unit="{RU}",
+    description="Request units of Cosmos DB reads served from the storage cache.",
+)
+cache_size_counter = meter.create_up_down_counter(
+    name="copilot.storage.cache.size",
+    unit="By",
+    description="Size of the serialized items held in the storage cache.",
+)
+cache_evictions_counter = meter.create_counter(
+    name="copilot.storage.cache.evictions",
+    unit="{item}",
+    description="Number of items removed from the storage cache by reason.",
+)
+
+StoreItemT = TypeVar("StoreItemT", bound=StoreItem)
+
+
+class CachedStorage(Storage):
+    """
+    Read-through and write-through in-process cache in front of another storage.
+    Items are kept as serialized JSON in a least recently used order, bounded by
+    the total size in bytes and expired after a time to live. The time to live
+    bounds how long a replica may serve an item after another replica changed
+    it. Entries keep the ETag of the stored item, which is refreshed by every
+    read and write of this replica. Items served from an entry carry that ETag,
+    so that writing them is conditional and items served from an outdated entry
+    never overwrite changes of other replicas.
+
+    Keys which must not be served outdated, e.g. the conversation state loaded
+    at the start of a turn, bypass the cache and are always read from the
+    storage.
+    """
+
+    def __init__(
+        self,
+        storage: Storage,
+        max_size: int,
+        ttl_seconds: float,
+        bypass: Callable[[str], bool] = None,
+    ):
+        """
+        Initialize the CachedStorage.
+
+        :param storage: The storage persisting the items.
+        :type storage: Storage
+        :param max_size: The maximum size of all cached items in bytes.
+        :type max_size: int
+        :param ttl_seconds: The time after which cached items are read from the storage again.
+        :type ttl_seconds: float
+        :param bypass: The function returning True for keys which are never cached.
+        :type bypass: Callable[[str], bool]
+        """
+        self.storage = storage
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.bypass = bypass or (lambda key: False)
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._size = 0
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def supports_metadata(self) -> bool:
+        if isinstance(self.storage, InstrumentedStorage):
+            return self.storage.supports_metadata
+        return isinstance(self.storage, CosmosDBMetadataStorage)
+
+    def _get_entry(self, key: str) -> CacheEntry | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            self._remove(key, reason="expired")
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _put(self, key: str, item: StoreItem, metadata: ItemMetadata | None) -> None:
+        self._remove(key, reason="replaced")
+        if self.bypass(key):
+            return
+        metadata = metadata or ItemMetadata()
+        entry = CacheEntry(
+            data=json.dumps(item.store_item_to_json(), separators=(",", ":")),
+            etag=metadata.etag,
+            request_charge=metadata.request_charge,
+            expires_at=time.monotonic() + self.ttl_seconds,
+        )
+        if entry.size > self.max_size:
+            logger.debug(f"Item '{key}' exceeds the storage cache size.")
+            return
+
+        self._entries[key] = entry
+        self._size += entry.size
+        cache_size_counter.add(entry.size)
+
+        # Evict least recently used items
+        while self._size > self.max_size:
+            oldest_key = next(iter(self._entries))
+            self._remove(oldest_key, reason="size")
+
+    def _remove(self, key: str, reason: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._size -= entry.size
+        cache_size_counter.add(-entry.size)
+        if reason != "replaced":
+            cache_evictions_counter.add(1, attributes={"reason": reason})
+
+    def clear(self) -> None:
+        """
+        Remove all items from the cache.
+        """
+        for key in list(self._entries):
+            self._remove(key, reason="cleared")
+
+    async def read(
+        self, keys: list[str], *, target_cls: Type[StoreItemT] = None, **kwargs
+    ) -> dict[str, StoreItemT]:
+        if not keys:
+            raise ValueError("Storage.read(): Keys are required when reading.")
+        if not target_cls:
+            raise ValueError("Storage.read(): target_cls cannot be None.")
+
+        # Serve cached items
+        result: dict[str, StoreItemT] = {}
+        bypassed_keys = [key for key in keys if self.bypass(key)]
+        for key in keys:
+            entry = None if key in bypassed_keys else self._get_entry(key)
+            if entry is None:
+                continue
+            item = target_cls.from_json_to_store_item(json.loads(entry.data))
+            set_item_etag(item, entry.etag)
+            result[key] = item
+            cache_saved_request_units_counter.add(entry.request_charge)
+        missing_keys = [key for key in keys if key not in result]
+        cache_requests_counter.add(len(result), attributes={"result": "hit"})
+        cache_requests_counter.add(
+            len(missing_keys) - len(bypassed_keys), attributes={"result": "miss"}
+        )
+        cache_requests_counter.add(len(bypassed_keys), attributes={"result": "bypass"})
+        if not missing_keys:
+            return result
+
+        # Read missing items and cache them
+        metadata: dict[str, ItemMetadata] = {}
+        if self.supports_metadata:
+            kwargs["metadata"] = metadata
+        items = await self.storage.read(missing_keys, target_cls=target_cls, **kwargs)
+        for key, item in items.items():
+            self._put(key, item, metadata.get(key))
+        result.update(items)
+        return result
+
+    async def write(self, changes: dict[str, StoreItem]) -> None:
+        if not changes:
+            raise ValueError("Storage.write(): Changes are required when writing.")
+
+        metadata: dict[str, ItemMetadata] = {}
+        try:
+            if self.supports_metadata:
+                await self.storage.write(changes, metadata=metadata)
+            else:
+                await self.storage.write(changes)
+        except Exception as e:
+            # The state of partially written items is unknown
+            reason = "conflict" if isinstance(e, StorageConflictError) else "failed"
+            for key in changes:
+                self._remove(key, reason=reason)
+            raise
+        for key, item in changes.items():
+            self._put(key, item, metadata.get(key))
+
+    async def delete(self, keys: list[str]) -> None:
+        if not keys:
+            raise ValueError("Storage.delete(): Keys are required when deleting.")
+
+        for key in keys:
+            self._remove(key, reason="deleted")
+        await self.storage.delete(keys)
+
+
+def get_uncached_storage(storage: Storage) -> Storage:
+    """
+    Get the storage behind a cache, e.g. for items which are modified by
+    several replicas and must not be served from the cache.
+
+    :param storage: The storage which may be cached.
+    :type storage: Storage
+    :return: The storage persisting the items.
+    :rtype: Storage
+    """
+    return storage.storage if isinstance(storage, CachedStorage) else storage
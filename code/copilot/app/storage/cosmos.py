@@ -0,0 +1,410 @@
+import asyncio
+import hashlib
+import time
+from typing import Callable, Mapping, Type, TypeVar
+
+import azure.cosmos.exceptions as cosmos_exceptions
+from app.logs import setup_logging
+from app.models.storage import ItemMetadata
+from azure.core import MatchConditions
+from azure.cosmos import PartitionKey
+from azure.cosmos.partition_key import NonePartitionKeyValue
+from microsoft_agents.hosting.core import StoreItem
+from microsoft_agents.hosting.core.storage.error_handling import ignore_error
+from microsoft_agents.storage.cosmos import CosmosDBStorage, CosmosDBStorageConfig
+from microsoft_agents.storage.cosmos.cosmos_db_storage import cosmos_resource_not_found
+from microsoft_agents.storage.cosmos.errors import storage_errors
+from opentelemetry import metrics
+
+logger = setup_logging(__name__)
+meter = metrics.get_meter(__name__)
+
+request_units_histogram = meter.create_histogram(
+    name="copilot.storage.request_units",
+    unit="{RU}",
+    description="Request units consumed by a Cosmos DB operation.",
+)
+
+StoreItemT = TypeVar("StoreItemT", bound=StoreItem)
+
+REQUEST_CHARGE_HEADER = "x-ms-request-charge"
+ID_PARTITION_KEY_PATH = "/id"
+ITEM_ETAG_ATTRIBUTE = "_storage_etag"
+
+
+class StorageConflictError(Exception):
+    """
+    Raised if an item was changed by another writer since it was read.
+    """
+
+    def __init__(self, key: str):
+        super().__init__(f"Item '{key}' was changed by another writer.")
+        self.key = key
+
+
+def get_request_charge(headers: Mapping[str, str]) -> float:
+    """
+    Get the request units consumed by a Cosmos DB operation.
+
+    :param headers: The response headers of the operation.
+    :type headers: Mapping[str, str]
+    :return: The request charge.
+    :rtype: float
+    """
+    return float(headers.get(REQUEST_CHARGE_HEADER, 0.0) or 0.0)
+
+
+def get_item_etag(item: StoreItem) -> str | None:
+    """
+    Get the ETag of the stored version an item was read from or written as.
+
+    :param item: The item.
+    :type item: StoreItem
+    :return: The ETag or None if the item was not read from or written to a storage providing ETags.
+    :rtype: str | None
+    """
+    return getattr(item, ITEM_ETAG_ATTRIBUTE, None)
+
+
+def set_item_etag(item: StoreItem, etag: str | None) -> None:
+    """
+    Remember the ETag of the stored version of an item on the item, which is
+    not persisted.
+
+    :param item: The item.
+    :type item: StoreItem
+    :param etag: The ETag of the stored version.
+    :type etag: str | None
+    """
+    setattr(item, ITEM_ETAG_ATTRIBUTE, etag)
+
+
+def get_partition_key_value(key: str) -> str:
+    """
+    Get the partition key value of a storage key for containers which are not
+    partitioned by item id. Items of a conversation share the hash of the
+    conversation id and the chunks of a document share its digest.
+
+    :param key: The storage key.
+    :type key: str
+    :return: The partition key value.
+    :rtype: str
+    """
+    parts = key.split("/")
+    if len(parts) >= 3 and parts[1] == "conversations":
+        conversation_id = parts[2]
+    elif len(parts) >= 3 and parts[0] == "activities":
+        conversation_id = parts[1]
+    elif len(parts) >= 2 and parts[0] == "documents":
+        return parts[1]
+    else:
+        return key
+    return hashlib.sha256(conversation_id.encode("utf-8")).hexdigest()[:32]
+
+
+class CosmosDBMetadataStorage(CosmosDBStorage):
+    """
+    CosmosDBStorage which reports the ETag and the request charge of every item
+    it reads or writes. Callers pass a dictionary as `metadata` keyword, which
+    is filled with an `ItemMetadata` per key. Writes of items with a known ETag
+    are conditional and raise a `StorageConflictError` if the item was changed
+    by another writer in the meantime.
+
+    Read and written items remember the ETag of their stored version. Writing
+    an item which was read before is conditional on that ETag, even if the
+    caller passes no `etags`, e.g. when the turn state saves the conversation
+    state it loaded at the start of the turn.
+
+    Writes with `create_only` only create items which do not exist yet and
+    raise a `StorageConflictError` otherwise.
+
+    Items are written with the time to live of their key, which Cosmos DB counts
+    from the last write. Items read after a fraction of their time to live are
+    touched, so that items which are only read do not expire either.
+
+    The container is created with the configured partition key and without
+    indexing the stored documents, since all operations are point operations.
+    Existing containers keep their partition key, which can only be changed by
+    migrating to a new container.
+    """
+
+    def __init__(
+        self,
+        config: CosmosDBStorageConfig,
+        get_ttl: Callable[[str], int | None] = None,
+        ttl_refresh_ratio: float = 0.5,
+        partition_key_path: str = ID_PARTITION_KEY_PATH,
+        indexing_excluded_paths: list[str] = None,
+    ):
+        """
+        Initialize the CosmosDBMetadataStorage.
+
+        :param config: The configuration of the storage.
+        :type config: CosmosDBStorageConfig
+        :param get_ttl: The function returning the time to live of a key in seconds or None to keep items forever.
+        :type get_ttl: Callable[[str], int | None]
+        :param ttl_refresh_ratio: The fraction of the time to live after which read items are touched.
+        :type ttl_refresh_ratio: float
+        :param partition_key_path: The partition key path of new containers, either `/id` or a top-level property like `/partitionKey`.
+        :type partition_key_path: str
+        :param indexing_excluded_paths: The paths excluded from indexing.
+        :type indexing_excluded_paths: list[str]
+        """
+        super().__init__(config=config)
+        if partition_key_path != ID_PARTITION_KEY_PATH and (
+            not partition_key_path.startswith("/") or "/" in partition_key_path[1:]
+        ):
+            raise ValueError(
+                f"Partition key path '{partition_key_path}' must be '/id' or a top-level property."
+            )
+        self.get_ttl = get_ttl
+        self.ttl_refresh_ratio = ttl_refresh_ratio
+        self.partition_key_path = partition_key_path
+        self.indexing_excluded_paths = indexing_excluded_paths or []
+
+    def _get_item_ttl(self, key: str) -> int | None:
+        return self.get_ttl(key) if self.get_ttl else None
+
+    def _get_item_partition_key(self, key: str, escaped_key: str):
+        if self._compatability_mode_partition_key:
+            return NonePartitionKeyValue
+        if self.partition_key_path == ID_PARTITION_KEY_PATH:
+            return escaped_key
+        return get_partition_key_value(key)
+
+    def _record_request_charge(
+        self, operation: str, headers: Mapping[str, str]
+    ) -> float:
+        request_charge = get_request_charge(headers)
+        request_units_histogram.record(
+            request_charge,
+            attributes={
+                "operation": operation,
+                "container": self._config.container_id,
+            },
+        )
+        return request_charge
+
+    async def _create_container(self) -> None:
+        container_id = self._config.container_id
+        self._container = await self._database.create_container_if_not_exists(
+            id=container_id,
+            partition_key=PartitionKey(path=self.partition_key_path),
+            indexing_policy={
+                "indexingMode": "consistent",
+                "automatic": True,
+                "includedPaths": [{"path": "/*"}],
+                "excludedPaths": [
+                    {"path": path} for path in self.indexing_excluded_paths
+                ]
+                + [{"path": '/"_etag"/?'}],
+            },
+            default_ttl=-1 if self.get_ttl else None,
+            offer_throughput=self._config.container_throughput or None,
+        )
+
+        # Use partition key of existing containers
+        properties = await self._container.read()
+        partition_key = properties["partitionKey"]
+        if "/_partitionKey" in partition_key["paths"]:
+            self._compatability_mode_partition_key = True
+        elif partition_key["paths"][0] != self.partition_key_path:
+            logger.warning(
+                f"Container '{container_id}' is partitioned by '{partition_key['paths'][0]}' instead of '{self.partition_key_path}'. Changing the partition key requires a new container."
+            )
+            self.partition_key_path = partition_key["paths"][0]
+
+        # Update time to live and indexing policy of existing containers
+        indexing_policy = properties.get("indexingPolicy", {})
+        excluded_paths = indexing_policy.setdefault("excludedPaths", [])
+        missing_paths = [
+            path
+            for path in self.indexing_excluded_paths
+            if path not in {excluded_path["path"] for excluded_path in excluded_paths}
+        ]
+        enable_ttl = self.get_ttl is not None and properties.get("defaultTtl") is None
+        if missing_paths or enable_ttl:
+            logger.info(
+                f"Updating container '{container_id}' with excluded paths {missing_paths} and time to live {'enabled' if enable_ttl else 'unchanged'}."
+            )
+            excluded_paths.extend({"path": path} for path in missing_paths)
+            self._container = await self._database.replace_container(
+                self._container,
+                partition_key=PartitionKey(
+                    path=partition_key["paths"][0],
+                    kind=partition_key.get("kind", "Hash"),
+                    version=partition_key.get("version", 1),
+                ),
+                indexing_policy=indexing_policy,
+                default_ttl=-1 if enable_ttl else properties.get("defaultTtl"),
+            )
+
+    async def _refresh_ttl(self, key: str, response: dict) -> str | None:
+        # Return the ETag of the stored version, which changes if the item is touched
+        etag = response.get("_etag")
+        ttl_seconds = self._get_item_ttl(key)
+        if ttl_seconds is None:
+            return etag
+        age_seconds = time.time() - response.get("_ts", 0)
+        if response.get("ttl") == ttl_seconds and (
+            age_seconds < ttl_seconds * self.ttl_refresh_ratio
+        ):
+            return etag
+
+        escaped_key = self._sanitize(key)
+        headers = {}
+        try:
+            patched = await self._container.patch_item(
+                escaped_key,
+                self._get_item_partition_key(key, escaped_key),
+                patch_operations=[{"op": "set", "path": "/ttl", "value": ttl_seconds}],
+                etag=etag,
+                match_condition=MatchConditions.IfNotModified,
+                response_hook=lambda response_headers, _: headers.update(
+                    response_headers
+                ),
+            )
+        except cosmos_exceptions.CosmosHttpResponseError as e:
+            logger.info(f"Failed to refresh time to live of item '{key}': '{e}'")
+            return etag
+        self._record_request_charge("patch", headers)
+        return patched.get("_etag")
+
+    async def _read_item(
+        self,
+        key: str,
+        *,
+        target_cls: Type[StoreItemT] = None,
+        metadata: dict[str, ItemMetadata] = None,
+        **kwargs,
+    ) -> tuple[str | None, StoreItemT | None]:
+        if key == "":
+            raise ValueError(str(storage_errors.CosmosDbKeyCannotBeEmpty))
+
+        escaped_key = self._sanitize(key)
+        headers = {}
+        response = await ignore_error(
+            self._container.read_item(
+                escaped_key,
+                self._get_item_partition_key(key, escaped_key),
+                response_hook=lambda response_headers, _: headers.update(
+                    response_headers
+                ),
+            ),
+            cosmos_resource_not_found,
+        )
+        if response is None:
+            return None, None
+
+        request_charge = self._record_request_charge("read", headers)
+        etag = await self._refresh_ttl(key=key, response=response)
+        if metadata is not None:
+            metadata[key] = ItemMetadata(etag=etag, request_charge=request_charge)
+        item = target_cls.from_json_to_store_item(response.get("document"))
+        set_item_etag(item, etag)
+        return response["realId"], item
+
+    async def write(
+        self,
+        changes: dict[str, StoreItem],
+        *,
+        metadata: dict[str, ItemMetadata] = None,
+        etags: dict[str, str] = None,
+        create_only: bool = False,
+    ) -> None:
+        if not changes:
+            raise ValueError("Storage.write(): Changes are required when writing.")
+
+        await self.initialize()
+        await asyncio.gather(
+            *[
+                self._write_item(
+                    key,
+                    item,
+                    metadata=metadata,
+                    etag=(etags or {}).get(key),
+                    create_only=create_only,
+                )
+                for key, item in changes.items()
+            ]
+        )
+
+    async def _write_item(
+        self,
+        key: str,
+        item: StoreItem,
+        *,
+        metadata: dict[str, ItemMetadata] = None,
+        etag: str = None,
+        create_only: bool = False,
+    ) -> None:
+        if key == "":
+            raise ValueError(str(storage_errors.CosmosDbKeyCannotBeEmpty))
+
+        # Write conditionally on the version the item was read from
+        if not create_only:
+            etag = etag or get_item_etag(item)
+
+        escaped_key = self._sanitize(key)
+        body = {
+            "id": escaped_key,
+            "realId": key,
+            "document": item.store_item_to_json(),
+        }
+        if (
+            self.partition_key_path != ID_PARTITION_KEY_PATH
+            and not self._compatability_mode_partition_key
+        ):
+            body[self.partition_key_path[1:]] = get_partition_key_value(key)
+        ttl_seconds = self._get_item_ttl(key)
+        if ttl_seconds is not None:
+            body["ttl"] = ttl_seconds
+        headers = {}
+        try:
+            if create_only:
+                response = await self._container.create_item(
+                    body=body,
+                    response_hook=lambda response_headers, _: headers.update(
+                        response_headers
+                    ),
+                )
+            else:
+                response = await self._container.upsert_item(
+                    body=body,
+                    etag=etag,
+                    match_condition=MatchConditions.IfNotModified if etag else None,
+                    response_hook=lambda response_headers, _: headers.update(
+                        response_headers
+                    ),
+                )
+        except (
+            cosmos_exceptions.CosmosAccessConditionFailedError,
+            cosmos_exceptions.CosmosResourceExistsError,
+        ) as e:
+            raise StorageConflictError(key) from e
+
+        request_charge = self._record_request_charge("write", headers)
+        set_item_etag(item, response.get("_etag"))
+        if metadata is not None:
+            metadata[key] = ItemMetadata(
+                etag=response.get("_etag"),
+                request_charge=request_charge,
+            )
+
+    async def _delete_item(self, key: str) -> None:
+        if key == "":
+            raise ValueError(str(storage_errors.CosmosDbKeyCannotBeEmpty))
+
+        escaped_key = self._sanitize(key)
+        headers = {}
+        await ignore_error(
+            self._container.delete_item(
+                escaped_key,
+                self._get_item_partition_key(key, escaped_key),
+                response_hook=lambda response_headers, _: headers.update(
+                    response_headers
+                ),
+            ),
+            cosmos_resource_not_found,
+        )
+        self._record_request_charge("delete", headers)
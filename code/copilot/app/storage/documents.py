@@ -0,0 +1,180 @@
+import hashlib
+
+from app.core.executor import run_cpu_bound
+from app.core.settings import settings
+from app.files.codecs import compress_string, decompress_string
+from app.logs import setup_logging
+from app.models.documents import StoredDocument, StoredDocumentChunk
+from app.storage.factory import get_storage
+from microsoft_agents.hosting.core import Storage
+from opentelemetry import metrics
+
+logger = setup_logging(__name__)
+meter = metrics.get_meter(__name__)
+
+document_writes_counter = meter.create_counter(
+    name="copilot.document_store.writes",
+    unit="{document}",
+    description="Number of documents put into the document store.",
+)
+document_bytes_counter = meter.create_counter(
+    name="copilot.document_store.written_bytes",
+    unit="By",
+    description="Compressed bytes written to the document store.",
+)
+
+
+def encode_document(content: str) -> tuple[str, str]:
+    """
+    Hash and compress the content of a document.
+
+    :param content: The content of the document.
+    :type content: str
+    :return: A tuple containing the SHA-256 digest of the content and the compressed content.
+    :rtype: tuple[str, str]
+    """
+    digest = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    return digest, compress_string(content)
+
+
+class DocumentNotFoundError(ValueError):
+    """
+    Raised if a referenced document does not exist, e.g. after it expired.
+    """
+
+    def __init__(self, reference: str):
+        super().__init__(f"Document '{reference}' not found in document store.")
+        self.reference = reference
+
+
+class DocumentStore:
+    """
+    Content-addressed store for documents and indexes. Every document is stored
+    once under the digest of its content and referenced by that digest, so that
+    the conversation state only holds small references and identical uploads
+    are deduplicated. Compressed documents are split into chunks to stay below
+    the item size limit of Cosmos DB. Documents expire with the time to live of
+    the storage unless they are read.
+    """
+
+    def __init__(self, storage: Storage, chunk_size: int):
+        """
+        Initialize the DocumentStore.
+
+        :param storage: The storage persisting the documents.
+        :type storage: Storage
+        :param chunk_size: The maximum number of characters of the compressed document per stored item.
+        :type chunk_size: int
+        """
+        self.storage = storage
+        self.chunk_size = chunk_size
+
+    @staticmethod
+    def _get_key(digest: str) -> str:
+        return f"documents/{digest}"
+
+    @staticmethod
+    def _get_chunk_key(digest: str, index: int) -> str:
+        return f"documents/{digest}/{index}"
+
+    async def put(self, content: str) -> str:
+        """
+        Store a document unless a document with the same content already exists.
+
+        :param content: The content of the document.
+        :type content: str
+        :return: The reference of the stored document.
+        :rtype: str
+        """
+        digest, compressed = await run_cpu_bound(encode_document, content)
+        key = self._get_key(digest)
+
+        # Skip documents which are stored completely, reading them also restarts their time to live
+        result = await self.storage.read([key], target_cls=StoredDocument)
+        if key in result and await self._read_chunks(digest, result[key]) is not None:
+            logger.info(f"Document '{digest}' already exists in document store.")
+            document_writes_counter.add(1, attributes={"deduplicated": True})
+            return digest
+
+        # Write chunks before the manifest, so that readers never see partial documents
+        chunks = [
+            compressed[start : start + self.chunk_size]
+            for start in range(0, len(compressed), self.chunk_size)
+        ]
+        await self.storage.write(
+            {
+                self._get_chunk_key(digest, index): StoredDocumentChunk(data=chunk)
+                for index, chunk in enumerate(chunks)
+            }
+        )
+        await self.storage.write(
+            {
+                key: StoredDocument(
+                    digest=digest, chunk_count=len(chunks), size=len(compressed)
+                )
+            }
+        )
+        document_writes_counter.add(1, attributes={"deduplicated": False})
+        document_bytes_counter.add(len(compressed))
+        logger.info(
+            f"Stored document '{digest}' with {len(compressed)} compressed bytes in {len(chunks)} chunks."
+        )
+        return digest
+
+    async def get(self, reference: str) -> str | None:
+        """
+        Load a document from the store.
+
+        :param reference: The reference of the document.
+        :type reference: str
+        :return: The content of the document or None if the document does not exist.
+        :rtype: str | None
+        """
+        key = self._get_key(reference)
+        result = await self.storage.read([key], target_cls=StoredDocument)
+        if key not in result:
+            logger.warning(f"Document '{reference}' not found in document store.")
+            return None
+        compressed = await self._read_chunks(reference, result[key])
+        if compressed is None:
+            logger.warning(f"Document '{reference}' is incomplete in document store.")
+            return None
+        return await run_cpu_bound(decompress_string, compressed)
+
+    async def _read_chunks(
+        self, digest: str, stored_document: StoredDocument
+    ) -> str | None:
+        """
+        Read the chunks of a stored document.
+
+        :param digest: The digest of the document.
+        :type digest: str
+        :param stored_document: The manifest of the document.
+        :type stored_document: StoredDocument
+        :return: The compressed document or None if any chunk is missing.
+        :rtype: str | None
+        """
+        chunk_keys = [
+            self._get_chunk_key(digest, index)
+            for index in range(stored_document.chunk_count)
+        ]
+        chunks = await self.storage.read(chunk_keys, target_cls=StoredDocumentChunk)
+        if len(chunks) != len(chunk_keys):
+            return None
+        return "".join(chunks[chunk_key].data for chunk_key in chunk_keys)
+
+
+def create_document_store() -> DocumentStore:
+    """
+    Create the document store backed by the document container.
+
+    :return: The document store.
+    :rtype: DocumentStore
+    """
+    return DocumentStore(
+        storage=get_storage(
+            container_id=settings.AZURE_COSMOS_DOCUMENT_CONTAINER_ID,
+            local_subdirectory="documents",
+        ),
+        chunk_size=settings.DOCUMENT_STORE_CHUNK_SIZE_KB * 2**10,
+    )
@@ -0,0 +1,139 @@
+import os
+import time
+
+from app.core.clients import get_credential
+from app.core.settings import settings
+from app.logs import setup_logging
+from app.storage.cache import CachedStorage, get_uncached_storage
+from app.storage.cosmos import CosmosDBMetadataStorage
+from app.storage.instrumentation import InstrumentedStorage
+from app.storage.lifecycle import ExpiringStorage, get_ttl_seconds, storage_janitor
+from app.storage.local import LocalFileStorage
+from microsoft_agents.hosting.core import MemoryStorage, Storage, StoreItem
+from microsoft_agents.hosting.core.storage import AsyncStorageBase
+from microsoft_agents.storage.cosmos import CosmosDBStorageConfig
+
+logger = setup_logging(__name__)
+
+
+def get_storage(
+    container_id: str, local_subdirectory: str = "", cached: bool = False
+) -> Storage:
+    """
+    Create and return the storage for a Cosmos DB container. If Cosmos DB is not
+    configured, a local directory or memory is used instead.
+
+    :param container_id: The id of the Cosmos DB container.
+    :type container_id: str
+    :param local_subdirectory: The subdirectory of the local storage directory used instead of the container.
+    :type local_subdirectory: str
+    :param cached: Whether reads are served from an in-process cache in front of the storage.
+    :type cached: bool
+    :return: The storage instance.
+    :rtype: Storage
+    """
+    storage = _create_storage(
+        container_id=container_id, local_subdirectory=local_subdirectory
+    )
+    if settings.STORAGE_INSTRUMENTATION_ENABLED:
+        storage = InstrumentedStorage(
+            storage=storage,
+            name=container_id,
+            payload_sample_rate=settings.STORAGE_INSTRUMENTATION_PAYLOAD_SAMPLE_RATE,
+            compression_sample_rate=settings.STORAGE_INSTRUMENTATION_COMPRESSION_SAMPLE_RATE,
+        )
+    if cached:
+        logger.info(
+            f"Using storage cache with {settings.STORAGE_CACHE_SIZE_MB} MB and {settings.STORAGE_CACHE_TTL_SECONDS}s time to live."
+        )
+        return CachedStorage(
+            storage=storage,
+            max_size=settings.STORAGE_CACHE_SIZE_MB * 2**20,
+            ttl_seconds=settings.STORAGE_CACHE_TTL_SECONDS,
+            bypass=is_conversation_state_key,
+        )
+    return storage
+
+
+def is_conversation_state_key(key: str) -> bool:
+    """
+    Check whether a key stores the conversation state, which is loaded at the
+    start of every turn and must reflect the turns of all replicas, e.g. the
+    last response id passed to the model.
+
+    :param key: The storage key.
+    :type key: str
+    :return: True if the key stores the conversation state.
+    :rtype: bool
+    """
+    return key.split("/")[1:2] == ["conversations"]
+
+
+def _create_storage(container_id: str, local_subdirectory: str) -> Storage:
+    get_ttl = get_ttl_seconds if settings.STORAGE_TTL_ENABLED else None
+    if settings.AZURE_COSMOS_ENDPOINT:
+        logger.info(f"Using Cosmos DB storage with container '{container_id}'.")
+        if settings.AZURE_COSMOS_KEY:
+            auth_key = settings.AZURE_COSMOS_KEY
+            credential = None
+            url = ""
+        else:
+            auth_key = "UNDEFINED"
+            credential = get_credential(settings.MANAGED_IDENTITY_CLIENT_ID)
+            url = settings.AZURE_COSMOS_ENDPOINT
+        logger.info(f"Credential: {credential}")
+        return CosmosDBMetadataStorage(
+            config=CosmosDBStorageConfig(
+                cosmos_db_endpoint=settings.AZURE_COSMOS_ENDPOINT,
+                auth_key=auth_key,
+                database_id=settings.AZURE_COSMOS_DATABASE_ID,
+                container_id=container_id,
+                cosmos_client_options=None,
+                container_throughput=0,
+                key_suffix="",
+                compatibility_mode=False,
+                url=url,
+                credential=credential,
+            ),
+            get_ttl=get_ttl,
+            ttl_refresh_ratio=settings.STORAGE_TTL_REFRESH_RATIO,
+            partition_key_path=settings.AZURE_COSMOS_PARTITION_KEY_PATH,
+            indexing_excluded_paths=settings.AZURE_COSMOS_INDEXING_EXCLUDED_PATHS,
+        )
+
+    if settings.LOCAL_STORAGE_DIRECTORY:
+        storage = LocalFileStorage(
+            directory=os.path.join(settings.LOCAL_STORAGE_DIRECTORY, local_subdirectory)
+        )
+    else:
+        logger.info("Using memory storage.")
+        storage = MemoryStorage()
+
+    # Expire items in backends without native time to live
+    if get_ttl is not None:
+        storage = ExpiringStorage(storage=storage, get_ttl=get_ttl)
+        storage_janitor.register(storage)
+    return storage
+
+
+async def warm_up_storage(storage: Storage, name: str) -> None:
+    """
+    Initialize a storage before the first turn. For Cosmos DB, this creates the
+    client connection, resolves database and container including the partition
+    key metadata and primes the routing map with a point read. If the storage
+    is unavailable, it is initialized again on first use.
+
+    :param storage: The storage to warm up.
+    :type storage: Storage
+    :param name: The name of the storage used for logging.
+    :type name: str
+    :raises Exception: If the storage is unavailable.
+    """
+    start_time = time.perf_counter()
+    inner_storage = get_uncached_storage(storage)
+    if isinstance(inner_storage, InstrumentedStorage):
+        inner_storage = inner_storage.storage
+    if isinstance(inner_storage, AsyncStorageBase):
+        await inner_storage.initialize()
+    await inner_storage.read(["warmup"], target_cls=StoreItem)
+    logger.info(f"Warmed up {name} storage in {time.perf_counter() - start_time:.2f}s.")
@@ -0,0 +1,258 @@
+import json
+import random
+import time
+from typing import Type, TypeVar
+
+from app.core.executor import run_cpu_bound
+from app.files.codecs import compress_bytes
+from app.logs import setup_logging
+from app.models.storage import ItemMetadata
+from app.storage.cosmos import CosmosDBMetadataStorage
+from microsoft_agents.hosting.core import Storage, StoreItem
+from opentelemetry import metrics, trace
+
+logger = setup_logging(__name__)
+meter = metrics.get_meter(__name__)
+tracer = trace.get_tracer(__name__)
+
+storage_duration_histogram = meter.create_histogram(
+    name="copilot.storage.duration",
+    unit="s",
+    description="Duration of storage operations by storage, operation and outcome.",
+)
+storage_payload_size_histogram = meter.create_histogram(
+    name="copilot.storage.payload_size",
+    unit="By",
+    description="Size of the serialized items read from or written to the storage by item type and encoding (raw or compressed).",
+)
+storage_keys_histogram = meter.create_histogram(
+    name="copilot.storage.keys",
+    unit="{key}",
+    description="Number of keys per storage operation.",
+)
+
+StoreItemT = TypeVar("StoreItemT", bound=StoreItem)
+
+ITEM_TYPES = {"documents", "activities", "jobs"}
+
+
+def get_item_type(key: str) -> str:
+    """
+    Get the type of an item derived from its key, which keeps the cardinality
+    of metric attributes bounded.
+
+    :param key: The storage key.
+    :type key: str
+    :return: The item type.
+    :rtype: str
+    """
+    prefix = key.split("/", 1)[0]
+    return prefix if prefix in ITEM_TYPES else "state"
+
+
+def get_payload_size(item: StoreItem) -> int:
+    """
+    Get the size of an item serialized as JSON, which approximates the size of
+    the item in Cosmos DB.
+
+    :param item: The item.
+    :type item: StoreItem
+    :return: The size in bytes.
+    :rtype: int
+    """
+    return len(
+        json.dumps(item.store_item_to_json(), separators=(",", ":")).encode("utf-8")
+    )
+
+
+def get_compressed_size(item: StoreItem) -> int:
+    """
+    Get the size of an item serialized as JSON and compressed with the configured
+    codec, which shows the potential savings of compressing the item.
+
+    :param item: The item.
+    :type item: StoreItem
+    :return: The size in bytes.
+    :rtype: int
+    """
+    data = json.dumps(item.store_item_to_json(), separators=(",", ":"))
+    return len(compress_bytes(data.encode("utf-8")))
+
+
+class InstrumentedStorage(Storage):
+    """
+    Storage which records the duration, request charge and number of keys of
+    every operation of another storage as metrics and as attributes of a span.
+    Payload sizes are measured for a sample of items outside of the operation
+    duration, since serializing every item again on the event loop would cost
+    about as much as the operation itself. The compressed size is measured for
+    a sample of writes in the CPU executor.
+    """
+
+    def __init__(
+        self,
+        storage: Storage,
+        name: str,
+        payload_sample_rate: float,
+        compression_sample_rate: float,
+    ):
+        """
+        Initialize the InstrumentedStorage.
+
+        :param storage: The storage to instrument.
+        :type storage: Storage
+        :param name: The name of the storage used for metrics and spans, e.g. the container id.
+        :type name: str
+        :param payload_sample_rate: The fraction of read and written items whose serialized size is measured.
+        :type payload_sample_rate: float
+        :param compression_sample_rate: The fraction of written items whose compressed size is measured.
+        :type compression_sample_rate: float
+        """
+        self.storage = storage
+        self.name = name
+        self.payload_sample_rate = payload_sample_rate
+        self.compression_sample_rate = compression_sample_rate
+
+    @property
+    def supports_metadata(self) -> bool:
+        """
+        Whether the storage accepts the `metadata` and `etags` keywords of the
+        CosmosDBMetadataStorage.
+        """
+        return isinstance(self.storage, CosmosDBMetadataStorage)
+
+    def _record(
+        self,
+        span: trace.Span,
+        operation: str,
+        keys: list[str],
+        start_time: float,
+        outcome: str,
+        metadata: dict[str, ItemMetadata] = None,
+    ) -> None:
+        attributes = {"storage": self.name, "operation": operation}
+        storage_duration_histogram.record(
+            time.perf_counter() - start_time,
+            attributes={**attributes, "outcome": outcome},
+        )
+        storage_keys_histogram.record(len(keys), attributes=attributes)
+        span.set_attributes(
+            {
+                "storage.name": self.name,
+                "storage.operation": operation,
+                "storage.keys": len(keys),
+                "storage.item_types": sorted({get_item_type(key) for key in keys}),
+                "storage.outcome": outcome,
+                "storage.request_charge": sum(
+                    item_metadata.request_charge
+                    for item_metadata in (metadata or {}).values()
+                ),
+            }
+        )
+
+    def _record_payload_size(
+        self, operation: str, key: str, size: int, encoding: str
+    ) -> None:
+        storage_payload_size_histogram.record(
+            size,
+            attributes={
+                "storage": self.name,
+                "operation": operation,
+                "item_type": get_item_type(key),
+                "encoding": encoding,
+            },
+        )
+
+    async def _record_payload_sizes(
+        self, span: trace.Span, operation: str, items: dict[str, StoreItem]
+    ) -> None:
+        raw_size = 0
+        for key in items:
+            if random.random() < self.payload_sample_rate:
+                size = get_payload_size(items[key])
+                self._record_payload_size(operation, key, size, encoding="raw")
+                raw_size += size
+        span.set_attribute("storage.raw_bytes_sampled", raw_size)
+
+        if operation != "write":
+            return
+        sampled_keys = [
+            key for key in items if random.random() < self.compression_sample_rate
+        ]
+        if not sampled_keys:
+            return
+        try:
+            compressed_size = 0
+            for key in sampled_keys:
+                size = await run_cpu_bound(get_compressed_size, items[key])
+                self._record_payload_size(operation, key, size, encoding="compressed")
+                compressed_size += size
+        except Exception as e:
+            logger.debug(f"Failed to measure compressed size of items: '{e}'")
+            return
+        span.set_attribute("storage.compressed_bytes_sampled", compressed_size)
+
+    async def read(
+        self, keys: list[str], *, target_cls: Type[StoreItemT] = None, **kwargs
+    ) -> dict[str, StoreItemT]:
+        if self.supports_metadata:
+            kwargs.setdefault("metadata", {})
+        with tracer.start_as_current_span("storage.read") as span:
+            start_time = time.perf_counter()
+            outcome = "error"
+            try:
+                items = await self.storage.read(keys, target_cls=target_cls, **kwargs)
+                outcome = "success"
+            finally:
+                self._record(
+                    span=span,
+                    operation="read",
+                    keys=keys,
+                    start_time=start_time,
+                    outcome=outcome,
+                    metadata=kwargs.get("metadata"),
+                )
+            # Measure payloads outside of the operation duration
+            span.set_attribute("storage.items", len(items))
+            await self._record_payload_sizes(span=span, operation="read", items=items)
+            return items
+
+    async def write(self, changes: dict[str, StoreItem], **kwargs) -> None:
+        if self.supports_metadata:
+            kwargs.setdefault("metadata", {})
+        else:
+            kwargs = {}
+        with tracer.start_as_current_span("storage.write") as span:
+            start_time = time.perf_counter()
+            outcome = "error"
+            try:
+                await self.storage.write(changes, **kwargs)
+                outcome = "success"
+            finally:
+                self._record(
+                    span=span,
+                    operation="write",
+                    keys=list(changes),
+                    start_time=start_time,
+                    outcome=outcome,
+                    metadata=kwargs.get("metadata"),
+                )
+            await self._record_payload_sizes(
+                span=span, operation="write", items=changes
+            )
+
+    async def delete(self, keys: list[str]) -> None:
+        with tracer.start_as_current_span("storage.delete") as span:
+            start_time = time.perf_counter()
+            outcome = "error"
+            try:
+                await self.storage.delete(keys)
+                outcome = "success"
+            finally:
+                self._record(
+                    span=span,
+                    operation="delete",
+                    keys=keys,
+                    start_time=start_time,
+                    outcome=outcome,
+                )
@@ -0,0 +1,206 @@
+import asyncio
+import time
+from typing import Callable, Type, TypeVar
+
+from app.core.settings import settings
+from app.logs import setup_logging
+from app.storage.local import LocalFileStorage
+from microsoft_agents.hosting.core import Storage, StoreItem
+from opentelemetry import metrics
+
+logger = setup_logging(__name__)
+meter = metrics.get_meter(__name__)
+
+expired_items_counter = meter.create_counter(
+    name="copilot.storage.expired",
+    unit="{item}",
+    description="Number of items removed by the storage janitor after their time to live.",
+)
+
+StoreItemT = TypeVar("StoreItemT", bound=StoreItem)
+
+
+def get_ttl_seconds(key: str) -> int | None:
+    """
+    Get the time to live of an item by the type of item derived from its key.
+    The time to live restarts whenever the item is written or read.
+
+    :param key: The storage key.
+    :type key: str
+    :return: The time to live in seconds or None if the item does not expire.
+    :rtype: int | None
+    """
+    if not settings.STORAGE_TTL_ENABLED:
+        return None
+    match key.split("/", 1)[0]:
+        case "documents":
+            ttl_seconds = settings.STORAGE_TTL_DOCUMENT_SECONDS
+        case "activities":
+            ttl_seconds = int(settings.IDEMPOTENCY_TTL_SECONDS)
+        case "jobs":
+            ttl_seconds = settings.STORAGE_TTL_JOB_SECONDS
+        case _:
+            ttl_seconds = settings.STORAGE_TTL_STATE_SECONDS
+    return ttl_seconds if ttl_seconds > 0 else None
+
+
+class ExpiringStorage(Storage):
+    """
+    Storage which expires items of another storage without native time to live,
+    e.g. memory or local files. Expiry times slide with every read and write,
+    expired items are removed when they are read or by the storage janitor.
+    Local files persist their expiry as modification time, which is set on every
+    write and touched on every read, so that items written before a restart
+    still expire. Memory items do not outlive the process, so their expiry
+    times are tracked in memory.
+    """
+
+    def __init__(self, storage: Storage, get_ttl: Callable[[str], int | None]):
+        """
+        Initialize the ExpiringStorage.
+
+        :param storage: The storage persisting the items.
+        :type storage: Storage
+        :param get_ttl: The function returning the time to live of a key in seconds.
+        :type get_ttl: Callable[[str], int | None]
+        """
+        self.storage = storage
+        self.get_ttl = get_ttl
+        self._expires_at: dict[str, float] = {}
+
+    @property
+    def persists_expiry(self) -> bool:
+        return isinstance(self.storage, LocalFileStorage)
+
+    def _touch(self, key: str) -> None:
+        ttl_seconds = self.get_ttl(key)
+        if ttl_seconds is None:
+            self._expires_at.pop(key, None)
+        else:
+            self._expires_at[key] = time.time() + ttl_seconds
+
+    async def _get_expired_keys(self, keys: list[str] = None) -> list[str]:
+        """
+        Get the keys of expired items.
+
+        :param keys: The keys to check or None for all items of the storage.
+        :type keys: list[str]
+        :return: The keys of expired items.
+        :rtype: list[str]
+        """
+        now = time.time()
+        if self.persists_expiry:
+            expired_keys = []
+            for key, modified_time in (
+                await self.storage.get_modified_times(keys)
+            ).items():
+                ttl_seconds = self.get_ttl(key)
+                if ttl_seconds is not None and modified_time + ttl_seconds <= now:
+                    expired_keys.append(key)
+            return expired_keys
+        return [
+            key
+            for key in (list(self._expires_at) if keys is None else keys)
+            if self._expires_at.get(key, now + 1) <= now
+        ]
+
+    async def read(
+        self, keys: list[str], *, target_cls: Type[StoreItemT] = None, **kwargs
+    ) -> dict[str, StoreItemT]:
+        expired_keys = await self._get_expired_keys(keys)
+        if expired_keys:
+            await self.delete(expired_keys)
+            expired_items_counter.add(len(expired_keys))
+        items = await self.storage.read(keys, target_cls=target_cls, **kwargs)
+        if self.persists_expiry:
+            if items:
+                await self.storage.touch(list(items))
+        else:
+            for key in items:
+                self._touch(key)
+        return items
+
+    async def write(self, changes: dict[str, StoreItem]) -> None:
+        await self.storage.write(changes)
+        if not self.persists_expiry:
+            for key in changes:
+                self._touch(key)
+
+    async def delete(self, keys: list[str]) -> None:
+        await self.storage.delete(keys)
+        for key in keys:
+            self._expires_at.pop(key, None)
+
+    async def purge_expired(self) -> int:
+        """
+        Delete all expired items of the storage.
+
+        :return: The number of deleted items.
+        :rtype: int
+        """
+        expired_keys = await self._get_expired_keys()
+        if expired_keys:
+            await self.delete(expired_keys)
+            expired_items_counter.add(len(expired_keys))
+        return len(expired_keys)
+
+
+class StorageJanitor:
+    """
+    Background task which periodically deletes expired items from storages
+    without native time to live.
+    """
+
+    def __init__(self, interval_seconds: float):
+        """
+        Initialize the StorageJanitor.
+
+        :param interval_seconds: The interval between two runs.
+        :type interval_seconds: float
+        """
+        self.interval_seconds = interval_seconds
+        self.storages: list[ExpiringStorage] = []
+        self._task: asyncio.Task | None = None
+
+    def register(self, storage: ExpiringStorage) -> None:
+        """
+        Register a storage whose expired items are deleted.
+
+        :param storage: The storage.
+        :type storage: ExpiringStorage
+        """
+        self.storages.append(storage)
+
+    def start(self) -> None:
+        """
+        Start the janitor on the running event loop if any storage is registered.
+        """
+        if self._task is None and self.storages:
+            self._task = asyncio.create_task(self._run(), name="storage-janitor")
+
+    async def stop(self) -> None:
+        """
+        Stop the janitor.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            for storage in self.storages:
+                try:
+                    count = await storage.purge_expired()
+                except Exception as e:
+                    logger.warning(f"Failed to delete expired items: '{e}'")
+                    continue
+                if count:
+                    logger.info(f"Deleted {count} expired items from storage.")
+
+
+# Initialize storage janitor
+storage_janitor = StorageJanitor(
+    interval_seconds=settings.STORAGE_JANITOR_INTERVAL_SECONDS
+)
@@ -0,0 +1,154 @@
+import asyncio
+import json
+import os
+from pathlib import Path
+from typing import Type, TypeVar
+from urllib.parse import quote, unquote
+
+from app.logs import setup_logging
+from microsoft_agents.hosting.core import Storage, StoreItem
+
+logger = setup_logging(__name__)
+
+StoreItemT = TypeVar("StoreItemT", bound=StoreItem)
+
+
+class LocalFileStorage(Storage):
+    """
+    Storage which persists every item as JSON file in a local directory. It is
+    used as stand-in for Cosmos DB during local development, so that state and
+    background jobs survive a restart of the application.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Initialize the LocalFileStorage.
+
+        :param directory: The directory in which items are stored.
+        :type directory: str
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = asyncio.Lock()
+        logger.info(f"Using local file storage in directory '{self.directory}'.")
+
+    def _get_path(self, key: str) -> Path:
+        """
+        Get the file path of a key.
+
+        :param key: The storage key.
+        :type key: str
+        :return: The path of the file storing the item.
+        :rtype: Path
+        """
+        if not key:
+            raise ValueError("LocalFileStorage: key cannot be empty")
+        return self.directory / f"{quote(key, safe='')}.json"
+
+    def _get_key(self, path: Path) -> str:
+        """
+        Get the key of a file path.
+
+        :param path: The path of the file storing the item.
+        :type path: Path
+        :return: The storage key.
+        :rtype: str
+        """
+        return unquote(path.name.removesuffix(".json"))
+
+    @staticmethod
+    def _get_modified_time(path: Path) -> float | None:
+        try:
+            return path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _touch_file(path: Path) -> None:
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _read_file(path: Path) -> dict | None:
+        if not path.exists():
+            return None
+        with path.open("r", encoding="utf-8") as file:
+            return json.load(file)
+
+    @staticmethod
+    def _write_file(path: Path, data: dict) -> None:
+        temporary_path = path.with_suffix(".tmp")
+        with temporary_path.open("w", encoding="utf-8") as file:
+            json.dump(data, file, separators=(",", ":"))
+        os.replace(temporary_path, path)
+
+    async def read(
+        self, keys: list[str], *, target_cls: Type[StoreItemT] = None, **kwargs
+    ) -> dict[str, StoreItemT]:
+        if not keys:
+            raise ValueError("Storage.read(): Keys are required when reading.")
+        if not target_cls:
+            raise ValueError("Storage.read(): target_cls cannot be None.")
+
+        result: dict[str, StoreItemT] = {}
+        async with self._lock:
+            for key in keys:
+                data = await asyncio.to_thread(self._read_file, self._get_path(key))
+                if data is not None:
+                    result[key] = target_cls.from_json_to_store_item(data)
+        return result
+
+    async def write(self, changes: dict[str, StoreItem]) -> None:
+        if not changes:
+            raise ValueError("LocalFileStorage.write(): changes cannot be None")
+
+        async with self._lock:
+            for key, value in changes.items():
+                await asyncio.to_thread(
+                    self._write_file, self._get_path(key), value.store_item_to_json()
+                )
+
+    async def delete(self, keys: list[str]) -> None:
+        if not keys:
+            raise ValueError("Storage.delete(): Keys are required when deleting.")
+
+        async with self._lock:
+            for key in keys:
+                await asyncio.to_thread(self._get_path(key).unlink, missing_ok=True)
+
+    async def get_modified_times(self, keys: list[str] = None) -> dict[str, float]:
+        """
+        Get the time at which items were last written or touched, which persists
+        across restarts of the application.
+
+        :param keys: The keys of the items or None for all items.
+        :type keys: list[str]
+        :return: The modification times as Unix timestamps by key of existing items.
+        :rtype: dict[str, float]
+        """
+        async with self._lock:
+            if keys is None:
+                paths = await asyncio.to_thread(
+                    lambda: list(self.directory.glob("*.json"))
+                )
+            else:
+                paths = [self._get_path(key) for key in keys]
+            modified_times = {}
+            for path in paths:
+                modified_time = await asyncio.to_thread(self._get_modified_time, path)
+                if modified_time is not None:
+                    modified_times[self._get_key(path)] = modified_time
+        return modified_times
+
+    async def touch(self, keys: list[str]) -> None:
+        """
+        Set the modification time of existing items to the current time.
+
+        :param keys: The keys of the items.
+        :type keys: list[str]
+        """
+        async with self._lock:
+            for key in keys:
+                await asyncio.to_thread(self._touch_file, self._get_path(key))
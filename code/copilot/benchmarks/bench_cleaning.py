@@ -0,0 +1,288 @@
+"""
+Benchmark of the Document Intelligence result cleaning.
+
+Compares the previous implementation, which deep copies the SDK model with
+`as_dict()` and deletes spans, bounding regions and elements in place, with the
+projection-based implementation, which reads only the kept fields from the SDK
+model. Peak memory is measured with tracemalloc, CPU time in a separate run
+without tracing.
+
+Run from `code/copilot` with the application environment configured:
+
+    uv run python -m benchmarks.bench_cleaning --pages 1000
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import time
+import tracemalloc
+from typing import Callable
+
+from app.files.extraction import FileExtractionClient
+from app.files.projection import project_analyze_result
+from azure.ai.documentintelligence._model_base import _deserialize
+from azure.ai.documentintelligence.models import AnalyzeResult
+
+WORDS_PER_LINE = 12
+LINES_PER_PARAGRAPH = 3
+PARAGRAPHS_PER_PAGE = 12
+TABLE_EVERY_PAGES = 4
+TABLE_ROWS = 10
+TABLE_COLUMNS = 4
+
+
+def _polygon() -> list[float]:
+    return [1.0, 1.0, 2.0, 1.0, 2.0, 2.0, 1.0, 2.0]
+
+
+def _region(page_number: int) -> list[dict]:
+    return [{"pageNumber": page_number, "polygon": _polygon()}]
+
+
+def generate_result(pages: int) -> dict:
+    """
+    Generate a raw layout result with a structure similar to Document Intelligence.
+
+    :param pages: The number of pages.
+    :type pages: int
+    :return: The raw result as dictionary.
+    :rtype: dict
+    """
+    content_parts = []
+    offset = 0
+    result_pages, paragraphs, tables = [], [], []
+
+    def append(text: str) -> dict:
+        nonlocal offset
+        span = {"offset": offset, "length": len(text)}
+        content_parts.append(text + "\n\n")
+        offset += len(text) + 2
+        return span
+
+    for page_number in range(1, pages + 1):
+        page_start = offset
+        words, lines = [], []
+
+        span = append(f'<!-- PageHeader="Contoso Ltd. Page {page_number}" -->')
+        paragraphs.append(
+            {
+                "role": "pageHeader",
+                "content": f"Contoso Ltd. Page {page_number}",
+                "spans": [span],
+                "boundingRegions": _region(page_number),
+            }
+        )
+
+        for paragraph_index in range(PARAGRAPHS_PER_PAGE):
+            text_lines = [
+                " ".join(
+                    f"word{page_number}_{paragraph_index}_{line_index}_{word_index}"
+                    for word_index in range(WORDS_PER_LINE)
+                )
+                for line_index in range(LINES_PER_PARAGRAPH)
+            ]
+            text = " ".join(text_lines)
+            span = append(text)
+            paragraphs.append(
+                {
+                    "content": text,
+                    "spans": [span],
+                    "boundingRegions": _region(page_number),
+                }
+            )
+            for line in text_lines:
+                lines.append({"content": line, "polygon": _polygon(), "spans": [span]})
+                words.extend(
+                    {
+                        "content": word,
+                        "polygon": _polygon(),
+                        "confidence": 0.99,
+                        "span": {"offset": span["offset"], "length": len(word)},
+                    }
+                    for word in line.split()
+                )
+
+        if page_number % TABLE_EVERY_PAGES == 0:
+            cells = []
+            for row_index in range(TABLE_ROWS):
+                for column_index in range(TABLE_COLUMNS):
+                    span = append(f"cell {row_index} {column_index}")
+                    cells.append(
+                        {
+                            "kind": "columnHeader" if row_index == 0 else "content",
+                            "rowIndex": row_index,
+                            "columnIndex": column_index,
+                            "content": f"cell {row_index} {column_index}",
+                            "boundingRegions": _region(page_number),
+                            "spans": [span],
+                            "elements": [f"/paragraphs/{len(paragraphs) - 1}"],
+                        }
+                    )
+            tables.append(
+                {
+                    "rowCount": TABLE_ROWS,
+                    "columnCount": TABLE_COLUMNS,
+                    "cells": cells,
+                    "boundingRegions": _region(page_number),
+                    "spans": [{"offset": page_start, "length": offset - page_start}],
+                    "caption": {
+                        "content": f"Table on page {page_number}",
+                        "boundingRegions": _region(page_number),
+                        "spans": [{"offset": page_start, "length": 1}],
+                        "elements": [f"/paragraphs/{len(paragraphs) - 1}"],
+                    },
+                }
+            )
+
+        if page_number < pages:
+            append("<!-- PageBreak -->")
+
+        result_pages.append(
+            {
+                "pageNumber": page_number,
+                "width": 8.5,
+                "height": 11,
+                "unit": "inch",
+                "spans": [{"offset": page_start, "length": offset - page_start}],
+                "words": words,
+                "lines": lines,
+            }
+        )
+
+    return {
+        "apiVersion": "2024-11-30",
+        "modelId": "prebuilt-layout",
+        "contentFormat": "markdown",
+        "content": "".join(content_parts),
+        "pages": result_pages,
+        "paragraphs": paragraphs,
+        "tables": tables,
+    }
+
+
+def legacy_clean(
+    result: AnalyzeResult, keep_paragraphs: bool, keep_tables: bool
+) -> str:
+    """
+    Previous implementation of the cleaning, kept as reference for the benchmark.
+    """
+    data = result.as_dict()
+    cleaned_data = {}
+    cleaned_data["content"] = data.get("content", "")
+
+    if keep_paragraphs:
+        data_paragraphs = data.get("paragraphs", [])
+        for paragraph in data_paragraphs:
+            if "spans" in paragraph:
+                del paragraph["spans"]
+            if "boundingRegions" in paragraph:
+                paragraph["pageNumber"] = paragraph["boundingRegions"][0]["pageNumber"]
+                del paragraph["boundingRegions"]
+        cleaned_data["paragraphs"] = data_paragraphs
+
+    if keep_tables:
+        data_tables = data.get("tables", [])
+        for table in data_tables:
+            if "boundingRegions" in table:
+                table["pageNumber"] = table["boundingRegions"][0]["pageNumber"]
+                del table["boundingRegions"]
+            if "spans" in table:
+                del table["spans"]
+            if "caption" in table:
+                del table["caption"]["spans"]
+                del table["caption"]["elements"]
+            for cell in table.get("cells", []):
+                if "spans" in cell:
+                    del cell["spans"]
+                if "elements" in cell:
+                    del cell["elements"]
+                if "boundingRegions" in cell:
+                    del cell["boundingRegions"]
+        cleaned_data["tables"] = data_tables
+
+    return json.dumps(cleaned_data, separators=(",", ":"))
+
+
+def projection_clean(
+    result: AnalyzeResult, keep_paragraphs: bool, keep_tables: bool
+) -> str:
+    """
+    Current implementation of the cleaning based on the projection of the SDK model.
+    """
+    data = project_analyze_result(result, keep_paragraphs=keep_paragraphs)
+    cleaned_data, _ = asyncio.run(
+        FileExtractionClient.clean_extracted_data(
+            None,
+            data=data,
+            keep_paragraphs=keep_paragraphs,
+            keep_tables=keep_tables,
+            summarize_tables=False,
+            api_key="",
+            endpoint="",
+            model_name="",
+            instructions="",
+        )
+    )
+    return cleaned_data
+
+
+def measure(
+    function: Callable[..., str], result: AnalyzeResult, repeat: int, **kwargs
+) -> tuple[float, float, int]:
+    """
+    Measure CPU time, wall time and peak memory of a cleaning implementation.
+
+    :return: A tuple containing the best CPU seconds, the best wall seconds and the peak memory in bytes.
+    :rtype: tuple[float, float, int]
+    """
+    cpu_times, wall_times = [], []
+    for _ in range(repeat):
+        gc.collect()
+        cpu_start, wall_start = time.process_time(), time.perf_counter()
+        function(result, **kwargs)
+        cpu_times.append(time.process_time() - cpu_start)
+        wall_times.append(time.perf_counter() - wall_start)
+
+    gc.collect()
+    tracemalloc.start()
+    function(result, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return min(cpu_times), min(wall_times), peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"Generating layout result with {args.pages} pages ...")
+    result = _deserialize(AnalyzeResult, generate_result(args.pages))
+
+    print(
+        f"{'configuration':<28} {'implementation':<12} {'cpu [s]':>8} {'wall [s]':>9} {'peak [MB]':>10}"
+    )
+    for keep_paragraphs, keep_tables in ((False, False), (True, True)):
+        configuration = f"paragraphs={keep_paragraphs} tables={keep_tables}"
+        for name, function in (
+            ("legacy", legacy_clean),
+            ("projection", projection_clean),
+        ):
+            cpu, wall, peak = measure(
+                function,
+                result,
+                repeat=args.repeat,
+                keep_paragraphs=keep_paragraphs,
+                keep_tables=keep_tables,
+            )
+            print(
+                f"{configuration:<28} {name:<12} {cpu:>8.3f} {wall:>9.3f} {peak / 2**20:>10.1f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
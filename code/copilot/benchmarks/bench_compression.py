@@ -0,0 +1,234 @@
+"""
+Benchmark of the compression codecs for stored document payloads.
+
+Compresses extracted documents with every codec and level and reports the
+ratio of the stored base64 string, the ratio of the binary payload and the
+compress and decompress throughput relative to the uncompressed size. Documents
+are generated with a structure similar to Document Intelligence markdown
+(headings, page headers and footers, page breaks and HTML tables) or loaded
+from a directory of extracted documents. Page-sized payloads are benchmarked
+with and without a zstd dictionary trained on pages of other documents.
+
+Run from `code/copilot` with the application environment configured:
+
+    uv run python -m benchmarks.bench_compression --pages 500
+    uv run python -m benchmarks.bench_compression --input ./extracted --write-dictionary ./zstd.dict
+"""
+
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+
+from app.files.codecs import (
+    Codec,
+    compress_string,
+    create_codec,
+    decompress_string,
+    train_zstd_dictionary,
+)
+from app.files.extraction import FileExtractionClient
+from app.models.core import CompressionCodec
+
+CODECS = [
+    (CompressionCodec.NONE, None),
+    (CompressionCodec.ZLIB, 1),
+    (CompressionCodec.ZLIB, 6),
+    (CompressionCodec.ZLIB, 9),
+    (CompressionCodec.ZSTD, 1),
+    (CompressionCodec.ZSTD, 3),
+    (CompressionCodec.ZSTD, 9),
+    (CompressionCodec.ZSTD, 19),
+    (CompressionCodec.LZ4, 0),
+    (CompressionCodec.LZ4, 9),
+]
+DICTIONARY_SIZE = 112 * 2**10
+PARAGRAPHS_PER_PAGE = 6
+TABLE_EVERY_PAGES = 3
+
+WORDS = (
+    "the property parcel lot block tract grantor grantee deed easement recorded "
+    "county official records book page feet thence north south east west degrees "
+    "minutes seconds along line point beginning described following agreement "
+    "party parties shall provided herein thereof pursuant section subject title "
+    "insurance policy exception schedule mortgage lien assessment tax survey "
+    "boundary right way access utility reserved premises owner association "
+    "covenant restriction amendment exhibit attached legal description commitment"
+).split()
+
+
+def generate_document(pages: int, seed: int) -> list[str]:
+    """
+    Generate the markdown pages of an extracted document.
+
+    :param pages: The number of pages.
+    :type pages: int
+    :param seed: The seed of the random text.
+    :type seed: int
+    :return: The markdown content of every page.
+    :rtype: list[str]
+    """
+    generator = random.Random(seed)
+    weights = [1 / rank for rank in range(1, len(WORDS) + 1)]
+
+    def sentence() -> str:
+        words = generator.choices(WORDS, weights=weights, k=generator.randint(8, 24))
+        number = f" {generator.randint(1, 9999)}" if generator.random() < 0.5 else ""
+        return " ".join(words).capitalize() + number + "."
+
+    content_pages = []
+    for page_number in range(1, pages + 1):
+        parts = [f'<!-- PageHeader="Title Commitment No. {seed:06d}" -->']
+        if page_number % 4 == 1:
+            parts.append(f"## {page_number // 4 + 1}. {sentence()[:40].rstrip('.')}")
+        for _ in range(PARAGRAPHS_PER_PAGE):
+            parts.append(" ".join(sentence() for _ in range(generator.randint(2, 5))))
+        if page_number % TABLE_EVERY_PAGES == 0:
+            rows = "".join(
+                "<tr>"
+                + "".join(
+                    f"<td>{generator.choice(WORDS)} {generator.randint(1, 999)}</td>"
+                    for _ in range(4)
+                )
+                + "</tr>"
+                for _ in range(8)
+            )
+            parts.append(
+                f"<table><tr><th>Instrument</th><th>Book</th><th>Page</th><th>Date</th></tr>{rows}</table>"
+            )
+        parts.append(f'<!-- PageNumber="{page_number}" -->')
+        content_pages.append("\n\n".join(parts))
+    return content_pages
+
+
+def to_instructions(content: str) -> str:
+    """
+    Wrap markdown content like the instructions stored for a document.
+    """
+    return "Answer questions about the following document.\n" + (
+        FileExtractionClient.serialize_cleaned_data(
+            content=content, paragraphs=None, tables=None
+        )
+    )
+
+
+def load_documents(directory: str) -> list[str]:
+    """
+    Load extracted documents from a directory. JSON files are expected to
+    contain the analysis result or the cleaned data with a `content` field,
+    other files are read as markdown.
+    """
+    documents = []
+    for path in sorted(Path(directory).iterdir()):
+        if not path.is_file():
+            continue
+        text = path.read_text(encoding="utf-8")
+        if path.suffix == ".json":
+            text = json.loads(text).get("content", "")
+        documents.append(text)
+    return documents
+
+
+def split_pages(content: str) -> list[str]:
+    return [page for page in content.split("<!-- PageBreak -->") if page.strip()]
+
+
+def measure(codec: Codec, payloads: list[str], repeat: int) -> tuple[float, ...]:
+    """
+    Measure the ratio and throughput of a codec.
+
+    :return: A tuple containing the stored ratio, the binary ratio and the compress and decompress throughput in MB/s.
+    :rtype: tuple[float, ...]
+    """
+    size = sum(len(payload.encode("utf-8")) for payload in payloads)
+    compress_times, decompress_times = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        compressed = [compress_string(payload, codec=codec) for payload in payloads]
+        compress_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        decompressed = [
+            decompress_string(payload, codec=codec) for payload in compressed
+        ]
+        decompress_times.append(time.perf_counter() - start)
+    assert decompressed == payloads
+
+    stored_size = sum(len(payload) for payload in compressed)
+    return (
+        size / stored_size,
+        size / (stored_size * 3 / 4),
+        size / 2**20 / min(compress_times),
+        size / 2**20 / min(decompress_times),
+    )
+
+
+def report(
+    title: str, codecs: list[tuple[str, Codec]], payloads: list[str], repeat: int
+) -> None:
+    size = sum(len(payload.encode("utf-8")) for payload in payloads)
+    print(f"\n{title}: {len(payloads)} payloads, {size / 2**20:.1f} MB")
+    print(
+        f"{'codec':<16} {'ratio':>7} {'binary':>7} {'compress [MB/s]':>16} {'decompress [MB/s]':>18}"
+    )
+    for name, codec in codecs:
+        ratio, binary_ratio, compress_speed, decompress_speed = measure(
+            codec, payloads, repeat=repeat
+        )
+        print(
+            f"{name:<16} {ratio:>7.2f} {binary_ratio:>7.2f} {compress_speed:>16.1f} {decompress_speed:>18.1f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--documents", type=int, default=8)
+    parser.add_argument("--input", type=str, default="")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--write-dictionary", type=str, default="")
+    args = parser.parse_args()
+
+    # Load or generate documents, the first one is benchmarked and the others train the dictionary
+    if args.input:
+        documents = load_documents(args.input)
+    else:
+        print(f"Generating {args.documents} documents with {args.pages} pages ...")
+        documents = [
+            "\n\n<!-- PageBreak -->\n\n".join(generate_document(args.pages, seed))
+            for seed in range(args.documents)
+        ]
+    if len(documents) < 2:
+        raise SystemExit("At least two documents are required.")
+    document, training_documents = documents[0], documents[1:]
+
+    codecs = [
+        (
+            f"{codec.value}" + (f"-{level}" if level is not None else ""),
+            create_codec(codec=codec, level=level),
+        )
+        for codec, level in CODECS
+    ]
+    report("Full document", codecs, [to_instructions(document)], repeat=args.repeat)
+
+    # Train dictionary on pages of other documents
+    samples = [
+        page.encode("utf-8")
+        for training_document in training_documents
+        for page in split_pages(training_document)
+    ]
+    dictionary = train_zstd_dictionary(samples, dictionary_size=DICTIONARY_SIZE)
+    if args.write_dictionary:
+        Path(args.write_dictionary).write_bytes(dictionary)
+        print(
+            f"Wrote zstd dictionary with {len(dictionary)} bytes to '{args.write_dictionary}'."
+        )
+    page_codecs = codecs + [
+        (f"zstd-{level}-dict", create_codec(CompressionCodec.ZSTD, level, dictionary))
+        for level in (3, 9)
+    ]
+    report("Pages", page_codecs, split_pages(document), repeat=args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+"""
+Benchmark of the logging pipeline.
+
+Logs records from a coroutine and reports the time per record spent on the
+event loop and the number of written records for the previous pipeline, which
+wrote every record synchronously with a handler of the logger and again with
+a handler of the root logger, for the queue pipeline, which only enqueues
+records on the event loop, and for the queue pipeline with the rate limit of
+loggers on hot paths. Records are written to a temporary file, optionally
+with an additional latency per write, which simulates a console whose reader
+is slow, e.g. the log collector of the container runtime.
+
+Run from `code/copilot` with the application environment configured:
+
+    uv run python -m benchmarks.bench_logging --records 50000
+    uv run python -m benchmarks.bench_logging --records 5000 --sink-latency-us 200
+"""
+
+import argparse
+import asyncio
+import logging
+import queue
+import tempfile
+import time
+from logging.handlers import QueueListener
+
+from app.core.settings import settings
+from app.logs import NonBlockingQueueHandler, RateLimitFilter
+
+MESSAGE = "Processing message activity with text: '%s', conversation id: '%s'."
+
+
+class SlowFileHandler(logging.FileHandler):
+    """
+    FileHandler which waits after every write.
+    """
+
+    def __init__(self, path: str, latency_seconds: float):
+        super().__init__(path)
+        self.latency_seconds = latency_seconds
+        self.setFormatter(logging.Formatter(settings.LOGGING_FORMAT))
+
+    def emit(self, record: logging.LogRecord) -> None:
+        super().emit(record)
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+
+
+def configure_previous(
+    root: logging.Logger, logger: logging.Logger, args: argparse.Namespace
+):
+    """
+    Write every record with a handler of the logger and of the root logger.
+    """
+    logger.addHandler(SlowFileHandler(args.path, args.sink_latency_us / 1e6))
+    root.addHandler(SlowFileHandler(args.path, args.sink_latency_us / 1e6))
+    return None
+
+
+def configure_queue(
+    root: logging.Logger, logger: logging.Logger, args: argparse.Namespace
+):
+    """
+    Enqueue records with a handler of the root logger.
+    """
+    queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=args.queue_size))
+    listener = QueueListener(
+        queue_handler.queue, SlowFileHandler(args.path, args.sink_latency_us / 1e6)
+    )
+    listener.start()
+    root.addHandler(queue_handler)
+    return listener
+
+
+def configure_rate_limited(
+    root: logging.Logger, logger: logging.Logger, args: argparse.Namespace
+):
+    """
+    Enqueue records of a rate limited logger with a handler of the root logger.
+    """
+    logger.addFilter(
+        RateLimitFilter(
+            rate_per_second=settings.LOGGING_RATE_LIMIT_PER_SECOND,
+            burst=settings.LOGGING_RATE_LIMIT_BURST,
+        )
+    )
+    return configure_queue(root, logger, args)
+
+
+async def log_records(logger: logging.Logger, records: int) -> float:
+    """
+    Log records from a coroutine.
+
+    :return: The time per record on the event loop in microseconds.
+    :rtype: float
+    """
+    start = time.perf_counter()
+    for index in range(records):
+        logger.info(MESSAGE, f"question {index}", "a:conversation")
+    return (time.perf_counter() - start) / records * 1e6
+
+
+def measure(name: str, configure, args: argparse.Namespace) -> tuple[float, float, int]:
+    """
+    Measure a logging pipeline.
+
+    :return: A tuple containing the time per record on the event loop in microseconds, the time until all records were written in seconds and the number of written records.
+    :rtype: tuple[float, float, int]
+    """
+    # Use a separate logger hierarchy, so that handlers of the root logger are not involved
+    root = logging.getLogger(f"benchmark.{name}")
+    root.propagate = False
+    root.setLevel(logging.INFO)
+    logger = logging.getLogger(f"benchmark.{name}.turns")
+
+    with tempfile.NamedTemporaryFile(suffix=".log") as file:
+        args.path = file.name
+        listener = configure(root, logger, args)
+        start = time.perf_counter()
+        overhead = asyncio.run(log_records(logger, args.records))
+        if listener is not None:
+            listener.stop()
+        for handler in root.handlers + logger.handlers:
+            handler.close()
+        duration = time.perf_counter() - start
+        with open(file.name, encoding="utf-8") as output:
+            written = sum(1 for _ in output)
+    return overhead, duration, written
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--records", type=int, default=50000)
+    parser.add_argument("--queue-size", type=int, default=settings.LOGGING_QUEUE_SIZE)
+    parser.add_argument("--sink-latency-us", type=float, default=0.0)
+    args = parser.parse_args()
+
+    pipelines = {
+        "previous": configure_previous,
+        "queue": configure_queue,
+        "rate-limited": configure_rate_limited,
+    }
+    print(f"{'pipeline':<13} {'loop [us/record]':>17} {'total [s]':>10} {'written':>9}")
+    for name, configure in pipelines.items():
+        overhead, duration, written = measure(name, configure, args)
+        print(f"{name:<13} {overhead:>17.2f} {duration:>10.2f} {written:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Benchmark of the ingestion path of the messages endpoint.
+
+Posts message activities with large attachment payloads to the endpoint and
+reports the requests per second of the previous path, which decoded the body
+into a dictionary with `request.json()` and let `start_agent_process` validate
+it, and of the current path, which validates the body into an `Activity`
+in a single pass. The turn itself is replaced by an adapter which returns
+immediately, so that only parsing, validation and admission are measured.
+
+Run from `code/copilot` with the application environment configured:
+
+    uv run python -m benchmarks.bench_messages --attachments 4 --attachment-kb 512
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import random
+import time
+from typing import Awaitable, Callable
+
+from app.api.v1.endpoints.messages import post_message
+from app.core.components import components
+from app.core.overload import turn_limiters
+from microsoft_agents.hosting.fastapi import CloudAdapter, start_agent_process
+from starlette.requests import Request
+
+
+class BenchmarkAdapter(CloudAdapter):
+    """
+    Adapter which accepts every activity without running a turn.
+    """
+
+    async def process_activity(self, claims_identity, activity, callback):
+        return None
+
+
+class BenchmarkAgent:
+    """
+    Agent application with the benchmark adapter.
+    """
+
+    def __init__(self):
+        self.adapter = BenchmarkAdapter()
+
+    async def on_turn(self, context) -> None:
+        return None
+
+
+def generate_activity(attachments: int, attachment_kb: int, seed: int) -> bytes:
+    """
+    Generate a message activity with inline attachments.
+
+    :param attachments: The number of attachments.
+    :type attachments: int
+    :param attachment_kb: The size of every attachment in KB.
+    :type attachment_kb: int
+    :param seed: The seed of the random attachment content.
+    :type seed: int
+    :return: The serialized activity.
+    :rtype: bytes
+    """
+    generator = random.Random(seed)
+    activity = {
+        "type": "message",
+        "id": f"activity-{seed}",
+        "timestamp": "2025-01-01T00:00:00.000Z",
+        "serviceUrl": "https://smba.trafficmanager.net/emea/",
+        "channelId": "msteams",
+        "from": {"id": "29:user", "name": "User", "aadObjectId": "user"},
+        "conversation": {"id": "a:conversation", "conversationType": "personal"},
+        "recipient": {"id": "28:agent", "name": "Agent"},
+        "text": "Summarize the attached files.",
+        "textFormat": "plain",
+        "attachments": [
+            {"contentType": "text/html", "content": "<p>Summarize the files.</p>"}
+        ]
+        + [
+            {
+                "contentType": "image/png",
+                "name": f"file-{index}.png",
+                "contentUrl": "data:image/png;base64,"
+                + base64.b64encode(generator.randbytes(attachment_kb * 2**10)).decode(),
+            }
+            for index in range(attachments)
+        ],
+        "channelData": {"tenant": {"id": "tenant"}},
+    }
+    return json.dumps(activity).encode("utf-8")
+
+
+def create_request(body: bytes) -> Request:
+    """
+    Create a request of the Bot Connector posting an activity.
+    """
+    received = False
+
+    async def receive() -> dict:
+        nonlocal received
+        if received:
+            return {"type": "http.disconnect"}
+        received = True
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    scope = {
+        "type": "http",
+        "method": "POST",
+        "path": "/v1/message",
+        "headers": [(b"content-type", b"application/json")],
+        "query_string": b"",
+        "state": {},
+    }
+    return Request(scope, receive=receive)
+
+
+async def post_message_previous(request: Request, agent: BenchmarkAgent):
+    """
+    The previous messages endpoint, which decoded the body into a dictionary
+    and validated it again in `start_agent_process`.
+    """
+    await request.json()
+    async with turn_limiters["chat"].admit():
+        return await start_agent_process(
+            request=request, agent_application=agent, adapter=agent.adapter
+        )
+
+
+async def measure(
+    endpoint: Callable[[Request], Awaitable], body: bytes, duration: float
+) -> float:
+    """
+    Measure the requests per second of an endpoint.
+
+    :return: The requests per second.
+    :rtype: float
+    """
+    requests = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        response = await endpoint(create_request(body))
+        assert response.status_code == 202
+        requests += 1
+    return requests / (time.perf_counter() - start)
+
+
+async def run(args: argparse.Namespace) -> None:
+    agent = BenchmarkAgent()
+    components.register("copilot_apps", lambda: {"msteams": agent})
+
+    endpoints = {
+        "previous": lambda request: post_message_previous(request, agent),
+        "current": lambda request: post_message(request),
+    }
+    print(f"{'attachments':>11} {'size [KB]':>10} {'endpoint':<9} {'requests/s':>11}")
+    for attachments in range(0, args.attachments + 1, max(args.attachments // 2, 1)):
+        body = generate_activity(attachments, args.attachment_kb, seed=attachments)
+        for name, endpoint in endpoints.items():
+            requests_per_second = await measure(endpoint, body, args.duration)
+            print(
+                f"{attachments:>11} {len(body) / 2**10:>10.0f} {name:<9} {requests_per_second:>11.1f}"
+            )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--attachments", type=int, default=4)
+    parser.add_argument("--attachment-kb", type=int, default=512)
+    parser.add_argument("--duration", type=float, default=3.0)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
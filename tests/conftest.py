@@ -0,0 +1,85 @@
+import asyncio
+import os
+import uuid
+
+import pytest
+
+# Settings are loaded when application modules are imported, so the required
+# settings are provided before any test module imports them. An empty Cosmos DB
+# endpoint selects the memory storage.
+for name, value in {
+    "BASE_URL": "https://copilot.test",
+    "APPLICATIONINSIGHTS_CONNECTION_STRING": "InstrumentationKey=00000000-0000-0000-0000-000000000000",
+    "USER_AUTHORIZATION_GRAPH_OAUTH_CONNECTION_NAME": "graph",
+    "AZURE_DOCUMENT_INTELLIGENCE_ENDPOINT": "https://documentintelligence.test",
+    "AZURE_COSMOS_ENDPOINT": "",
+    "AZURE_COSMOS_KEY": "",
+    "AZURE_COSMOS_DATABASE_ID": "copilot",
+    "AZURE_OPENAI_ENDPOINT": "https://openai.test",
+    "AZURE_OPENAI_API_KEY": "key",
+}.items():
+    os.environ.setdefault(name, value)
+
+from app.storage.cosmos import CosmosDBMetadataStorage
+from azure.cosmos import exceptions as cosmos_exceptions
+from microsoft_agents.storage.cosmos import CosmosDBStorageConfig
+
+
+class FakeCosmosContainer:
+    """
+    In-memory container implementing the calls of the Cosmos DB storage. Items
+    get a new ETag on every write and conditional writes fail like in Cosmos DB.
+    Every call yields to the event loop, so that concurrent calls interleave.
+    """
+
+    def __init__(self):
+        self.items: dict[str, dict] = {}
+
+    def _store(self, body: dict, response_hook) -> dict:
+        item = {**body, "_etag": uuid.uuid4().hex}
+        self.items[body["id"]] = item
+        if response_hook:
+            response_hook({"x-ms-request-charge": "1.0"}, item)
+        return dict(item)
+
+    async def read_item(self, item: str, partition_key, response_hook=None) -> dict:
+        await asyncio.sleep(0)
+        if item not in self.items:
+            raise cosmos_exceptions.CosmosResourceNotFoundError(status_code=404)
+        if response_hook:
+            response_hook({"x-ms-request-charge": "1.0"}, self.items[item])
+        return dict(self.items[item])
+
+    async def create_item(self, body: dict, response_hook=None) -> dict:
+        await asyncio.sleep(0)
+        if body["id"] in self.items:
+            raise cosmos_exceptions.CosmosResourceExistsError(status_code=409)
+        return self._store(body, response_hook)
+
+    async def upsert_item(
+        self, body: dict, etag=None, match_condition=None, response_hook=None
+    ) -> dict:
+        await asyncio.sleep(0)
+        stored = self.items.get(body["id"])
+        if etag and (stored is None or stored["_etag"] != etag):
+            raise cosmos_exceptions.CosmosAccessConditionFailedError(status_code=412)
+        return self._store(body, response_hook)
+
+    async def delete_item(self, item: str, partition_key, response_hook=None) -> None:
+        await asyncio.sleep(0)
+        if self.items.pop(item, None) is None:
+            raise cosmos_exceptions.CosmosResourceNotFoundError(status_code=404)
+
+
+@pytest.fixture
+def cosmos_storage() -> CosmosDBMetadataStorage:
+    storage = CosmosDBMetadataStorage(
+        config=CosmosDBStorageConfig(
+            cosmos_db_endpoint="https://cosmos.test",
+            auth_key="a2V5",
+            database_id="copilot",
+            container_id="state",
+        )
+    )
+    storage._container = FakeCosmosContainer()
+    return storage
@@ -0,0 +1,93 @@
+import base64
+import struct
+import zlib
+
+import pytest
+from app.files.codecs import (
+    HEADER_FORMAT,
+    HEADER_MAGIC,
+    HEADER_SIZE,
+    HEADER_VERSION,
+    ZstdCodec,
+    compress_bytes,
+    compress_string,
+    create_codec,
+    decompress_bytes,
+    decompress_string,
+    train_zstd_dictionary,
+)
+from app.models.core import CompressionCodec
+
+CONTENT = (
+    '{"content":"# Lease Agreement\\n\\nThe monthly rent is due on the first day."}'
+)
+
+
+def create_dictionary_codec() -> ZstdCodec:
+    samples = [
+        f'{{"content":"# Lease Agreement {number}\\n\\nThe monthly rent of {number * 10} EUR is due on day {number % 28 + 1}."}}'.encode()
+        for number in range(500)
+    ]
+    return create_codec(
+        CompressionCodec.ZSTD,
+        dictionary=train_zstd_dictionary(samples, dictionary_size=2048),
+    )
+
+
+@pytest.mark.parametrize("codec", list(CompressionCodec))
+def test_round_trip_writes_header(codec):
+    # arrange
+    encoder = create_codec(codec)
+
+    # action
+    payload = compress_bytes(CONTENT.encode(), codec=encoder)
+
+    # assert
+    assert struct.unpack_from(HEADER_FORMAT, payload) == (
+        HEADER_MAGIC,
+        HEADER_VERSION,
+        encoder.codec_id,
+        0,
+    )
+    assert decompress_bytes(payload) == CONTENT.encode()
+    assert decompress_string(compress_string(CONTENT, codec=encoder)) == CONTENT
+
+
+def test_legacy_zlib_payload_without_header():
+    # arrange
+    compressed_string = base64.b64encode(zlib.compress(CONTENT.encode())).decode()
+
+    # action / assert
+    assert decompress_string(compressed_string) == CONTENT
+
+
+def test_zstd_dictionary_id_is_written_and_required():
+    # arrange
+    encoder = create_dictionary_codec()
+
+    # action
+    payload = compress_bytes(CONTENT.encode(), codec=encoder)
+
+    # assert
+    assert encoder.dictionary_id != 0
+    assert struct.unpack_from(HEADER_FORMAT, payload)[3] == encoder.dictionary_id
+    assert decompress_bytes(payload, codec=encoder) == CONTENT.encode()
+    with pytest.raises(ValueError, match="not configured"):
+        decompress_bytes(payload)
+
+
+@pytest.mark.parametrize(
+    "header,message",
+    (
+        (struct.pack(HEADER_FORMAT, HEADER_MAGIC, 2, 1, 0), "header version"),
+        (struct.pack(HEADER_FORMAT, HEADER_MAGIC, HEADER_VERSION, 9, 0), "codec id"),
+    ),
+)
+def test_unsupported_header_raises(header, message):
+    # arrange
+    payload = header + zlib.compress(CONTENT.encode())
+
+    # action / assert
+    assert len(header) == HEADER_SIZE
+    with pytest.raises(ValueError, match=message):
+        decompress_bytes(payload)
@@ -0,0 +1,76 @@
+import asyncio
+import os
+import threading
+
+import pytest
+from app.core import executor
+from app.core.settings import settings
+from app.files.codecs import decompress_string
+from app.files.compaction import DocumentCompactor
+from app.files.extraction import FileExtractionClient
+from app.models.core import ExecutorType
+from app.storage.documents import encode_document
+from app.storage.instrumentation import get_compressed_size
+
+
+@pytest.fixture
+def process_executor(monkeypatch):
+    monkeypatch.setattr(settings, "CPU_EXECUTOR_TYPE", ExecutorType.PROCESS)
+    monkeypatch.setattr(settings, "CPU_EXECUTOR_MAX_WORKERS", 1)
+    executor.shutdown_executor()
+    yield
+    executor.shutdown_executor()
+
+
+def test_process_pool_runs_functions_in_worker_process(process_executor):
+    # action
+    pid = asyncio.run(executor.run_cpu_bound(os.getpid))
+
+    # assert
+    assert pid != os.getpid()
+
+
+def test_unpicklable_function_runs_in_thread(process_executor):
+    # action
+    thread_name = asyncio.run(
+        executor.run_cpu_bound(lambda: threading.current_thread().name)
+    )
+
+    # assert
+    assert thread_name != threading.main_thread().name
+    assert not executor.is_picklable(lambda: None)
+
+
+@pytest.mark.parametrize(
+    "function",
+    (
+        FileExtractionClient.serialize_cleaned_data,
+        DocumentCompactor().compact,
+        encode_document,
+        decompress_string,
+        get_compressed_size,
+    ),
+)
+def test_cpu_bound_steps_are_picklable(function):
+    # action / assert
+    assert executor.is_picklable(function)
+
+
+def test_compaction_in_process_pool_matches_compaction_in_process(
+    process_executor,
+):
+    # arrange
+    data = {"content": "# Title\n\n\n\nText   with    spaces.\n<!-- PageBreak -->\nEnd"}
+    document_compactor = DocumentCompactor()
+    expected_content, expected_offset_map = document_compactor.compact(data)
+
+    # action
+    content, offset_map = asyncio.run(
+        executor.run_cpu_bound(document_compactor.compact, data=data)
+    )
+
+    # assert
+    assert content == expected_content
+    assert [offset_map.map(offset) for offset in range(len(data["content"]))] == [
+        expected_offset_map.map(offset) for offset in range(len(data["content"]))
+    ]
@@ -0,0 +1,144 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from app.copilot.idempotency import ActivityIdempotencyCache
+from app.models.activities import ProcessedActivity
+from microsoft_agents.hosting.core import MemoryStorage
+
+EXPIRED_TIMESTAMP = (datetime.now(timezone.utc) - timedelta(hours=1)).isoformat()
+
+
+class ActivityRecorder:
+    """Activity logic recording its calls, failing the first calls."""
+
+    def __init__(self, failures: int = 0, delay: float = 0):
+        self.failures = failures
+        self.delay = delay
+        self.calls = 0
+
+    async def process(self) -> None:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.calls <= self.failures:
+            raise RuntimeError(f"Call {self.calls} failed.")
+
+
+def create_cache(storage, instance_id: str = "a") -> ActivityIdempotencyCache:
+    return ActivityIdempotencyCache(
+        storage=storage, ttl_seconds=60, instance_id=instance_id
+    )
+
+
+def test_duplicate_in_flight_waits_for_original():
+    async def run():
+        cache = create_cache(MemoryStorage())
+        recorder = ActivityRecorder(delay=0.05)
+        results = await asyncio.gather(
+            cache.run_once("conversation", "activity", recorder.process),
+            cache.run_once("conversation", "activity", recorder.process),
+        )
+        return recorder, results, cache._in_flight
+
+    # action
+    recorder, results, in_flight = asyncio.run(run())
+
+    # assert
+    assert results == [True, False]
+    assert recorder.calls == 1
+    assert in_flight == {}
+
+
+@pytest.mark.parametrize("concurrent", (False, True))
+def test_duplicate_on_other_replica_is_not_processed(cosmos_storage, concurrent):
+    async def run():
+        caches = [create_cache(cosmos_storage, instance_id) for instance_id in "ab"]
+        recorder = ActivityRecorder()
+        if concurrent:
+            return recorder, await asyncio.gather(
+                *[
+                    cache.run_once("conversation", "activity", recorder.process)
+                    for cache in caches
+                ]
+            )
+        return recorder, [
+            await cache.run_once("conversation", "activity", recorder.process)
+            for cache in caches
+        ]
+
+    # action
+    recorder, results = asyncio.run(run())
+
+    # assert
+    assert sorted(results) == [False, True]
+    assert recorder.calls == 1
+
+
+def test_expired_record_is_processed_again(cosmos_storage):
+    async def run():
+        key = ActivityIdempotencyCache.get_key("conversation", "activity")
+        await cosmos_storage.write(
+            {
+                key: ProcessedActivity(
+                    activity_id="activity",
+                    conversation_id="conversation",
+                    instance_id="crashed",
+                    created_at=EXPIRED_TIMESTAMP,
+                )
+            }
+        )
+        recorder = ActivityRecorder()
+        result = await create_cache(cosmos_storage).run_once(
+            "conversation", "activity", recorder.process
+        )
+        items = await cosmos_storage.read([key], target_cls=ProcessedActivity)
+        return recorder, result, items[key]
+
+    # action
+    recorder, result, processed_activity = asyncio.run(run())
+
+    # assert
+    assert result
+    assert recorder.calls == 1
+    assert processed_activity.instance_id == "a"
+
+
+@pytest.mark.parametrize("metadata", (False, True))
+def test_failed_activity_is_deleted_and_retried(cosmos_storage, metadata):
+    async def run():
+        storage = cosmos_storage if metadata else MemoryStorage()
+        key = ActivityIdempotencyCache.get_key("conversation", "activity")
+        cache = create_cache(storage)
+        recorder = ActivityRecorder(failures=1)
+        with pytest.raises(RuntimeError):
+            await cache.run_once("conversation", "activity", recorder.process)
+        items = await storage.read([key], target_cls=ProcessedActivity)
+        result = await create_cache(storage, "b").run_once(
+            "conversation", "activity", recorder.process
+        )
+        return recorder, items, result
+
+    # action
+    recorder, items, result = asyncio.run(run())
+
+    # assert
+    assert items == {}
+    assert result
+    assert recorder.calls == 2
+
+
+def test_activity_is_processed_if_record_fails(cosmos_storage, monkeypatch):
+    # arrange
+    async def failing_write(changes, **kwargs):
+        raise ConnectionError("Storage is unavailable.")
+
+    monkeypatch.setattr(cosmos_storage, "write", failing_write)
+    cache = create_cache(cosmos_storage)
+    recorder = ActivityRecorder()
+
+    # action
+    result = asyncio.run(cache.run_once("conversation", "activity", recorder.process))
+
+    # assert
+    assert result
+    assert recorder.calls == 1
@@ -0,0 +1,303 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from app.jobs.store import ExtractionJobStore
+from app.jobs.worker import ExtractionWorkerPool
+from app.models.core import JobStatus
+from app.models.jobs import ExtractionJob
+from app.storage.cosmos import StorageConflictError
+from microsoft_agents.hosting.core import MemoryStorage
+
+EXPIRED_TIMESTAMP = (datetime.now(timezone.utc) - timedelta(hours=1)).isoformat()
+
+
+class JobRecorder:
+    """Processor and notifier recording their calls, failing the first attempts."""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.attempts: list[tuple[str, float]] = []
+        self.notifications: list[tuple[str, object]] = []
+
+    async def process(self, job: ExtractionJob) -> object:
+        self.attempts.append((job.job_id, asyncio.get_running_loop().time()))
+        if len(self.attempts) <= self.failures:
+            raise RuntimeError(f"Attempt {len(self.attempts)} failed.")
+        return "document"
+
+    async def notify(self, job: ExtractionJob, processed_document: object) -> None:
+        self.notifications.append((job.job_id, processed_document))
+
+
+def create_pool(
+    job_store: ExtractionJobStore, recorder: JobRecorder, instance_id: str, **kwargs
+) -> ExtractionWorkerPool:
+    return ExtractionWorkerPool(
+        job_store=job_store,
+        processor=recorder.process,
+        notifier=recorder.notify,
+        instance_id=instance_id,
+        **kwargs,
+    )
+
+
+async def wait_until_finished(
+    job_store: ExtractionJobStore, job_id: str, timeout: float = 5.0
+) -> ExtractionJob:
+    async with asyncio.timeout(timeout):
+        while True:
+            job = await job_store.get(job_id)
+            if job and not job.is_pending:
+                return job
+            await asyncio.sleep(0.01)
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    monkeypatch.setattr("app.jobs.store.random.uniform", lambda low, high: 0)
+
+
+def test_memory_storage_create_claim_and_complete():
+    async def run():
+        job_store = ExtractionJobStore(MemoryStorage())
+        job = ExtractionJob(job_id="job")
+        await job_store.create(job)
+        claimed = await job_store.claim(job, instance_id="a")
+        pending_jobs = await job_store.get_pending_jobs()
+        job.status = JobStatus.COMPLETED
+        await job_store.update(job)
+        return claimed, pending_jobs, await job_store.get_pending_jobs()
+
+    # action
+    claimed, pending_jobs, finished_pending_jobs = asyncio.run(run())
+
+    # assert
+    assert claimed
+    assert [(job.job_id, job.status, job.attempts) for job in pending_jobs] == [
+        ("job", JobStatus.RUNNING, 1)
+    ]
+    assert finished_pending_jobs == []
+
+
+def test_claim_race_between_pools_has_one_winner(cosmos_storage):
+    async def run():
+        job_store_a = ExtractionJobStore(cosmos_storage)
+        job_store_b = ExtractionJobStore(cosmos_storage)
+        await job_store_a.create(ExtractionJob(job_id="job"))
+        job_a = (await job_store_a.get_pending_jobs())[0]
+        job_b = (await job_store_b.get_pending_jobs())[0]
+        claims = await asyncio.gather(
+            job_store_a.claim(job_a, instance_id="a"),
+            job_store_b.claim(job_b, instance_id="b"),
+        )
+        return claims, await job_store_a.get("job")
+
+    # action
+    claims, stored_job = asyncio.run(run())
+
+    # assert
+    assert sorted(claims) == [False, True]
+    assert stored_job.instance_id == ("a" if claims[0] else "b")
+    assert stored_job.attempts == 1
+
+
+def test_update_of_stale_job_raises_conflict(cosmos_storage):
+    async def run():
+        job_store = ExtractionJobStore(cosmos_storage)
+        await job_store.create(ExtractionJob(job_id="job"))
+        stale_job = await job_store.get("job")
+        job = await job_store.get("job")
+        await job_store.claim(job, instance_id="a")
+        stale_job.status = JobStatus.FAILED
+        await job_store.update(stale_job)
+
+    # action / assert
+    with pytest.raises(StorageConflictError):
+        asyncio.run(run())
+
+
+def test_concurrent_creates_retry_index_conflicts(
+    cosmos_storage, no_backoff, monkeypatch
+):
+    # arrange
+    write = cosmos_storage.write
+    index_conflicts = []
+
+    async def counting_write(changes, **kwargs):
+        try:
+            await write(changes, **kwargs)
+        except StorageConflictError as e:
+            index_conflicts.append(e.key)
+            raise
+
+    monkeypatch.setattr(cosmos_storage, "write", counting_write)
+
+    async def run():
+        job_stores = [ExtractionJobStore(cosmos_storage) for _ in range(2)]
+        await asyncio.gather(
+            *[
+                job_stores[number % 2].create(ExtractionJob(job_id=f"job-{number}"))
+                for number in range(10)
+            ]
+        )
+        return await job_stores[0].get_pending_jobs()
+
+    # action
+    pending_jobs = asyncio.run(run())
+
+    # assert
+    assert sorted(job.job_id for job in pending_jobs) == sorted(
+        f"job-{number}" for number in range(10)
+    )
+    assert index_conflicts
+    assert set(index_conflicts) == {ExtractionJobStore.INDEX_KEY}
+
+
+def test_index_update_gives_up_after_max_attempts(
+    cosmos_storage, no_backoff, monkeypatch
+):
+    # arrange
+    job_store = ExtractionJobStore(cosmos_storage)
+    write = cosmos_storage.write
+    index_writes = []
+
+    async def conflicting_write(changes, **kwargs):
+        if ExtractionJobStore.INDEX_KEY in changes:
+            index_writes.append(kwargs)
+            raise StorageConflictError(ExtractionJobStore.INDEX_KEY)
+        await write(changes, **kwargs)
+
+    monkeypatch.setattr(cosmos_storage, "write", conflicting_write)
+
+    # action / assert
+    with pytest.raises(StorageConflictError):
+        asyncio.run(job_store.create(ExtractionJob(job_id="job")))
+    assert len(index_writes) == ExtractionJobStore.MAX_INDEX_ATTEMPTS
+
+
+def test_recovery_takes_over_jobs_with_expired_lease(cosmos_storage):
+    async def run():
+        job_store = ExtractionJobStore(cosmos_storage)
+        await job_store.create(
+            ExtractionJob(
+                job_id="expired",
+                status=JobStatus.RUNNING,
+                instance_id="crashed",
+                updated_at=EXPIRED_TIMESTAMP,
+            )
+        )
+        await job_store.create(
+            ExtractionJob(job_id="leased", status=JobStatus.RUNNING, instance_id="b")
+        )
+        recorder = JobRecorder()
+        pool = create_pool(job_store, recorder, instance_id="a")
+        await pool.start()
+        try:
+            expired_job = await wait_until_finished(job_store, "expired")
+        finally:
+            await pool.stop()
+        return recorder, expired_job, await job_store.get("leased")
+
+    # action
+    recorder, expired_job, leased_job = asyncio.run(run())
+
+    # assert
+    assert [job_id for job_id, _ in recorder.attempts] == ["expired"]
+    assert recorder.notifications == [("expired", "document")]
+    assert (expired_job.status, expired_job.instance_id) == (JobStatus.COMPLETED, "a")
+    assert (leased_job.status, leased_job.instance_id) == (JobStatus.RUNNING, "b")
+
+
+def test_pools_process_recovered_job_once(cosmos_storage):
+    async def run():
+        job_store = ExtractionJobStore(cosmos_storage)
+        await job_store.create(
+            ExtractionJob(
+                job_id="job", instance_id="crashed", updated_at=EXPIRED_TIMESTAMP
+            )
+        )
+        recorder = JobRecorder()
+        pools = [
+            create_pool(
+                ExtractionJobStore(cosmos_storage),
+                recorder,
+                instance_id=instance_id,
+                recovery_interval_seconds=0.01,
+            )
+            for instance_id in ("a", "b")
+        ]
+        await asyncio.gather(*[pool.start() for pool in pools])
+        try:
+            await wait_until_finished(job_store, "job")
+            await asyncio.sleep(0.05)
+        finally:
+            await asyncio.gather(*[pool.stop() for pool in pools])
+        return recorder
+
+    # action
+    recorder = asyncio.run(run())
+
+    # assert
+    assert [job_id for job_id, _ in recorder.attempts] == ["job"]
+    assert recorder.notifications == [("job", "document")]
+
+
+def test_failed_attempts_are_retried_with_backoff():
+    async def run():
+        job_store = ExtractionJobStore(MemoryStorage())
+        recorder = JobRecorder(failures=2)
+        pool = create_pool(
+            job_store, recorder, instance_id="a", retry_delay_seconds=0.05
+        )
+        await pool.start()
+        try:
+            job = await pool.submit({}, "lease.pdf", "https://files.test/lease.pdf")
+            job = await wait_until_finished(job_store, job.job_id)
+        finally:
+            await pool.stop()
+        return recorder, job
+
+    # action
+    recorder, job = asyncio.run(run())
+
+    # assert
+    attempt_times = [attempt_time for _, attempt_time in recorder.attempts]
+    assert len(attempt_times) == 3
+    assert attempt_times[1] - attempt_times[0] >= 0.05
+    assert attempt_times[2] - attempt_times[1] >= 0.1
+    assert (job.status, job.attempts, job.error) == (JobStatus.COMPLETED, 3, None)
+    assert recorder.notifications == [(job.job_id, "document")]
+
+
+def test_final_failure_notifies_user():
+    async def run():
+        job_store = ExtractionJobStore(MemoryStorage())
+        recorder = JobRecorder(failures=2)
+        pool = create_pool(
+            job_store,
+            recorder,
+            instance_id="a",
+            max_attempts=2,
+            retry_delay_seconds=0.01,
+        )
+        await pool.start()
+        try:
+            job = await pool.submit({}, "lease.pdf", "https://files.test/lease.pdf")
+            job = await wait_until_finished(job_store, job.job_id)
+        finally:
+            await pool.stop()
+        return recorder, job, await job_store.get_pending_jobs()
+
+    # action
+    recorder, job, pending_jobs = asyncio.run(run())
+
+    # assert
+    assert len(recorder.attempts) == 2
+    assert (job.status, job.attempts, job.error) == (
+        JobStatus.FAILED,
+        2,
+        "Attempt 2 failed.",
+    )
+    assert recorder.notifications == [(job.job_id, None)]
+    assert pending_jobs == []
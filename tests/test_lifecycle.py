@@ -0,0 +1,107 @@
+import asyncio
+import os
+import time
+
+import pytest
+from app.storage.lifecycle import ExpiringStorage
+from app.storage.local import LocalFileStorage
+from microsoft_agents.hosting.core import MemoryStorage
+from microsoft_agents.hosting.core.state.agent_state import CachedAgentState
+
+TTL_SECONDS = 60
+
+
+def get_ttl(key: str) -> int | None:
+    return None if key.startswith("users/") else TTL_SECONDS
+
+
+def age_file(storage: LocalFileStorage, key: str, seconds: float) -> None:
+    modified_time = time.time() - seconds
+    os.utime(storage._get_path(key), (modified_time, modified_time))
+
+
+@pytest.fixture
+def local_storage(tmp_path) -> LocalFileStorage:
+    return LocalFileStorage(directory=str(tmp_path))
+
+
+def test_local_items_written_before_restart_expire(local_storage):
+    async def run():
+        await ExpiringStorage(local_storage, get_ttl).write(
+            {
+                "documents/expired": CachedAgentState({"turn": 0}),
+                "documents/fresh": CachedAgentState({"turn": 0}),
+                "users/user": CachedAgentState({"turn": 0}),
+            }
+        )
+        for key in ("documents/expired", "users/user"):
+            age_file(local_storage, key, TTL_SECONDS + 1)
+
+        # A new instance after a restart scans the files
+        storage = ExpiringStorage(local_storage, get_ttl)
+        count = await storage.purge_expired()
+        keys = ["documents/expired", "documents/fresh", "users/user"]
+        return count, await storage.read(keys, target_cls=CachedAgentState)
+
+    # action
+    count, items = asyncio.run(run())
+
+    # assert
+    assert count == 1
+    assert sorted(items) == ["documents/fresh", "users/user"]
+
+
+def test_local_expired_item_is_not_read(local_storage):
+    async def run():
+        await local_storage.write({"documents/expired": CachedAgentState({})})
+        age_file(local_storage, "documents/expired", TTL_SECONDS + 1)
+        storage = ExpiringStorage(local_storage, get_ttl)
+        items = await storage.read(["documents/expired"], target_cls=CachedAgentState)
+        return items, await local_storage.get_modified_times()
+
+    # action
+    items, modified_times = asyncio.run(run())
+
+    # assert
+    assert items == {}
+    assert modified_times == {}
+
+
+def test_local_read_slides_expiry(local_storage):
+    async def run():
+        storage = ExpiringStorage(local_storage, get_ttl)
+        await storage.write({"documents/read": CachedAgentState({})})
+        age_file(local_storage, "documents/read", TTL_SECONDS - 1)
+        await storage.read(["documents/read"], target_cls=CachedAgentState)
+        modified_times = await local_storage.get_modified_times(["documents/read"])
+        return modified_times["documents/read"], await storage.purge_expired()
+
+    # action
+    modified_time, count = asyncio.run(run())
+
+    # assert
+    assert modified_time > time.time() - TTL_SECONDS / 2
+    assert count == 0
+
+
+def test_memory_items_expire(monkeypatch):
+    async def run():
+        storage = ExpiringStorage(MemoryStorage(), get_ttl)
+        await storage.write(
+            {
+                "documents/document": CachedAgentState({}),
+                "users/user": CachedAgentState({}),
+            }
+        )
+        expired_time = time.time() + TTL_SECONDS
+        monkeypatch.setattr("app.storage.lifecycle.time.time", lambda: expired_time)
+        count = await storage.purge_expired()
+        keys = ["documents/document", "users/user"]
+        return count, await storage.read(keys, target_cls=CachedAgentState)
+
+    # action
+    count, items = asyncio.run(run())
+
+    # assert
+    assert count == 1
+    assert list(items) == ["users/user"]
@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+from app.core.overload import (
+    AdmissionLimiter,
+    OverloadError,
+    get_retry_after_header,
+    get_turn_budget,
+)
+from microsoft_agents.activity import Activity, Attachment
+
+
+def create_limiter(max_wait_seconds: float = 1.0) -> AdmissionLimiter:
+    return AdmissionLimiter(
+        name="chat",
+        max_concurrency=1,
+        max_queue_size=1,
+        max_wait_seconds=max_wait_seconds,
+        retry_after_seconds=2.5,
+    )
+
+
+async def hold(limiter: AdmissionLimiter, release: asyncio.Event, order: list[int]):
+    async with limiter.admit():
+        order.append(len(order))
+        await release.wait()
+
+
+def test_full_queue_rejects_turn():
+    async def run():
+        limiter = create_limiter()
+        release = asyncio.Event()
+        order = []
+        tasks = [asyncio.create_task(hold(limiter, release, order)) for _ in range(2)]
+        await asyncio.sleep(0)
+        active, queue_depth = limiter.active, limiter.queue_depth
+        try:
+            with pytest.raises(OverloadError) as error:
+                async with limiter.admit():
+                    pass
+        finally:
+            release.set()
+            await asyncio.gather(*tasks)
+        return error.value, (active, queue_depth), limiter, order
+
+    # action
+    error, (active, queue_depth), limiter, order = asyncio.run(run())
+
+    # assert
+    assert (active, queue_depth) == (1, 1)
+    assert (error.budget, error.reason, error.retry_after_seconds) == (
+        "chat",
+        "queue_full",
+        2.5,
+    )
+    assert get_retry_after_header(error.retry_after_seconds) == "3"
+    assert order == [0, 1]
+    assert (limiter.active, limiter.queue_depth) == (0, 0)
+
+
+def test_queued_turn_times_out():
+    async def run():
+        limiter = create_limiter(max_wait_seconds=0.05)
+        release = asyncio.Event()
+        task = asyncio.create_task(hold(limiter, release, []))
+        await asyncio.sleep(0)
+        try:
+            with pytest.raises(OverloadError) as error:
+                async with limiter.admit():
+                    pass
+        finally:
+            release.set()
+            await task
+        return error.value, limiter
+
+    # action
+    error, limiter = asyncio.run(run())
+
+    # assert
+    assert error.reason == "queue_timeout"
+    assert (limiter.active, limiter.queue_depth) == (0, 0)
+
+
+def test_queued_turn_is_admitted_after_release():
+    async def run():
+        limiter = create_limiter()
+        release = asyncio.Event()
+        order = []
+        first_task = asyncio.create_task(hold(limiter, release, order))
+        await asyncio.sleep(0)
+        second_task = asyncio.create_task(hold(limiter, asyncio.Event(), order))
+        await asyncio.sleep(0)
+        queued_order = list(order)
+        release.set()
+        await first_task
+        await asyncio.sleep(0)
+        second_task.cancel()
+        await asyncio.gather(second_task, return_exceptions=True)
+        return queued_order, order, limiter
+
+    # action
+    queued_order, order, limiter = asyncio.run(run())
+
+    # assert
+    assert queued_order == [0]
+    assert order == [0, 1]
+    assert (limiter.active, limiter.queue_depth) == (0, 0)
+
+
+@pytest.mark.parametrize(
+    "activity,budget",
+    (
+        (Activity(type="message", text="Hello"), "chat"),
+        (
+            Activity(
+                type="message",
+                attachments=[Attachment(content_type="text/html", content="Hello")],
+            ),
+            "chat",
+        ),
+        (
+            Activity(
+                type="message",
+                attachments=[
+                    Attachment(
+                        content_type="application/vnd.microsoft.teams.file.download.info"
+                    )
+                ],
+            ),
+            "upload",
+        ),
+    ),
+)
+def test_turn_budget_depends_on_file_attachments(activity, budget):
+    # action / assert
+    assert get_turn_budget(activity) == budget
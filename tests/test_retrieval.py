@@ -0,0 +1,146 @@
+import asyncio
+
+import numpy as np
+import pytest
+from app.files.retrieval import DocumentIndex, HashingEmbeddingProvider, chunk_document
+
+CONTENT = "\n\n".join(
+    [
+        "# Lease Agreement",
+        "This agreement is made between the landlord and the tenant.",
+        "<!-- PageBreak -->",
+        "# Termination",
+        "The lease terminates on 31 December 2030 unless renewed by both parties.",
+        "<!-- PageBreak -->",
+        "# Payment",
+        "The monthly rent is due on the first day of every month.",
+    ]
+)
+
+
+def build_index(content: str = CONTENT) -> DocumentIndex:
+    return asyncio.run(
+        DocumentIndex.build(
+            content=content,
+            embedding_provider=HashingEmbeddingProvider(),
+            max_characters=200,
+        )
+    )
+
+
+def test_chunk_document_keeps_pages_and_headings():
+    # action
+    chunks = chunk_document(content=CONTENT, max_characters=200)
+
+    # assert
+    assert [(chunk.page_number, chunk.heading) for chunk in chunks] == [
+        (1, "Lease Agreement"),
+        (2, "Termination"),
+        (3, "Payment"),
+    ]
+    assert all(len(chunk.content) <= 200 for chunk in chunks)
+
+
+def test_chunk_document_splits_oversized_blocks():
+    # action
+    chunks = chunk_document(content="word " * 100, max_characters=120)
+
+    # assert
+    assert len(chunks) == 5
+    assert all(len(chunk.content) <= 120 for chunk in chunks)
+
+
+@pytest.mark.parametrize(
+    "query,page_number",
+    (
+        ("Termination date of the lease", 2),
+        ("When is the monthly rent due?", 3),
+    ),
+)
+def test_search_returns_most_relevant_chunk(query, page_number):
+    # arrange
+    index = build_index()
+
+    # action
+    passages = asyncio.run(
+        index.search(
+            query=query,
+            embedding_provider=HashingEmbeddingProvider(),
+            top_k=2,
+            alpha=0.5,
+        )
+    )
+
+    # assert
+    assert len(passages) == 2
+    assert passages[0].chunk.page_number == page_number
+    assert passages[0].score >= passages[1].score
+
+
+def test_search_uses_keywords_only_for_other_provider():
+    # arrange
+    index = build_index()
+
+    # action
+    passages = asyncio.run(
+        index.search(
+            query="termination",
+            embedding_provider=HashingEmbeddingProvider(dimensions=64),
+            top_k=1,
+            alpha=0.5,
+        )
+    )
+
+    # assert
+    assert passages[0].chunk.heading == "Termination"
+
+
+def test_search_of_empty_index():
+    # arrange
+    index = build_index(content="")
+
+    # action
+    passages = asyncio.run(
+        index.search(
+            query="termination",
+            embedding_provider=HashingEmbeddingProvider(),
+            top_k=3,
+            alpha=0.5,
+        )
+    )
+
+    # assert
+    assert passages == []
+
+
+def test_serialization_round_trip():
+    # arrange
+    index = build_index()
+
+    # action
+    restored = DocumentIndex.from_string(index.to_string())
+
+    # assert
+    assert restored.provider_name == index.provider_name
+    assert restored.chunks == index.chunks
+    assert restored.embeddings.shape == index.embeddings.shape
+    np.testing.assert_allclose(restored.embeddings, index.embeddings, atol=1e-3)
+
+
+def test_search_restricted_to_page_range():
+    # arrange
+    index = build_index()
+
+    # action
+    passages = asyncio.run(
+        index.search(
+            query="Termination date of the lease",
+            embedding_provider=HashingEmbeddingProvider(),
+            top_k=3,
+            alpha=0.5,
+            page_range=(3, 3),
+        )
+    )
+
+    # assert
+    assert [passage.chunk.page_number for passage in passages] == [3]
@@ -0,0 +1,226 @@
+import pytest
+from app.files.compaction import DocumentCompactor
+from app.files.sections import SectionIndex, format_slice, parse_heading
+
+PAGES = [
+    [
+        ("pageHeader", "Lease Agreement    Page 1"),
+        ("title", "Lease Agreement"),
+        (None, "This agreement is made between the landlord and the tenant."),
+        ("sectionHeading", "1. Definitions"),
+        (None, "The premises means the apartment at 1 Main Street."),
+        ("pageNumber", "1"),
+    ],
+    [
+        ("pageHeader", "Lease Agreement    Page 2"),
+        ("sectionHeading", "2. Rent and Payment"),
+        (None, "The monthly rent is due on the first day of every month."),
+        ("sectionHeading", "2.1 Late Payment"),
+        (None, "A late fee of 5 percent applies after the tenth day."),
+        ("pageNumber", "2"),
+    ],
+    [
+        ("pageHeader", "Lease Agreement    Page 3"),
+        ("sectionHeading", "3. Termination"),
+        (None, "The lease terminates on 31 December 2030 unless renewed."),
+        ("pageNumber", "3"),
+    ],
+]
+
+
+def build_layout(pages: list = PAGES) -> dict:
+    """Build a Document Intelligence layout result with spans for the given pages."""
+    content = ""
+    layout_pages = []
+    paragraphs = []
+    for page_number, page in enumerate(pages, start=1):
+        if page_number > 1:
+            content += "\n\n<!-- PageBreak -->\n\n"
+        page_start = len(content)
+        for position, (role, text) in enumerate(page):
+            if position > 0:
+                content += "\n\n"
+            if role == "sectionHeading":
+                text = f"## {text}"
+            elif role == "title":
+                text = f"# {text}"
+            paragraph = {
+                "content": text.lstrip("# "),
+                "spans": [{"offset": len(content), "length": len(text)}],
+            }
+            if role:
+                paragraph["role"] = role
+            paragraphs.append(paragraph)
+            content += text
+        layout_pages.append(
+            {
+                "pageNumber": page_number,
+                "spans": [{"offset": page_start, "length": len(content) - page_start}],
+            }
+        )
+    return {"content": content, "pages": layout_pages, "paragraphs": paragraphs}
+
+
+def get_slice_content(index: SectionIndex, content: str, query: str) -> str:
+    document_slice = index.resolve(query)
+    return content[document_slice.offset_start : document_slice.offset_end]
+
+
+@pytest.mark.parametrize(
+    "text,heading",
+    (
+        ("2.1 Late Payment", ("2.1", "Late Payment", 2)),
+        ("Section 4. Notices", ("4", "Notices", 1)),
+        ("Article IV: Governing Law", ("IV", "Governing Law", 1)),
+        ("Lease Agreement", (None, "Lease Agreement", 1)),
+    ),
+)
+def test_parse_heading(text, heading):
+    # action / assert
+    assert parse_heading(text) == heading
+
+
+def test_build_creates_section_tree():
+    # action
+    index = SectionIndex.build(build_layout())
+
+    # assert
+    assert [
+        (section.number, section.title, section.level, section.parent_id)
+        for section in index.sections
+    ] == [
+        (None, "Lease Agreement", 0, None),
+        ("1", "Definitions", 1, 0),
+        ("2", "Rent and Payment", 1, 0),
+        ("2.1", "Late Payment", 2, 2),
+        ("3", "Termination", 1, 0),
+    ]
+    assert [page.page_number for page in index.pages] == [1, 2, 3]
+
+
+def test_resolve_section_by_number_includes_subsections():
+    # arrange
+    data = build_layout()
+    index = SectionIndex.build(data)
+
+    # action
+    document_slice = index.resolve("Summarize section 2 of the lease")
+    content = get_slice_content(index, data["content"], "section 2")
+
+    # assert
+    assert document_slice.description == "section 2 'Rent and Payment'"
+    assert document_slice.page_start == 2
+    assert content.startswith("## 2. Rent and Payment")
+    assert "late fee" in content
+    assert "Termination" not in content
+
+
+def test_resolve_section_by_title():
+    # arrange
+    data = build_layout()
+    index = SectionIndex.build(data)
+
+    # action
+    content = get_slice_content(
+        index, data["content"], "What does the late payment clause say?"
+    )
+
+    # assert
+    assert content.startswith("## 2.1 Late Payment")
+    assert "after the tenth day." in content
+    assert "## 3. Termination" not in content
+
+
+def test_resolve_page_range():
+    # arrange
+    data = build_layout()
+    index = SectionIndex.build(data)
+
+    # action
+    document_slice = index.resolve("Summarize pages 2 to 3")
+
+    # assert
+    assert document_slice.description == "pages 2-3"
+    assert (document_slice.page_start, document_slice.page_end) == (2, 3)
+    assert data["content"][document_slice.offset_start :].startswith(
+        "Lease Agreement    Page 2"
+    )
+    assert document_slice.offset_end == len(data["content"])
+
+
+@pytest.mark.parametrize(
+    "query",
+    ("What is this document about?", "Summarize section 9", "Summarize page 7"),
+)
+def test_resolve_returns_none_for_unknown_targets(query):
+    # arrange
+    index = SectionIndex.build(build_layout())
+
+    # action / assert
+    assert index.resolve(query) is None
+
+
+@pytest.mark.parametrize(
+    "query",
+    (
+        "section 1",
+        "section 2",
+        "section 2.1",
+        "section 3",
+        "page 1",
+        "page 2",
+        "page 3",
+    ),
+)
+def test_remap_keeps_slices_after_compaction(query):
+    # arrange
+    data = build_layout()
+    index = SectionIndex.build(data)
+    original_content = get_slice_content(index, data["content"], query)
+
+    # action
+    compacted_content, offset_map = DocumentCompactor().compact(data)
+    index.remap(offset_map=offset_map, content_length=len(compacted_content))
+    content = get_slice_content(index, compacted_content, query)
+
+    # assert
+    assert len(compacted_content) < len(data["content"])
+    assert index.content_length == len(compacted_content)
+    for paragraph in data["paragraphs"]:
+        if paragraph.get("role") in ("pageHeader", "pageNumber"):
+            continue
+        text = data["content"][
+            paragraph["spans"][0]["offset"] : paragraph["spans"][0]["offset"]
+            + paragraph["spans"][0]["length"]
+        ]
+        assert (text in original_content) == (text in content)
+
+
+def test_serialization_round_trip():
+    # arrange
+    data = build_layout()
+    index = SectionIndex.build(data, content_offset=42)
+
+    # action
+    restored = SectionIndex.from_string(index.to_string())
+
+    # assert
+    assert restored.content_offset == 42
+    assert restored.content_length == index.content_length
+    assert restored.sections == index.sections
+    assert restored.pages == index.pages
+    assert restored.resolve("section 2.1") == index.resolve("section 2.1")
+
+
+def test_format_slice():
+    # arrange
+    data = build_layout()
+    index = SectionIndex.build(data)
+    document_slice = index.resolve("section 3")
+
+    # action
+    formatted = format_slice(document_slice, data["content"])
+
+    # assert
+    assert formatted.startswith('{"excerpt":"section 3 \'Termination\'","pages":[3,3]')
+    assert "31 December 2030" in formatted
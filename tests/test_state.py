@@ -0,0 +1,83 @@
+from app.models.agents import UserStateStoreItem
+
+
+def load_item(**fields) -> UserStateStoreItem:
+    return UserStateStoreItem.from_json_to_store_item(
+        {"suggested_actions": {}, **fields}
+    )
+
+
+def test_loaded_item_has_no_changes():
+    # arrange
+    item = load_item(file_uploaded=True, instructions="legacy")
+
+    # action / assert
+    assert item.get_changed_fields() == []
+
+
+def test_changed_fields_include_nested_and_legacy_changes():
+    # arrange
+    item = load_item(
+        last_response_id="response-1",
+        suggested_actions={"summary": "Summarize"},
+        instructions="legacy",
+    )
+
+    # action
+    item.last_response_id = "response-2"
+    item.suggested_actions["legal"] = "Extract"
+    item.legacy_documents.pop("instructions")
+
+    # assert
+    assert sorted(item.get_changed_fields()) == [
+        "instructions",
+        "last_response_id",
+        "suggested_actions",
+    ]
+
+
+def test_mark_clean_resets_changes():
+    # arrange
+    item = load_item()
+    item.pending_job_id = "job"
+
+    # action
+    item.mark_clean()
+
+    # assert
+    assert item.get_changed_fields() == []
+
+
+def test_apply_changes_keeps_concurrent_changes_of_other_fields():
+    # arrange
+    turn_item = load_item(instructions="legacy")
+    turn_item.last_response_id = "response-2"
+    turn_item.suggested_actions["summary"] = "Summarize"
+    turn_item.legacy_documents.pop("instructions")
+    stored_item = load_item(
+        pending_job_id="job", last_response_id="response-1", instructions="legacy"
+    )
+
+    # action
+    stored_item.apply_changes(turn_item, turn_item.get_changed_fields())
+    turn_item.suggested_actions["legal"] = "Extract"
+
+    # assert
+    assert stored_item.pending_job_id == "job"
+    assert stored_item.last_response_id == "response-2"
+    assert stored_item.suggested_actions == {"summary": "Summarize"}
+    assert stored_item.legacy_documents == {}
+
+
+def test_apply_changes_adds_legacy_documents():
+    # arrange
+    turn_item = load_item()
+    turn_item.legacy_documents["section_index"] = "legacy"
+    stored_item = load_item()
+
+    # action
+    stored_item.apply_changes(turn_item, turn_item.get_changed_fields())
+
+    # assert
+    assert stored_item.legacy_documents == {"section_index": "legacy"}
+    assert stored_item.store_item_to_json()["section_index"] == "legacy"
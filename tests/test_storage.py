@@ -0,0 +1,190 @@
+import asyncio
+
+import pytest
+from app.copilot.common import save_user_state_store_item
+from app.models.agents import UserStateStoreItem
+from app.storage.cache import CachedStorage
+from app.storage.cosmos import StorageConflictError
+from app.storage.factory import is_conversation_state_key
+from app.storage.instrumentation import InstrumentedStorage
+from microsoft_agents.activity import Activity, ChannelAccount, ConversationAccount
+from microsoft_agents.hosting.core import TurnContext, TurnState
+from microsoft_agents.hosting.core.state.agent_state import CachedAgentState
+
+CONVERSATION_KEY = "msteams/conversations/conversation"
+USER_KEY = "msteams/users/user"
+USER_STATE_PATH = "ConversationState.user_state_store_item"
+
+
+def create_instrumented_storage(storage) -> InstrumentedStorage:
+    return InstrumentedStorage(
+        storage=storage, name="state", payload_sample_rate=0, compression_sample_rate=0
+    )
+
+
+def create_cached_storage(storage) -> CachedStorage:
+    return CachedStorage(
+        storage=create_instrumented_storage(storage),
+        max_size=2**20,
+        ttl_seconds=30,
+        bypass=is_conversation_state_key,
+    )
+
+
+def create_context() -> TurnContext:
+    return TurnContext(
+        object(),
+        Activity(
+            type="message",
+            channel_id="msteams",
+            conversation=ConversationAccount(id="conversation"),
+            from_property=ChannelAccount(id="user"),
+            recipient=ChannelAccount(id="copilot"),
+        ),
+    )
+
+
+async def read_state(storage, key: str) -> CachedAgentState:
+    return (await storage.read([key], target_cls=CachedAgentState))[key]
+
+
+@pytest.mark.parametrize("cached", (False, True))
+def test_write_is_conditional_on_version_read(cosmos_storage, cached):
+    async def run():
+        await cosmos_storage.write({USER_KEY: CachedAgentState({"turn": 0})})
+        replicas = [
+            (
+                create_cached_storage(cosmos_storage)
+                if cached
+                else create_instrumented_storage(cosmos_storage)
+            )
+            for _ in range(2)
+        ]
+        state_a = await read_state(replicas[0], USER_KEY)
+        state_b = await read_state(replicas[1], USER_KEY)
+        state_b.state["turn"] = "b"
+        await replicas[1].write({USER_KEY: state_b})
+        if cached:
+            # The entry may be evicted between the read and the write
+            replicas[0].clear()
+        state_a.state["turn"] = "a"
+        await replicas[0].write({USER_KEY: state_a})
+
+    # action / assert
+    with pytest.raises(StorageConflictError):
+        asyncio.run(run())
+
+
+def test_cached_items_conflict_until_read_again(cosmos_storage):
+    async def run():
+        await cosmos_storage.write({USER_KEY: CachedAgentState({"turn": 0})})
+        replica_a = create_cached_storage(cosmos_storage)
+        replica_b = create_cached_storage(cosmos_storage)
+        await read_state(replica_a, USER_KEY)
+        state_b = await read_state(replica_b, USER_KEY)
+        state_b.state["turn"] = "b"
+        await replica_b.write({USER_KEY: state_b})
+
+        # Replica A serves its outdated entry, whose write conflicts
+        state_a = await read_state(replica_a, USER_KEY)
+        served_turn = state_a.state["turn"]
+        state_a.state["turn"] = "a"
+        with pytest.raises(StorageConflictError):
+            await replica_a.write({USER_KEY: state_a})
+        state_a = await read_state(replica_a, USER_KEY)
+        return served_turn, state_a.state["turn"]
+
+    # action
+    served_turn, reloaded_turn = asyncio.run(run())
+
+    # assert
+    assert (served_turn, reloaded_turn) == (0, "b")
+
+
+def test_conversation_state_bypasses_cache(cosmos_storage):
+    async def run():
+        await cosmos_storage.write({CONVERSATION_KEY: CachedAgentState({"turn": 0})})
+        replica_a = create_cached_storage(cosmos_storage)
+        replica_b = create_cached_storage(cosmos_storage)
+        await read_state(replica_a, CONVERSATION_KEY)
+        state_b = await read_state(replica_b, CONVERSATION_KEY)
+        state_b.state["turn"] = "b"
+        await replica_b.write({CONVERSATION_KEY: state_b})
+        state_a = await read_state(replica_a, CONVERSATION_KEY)
+        return state_a.state["turn"], replica_a.size + replica_b.size
+
+    # action
+    turn, cache_size = asyncio.run(run())
+
+    # assert
+    assert turn == "b"
+    assert cache_size == 0
+
+
+@pytest.mark.parametrize("cached", (False, True))
+def test_concurrent_turns_merge_user_state(cosmos_storage, cached):
+    async def run():
+        storage = (
+            create_cached_storage(cosmos_storage)
+            if cached
+            else create_instrumented_storage(cosmos_storage)
+        )
+        await cosmos_storage.write({CONVERSATION_KEY: CachedAgentState({"turn": 0})})
+        turn_states = [TurnState.with_storage(storage) for _ in range(2)]
+        items = []
+        for turn_state in turn_states:
+            await turn_state.load(create_context(), storage)
+            items.append(
+                turn_state.get_value(
+                    USER_STATE_PATH,
+                    default_value_factory=lambda: UserStateStoreItem(),
+                    target_cls=UserStateStoreItem,
+                )
+            )
+        items[0].last_response_id = "response"
+        items[1].pending_job_id = "job"
+        for turn_state, item in zip(reversed(turn_states), reversed(items)):
+            await save_user_state_store_item(create_context(), turn_state, item)
+
+        turn_state = TurnState.with_storage(storage)
+        await turn_state.load(create_context(), storage)
+        return turn_state.get_value(USER_STATE_PATH, target_cls=UserStateStoreItem)
+
+    # action
+    item = asyncio.run(run())
+
+    # assert
+    assert (item.last_response_id, item.pending_job_id) == ("response", "job")
+
+
+@pytest.mark.parametrize("payload_sample_rate", (0, 1))
+def test_payload_size_is_measured_for_sampled_items(
+    cosmos_storage, monkeypatch, payload_sample_rate
+):
+    # arrange
+    measured_items = []
+
+    def get_payload_size(item) -> int:
+        measured_items.append(item)
+        return 1
+
+    monkeypatch.setattr(
+        "app.storage.instrumentation.get_payload_size", get_payload_size
+    )
+    storage = InstrumentedStorage(
+        storage=cosmos_storage,
+        name="state",
+        payload_sample_rate=payload_sample_rate,
+        compression_sample_rate=0,
+    )
+
+    async def run():
+        await storage.write({USER_KEY: CachedAgentState({"turn": 0})})
+        return await read_state(storage, USER_KEY)
+
+    # action
+    state = asyncio.run(run())
+
+    # assert
+    assert state.state["turn"] == 0
+    assert len(measured_items) == 2 * payload_sample_rate